@@ -0,0 +1,201 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+_ENTRY_OVERHEAD = 256
+_WORD = re.compile(r"[^\W_]+")
+_SENTENCE = re.compile(r"[.!?]+")
+MONTHS = {"january", "february", "march", "april", "may", "june", "july", "august",
+          "september", "october", "november", "december"}
+
+
+def normalize_question(question: str) -> str:
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?!. ")
+
+
+def key_terms(question: str, entities: Iterable[Tuple[str, str]] = ()) -> FrozenSet[str]:
+    """What two questions must share before one may reuse the other's answer.
+
+    Embeddings put "flights to Paris in May" and "flights to Rome in June" close
+    together, so a semantic hit also needs the same numbers (flight numbers,
+    dates, prices), the same capitalised words (names, except a sentence's first
+    word), the same month names, and the same (kind, value) entities, which
+    catch lowercased city names.
+    """
+    terms = {f"{kind}:{value}" for kind, value in entities}
+    for sentence in _SENTENCE.split(question):
+        for i, word in enumerate(_WORD.findall(sentence)):
+            lowered = word.lower()
+            if any(c.isdigit() for c in word) or lowered in MONTHS or (i and word[0].isupper()):
+                terms.add(lowered)
+    return frozenset(terms)
+
+
+@dataclass
+class CachedAnswer:
+    key: str
+    answer: str
+    sources: List[Optional[str]]
+    embedding: Optional[np.ndarray]
+    created: float
+    size: int = field(default=0)
+    terms: FrozenSet[str] = field(default=frozenset())
+
+
+class AnswerCache:
+    """Two-level answer cache: exact normalized question, then embedding similarity.
+
+    A semantic hit also needs the cached question's key_terms to equal the new
+    one's, so near-duplicates that differ in a city, month or flight number
+    never share an answer.
+
+    Entries expire after a TTL and are evicted LRU-first when either the
+    entry count or the approximate memory cap is exceeded. The whole cache is
+    dropped when the vector store's index version changes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = MAX_ENTRIES,
+        max_bytes: int = MAX_BYTES,
+        ttl: float = TTL_SECONDS,
+        similarity_threshold: float = SIMILARITY_THRESHOLD,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.version = None
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._bytes = 0
+        self._matrix = None
+        self._matrix_keys: List[str] = []
+        self._lock = threading.Lock()
+        self.counters = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def check_version(self, version: str):
+        with self._lock:
+            if version == self.version:
+                return
+            if self._entries:
+                self.counters["invalidations"] += 1
+            self._clear()
+            self.version = version
+
+    def get_exact(self, question: str) -> Optional[CachedAnswer]:
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expire_if_stale(entry):
+                return None
+            self._entries.move_to_end(key)
+            self.counters["exact_hits"] += 1
+            return entry
+
+    def get_semantic(self, embedding, terms: FrozenSet[str]) -> Optional[CachedAnswer]:
+        """Closest cached question above the similarity threshold with the same key terms; counts a miss otherwise."""
+        query = _unit(embedding)
+        with self._lock:
+            if self._entries:
+                if self._matrix is None:
+                    self._rebuild_matrix()
+                if self._matrix_keys:
+                    scores = self._matrix @ query
+                    above = np.flatnonzero(scores >= self.similarity_threshold)
+                    for best in above[np.argsort(-scores[above])]:
+                        entry = self._entries.get(self._matrix_keys[best])
+                        if entry is None or entry.terms != terms or self._expire_if_stale(entry):
+                            continue
+                        self._entries.move_to_end(entry.key)
+                        self.counters["semantic_hits"] += 1
+                        return entry
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, question: str, embedding, answer: str, sources, version: str,
+            terms: Optional[FrozenSet[str]] = None):
+        key = normalize_question(question)
+        terms = key_terms(question) if terms is None else terms
+        vector = _unit(embedding) if embedding is not None else None
+        size = _ENTRY_OVERHEAD + len(key) + len(answer) + sum(len(s or "") for s in sources)
+        if vector is not None:
+            size += vector.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # An answer built from an index that has since been replaced is not cached.
+            if version != self.version:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CachedAnswer(key, answer, list(sources), vector, time.monotonic(), size, terms)
+            self._bytes += size
+            self._matrix = None
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["exact_hits"] + self.counters["semantic_hits"] + self.counters["misses"]
+            hits = lookups - self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "index_version": self.version,
+            }
+
+    def _expire_if_stale(self, entry: CachedAnswer) -> bool:
+        if time.monotonic() - entry.created <= self.ttl:
+            return False
+        self._remove(entry.key)
+        self.counters["expirations"] += 1
+        return True
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        self._matrix = None
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        self._matrix = None
+        self._matrix_keys = []
+
+    def _rebuild_matrix(self):
+        keys = [k for k, e in self._entries.items() if e.embedding is not None]
+        self._matrix_keys = keys
+        if keys:
+            self._matrix = np.stack([self._entries[k].embedding for k in keys])
+        else:
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+
+def _unit(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
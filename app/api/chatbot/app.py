@@ -1,22 +1,40 @@
+import asyncio
+import hmac
+import json
 import os
+import sys
+import time
 from dotenv import load_dotenv
 
 
 base_dir = os.path.dirname(__file__)
 dotenv_path = os.path.join(base_dir, ".env")
 load_dotenv(dotenv_path)
+sys.path.insert(0, base_dir)
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from answer_cache import AnswerCache, key_terms
+from capture import RequestCapture, capture_middleware
+from embedding_cache import QueryEmbedder
+from embeddings import get_embedding_function
+from entities import EntityMatcher, load_mock_data
+from fast_path import FastPath
+from gemini_client import GeminiClient
+from hedging import HedgePolicy, ModelRouter
+from lexical_index import reciprocal_rank_fusion
+from memory_report import MemoryTracker, active_tracker
+from metrics import CONTEXT_CHARS, STRUCTURED_ANSWERS, metrics_middleware, render as render_metrics
+from profiler import ProfileSession, profile_middleware
+from timing import StageTimer
+from tracing import annotate, configure as configure_tracing, current_span, shutdown as shutdown_tracing, tracing_middleware
+from vector_store import VectorStore
 
 
 CHROMA_PATH = "chroma"
@@ -25,7 +43,17 @@ MODEL_CANDIDATES = [
     "gemini-2.5-flash",
     "gemini-2.5-pro",
 ]
-BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+
+GREETINGS = {"hello", "hi", "hey"}
+GREETING_REPLY = "Hello there! How can I assist you with your travel plans today?"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+WARM_UP_QUERY = "flights and hotels"
+WARM_UP_RETRY_SECONDS = 5
+SEARCH_K = 5
+#each retriever contributes this many candidates to rank fusion
+SEARCH_CANDIDATES = 10
+#chunks sent when a rare query term (a flight number, a hotel name) pins the answer down
+PRECISE_K = 2
 
 PROMPT_TEMPLATE = """
 Answer the question based only on the following context:
@@ -48,7 +76,63 @@ class GenerateResponse(BaseModel):
     message: str
     sources: List[Optional[str]]
 
-app = FastAPI()
+async def warm_up(app: FastAPI):
+    """Open the index and run one query through embedding and search; /ready passes after.
+
+    Both steps retry until they succeed, so a store that is missing or locked
+    at startup is picked up once it becomes available.
+    """
+    started = time.perf_counter()
+    try:
+        app.state.entity_matcher = await run_in_threadpool(EntityMatcher.load)
+        app.state.fast_path = FastPath(app.state.entity_matcher, list(load_mock_data().car_base_rates))
+    except Exception as e:
+        print(f"Entity filters and structured answers disabled, could not load the vocabulary: "
+              f"{type(e).__name__}: {e}")
+    store = None
+    while True:
+        try:
+            #open the index once per process
+            if store is None:
+                store = await run_in_threadpool(VectorStore, CHROMA_PATH, get_embedding_function())
+                app.state.vector_store = store
+                app.state.query_embedder = QueryEmbedder(store.embedding_function)
+            embedding = await app.state.query_embedder.embed(WARM_UP_QUERY)
+            #a filtered search also builds the retriever's entity flag index
+            await run_in_threadpool(store.similarity_search_by_vector_with_score, embedding, 1,
+                                    entity_filter(app, WARM_UP_QUERY))
+            break
+        except Exception as e:
+            app.state.startup_error = f"{type(e).__name__}: {e}"
+            step = "Opening the vector store" if store is None else "Warm-up query"
+            print(f"{step} failed, retrying in {WARM_UP_RETRY_SECONDS}s: {app.state.startup_error}")
+            await asyncio.sleep(WARM_UP_RETRY_SECONDS)
+    app.state.startup_error = None
+    app.state.startup_seconds = time.perf_counter() - started
+    app.state.ready = True
+    print(f"Ready in {app.state.startup_seconds:.2f}s")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    app.state.startup_error = None
+    app.state.entity_matcher = None
+    app.state.fast_path = None
+    app.state.gemini_client = GeminiClient()
+    app.state.model_router = ModelRouter(MODEL_CANDIDATES, HedgePolicy.from_env())
+    app.state.answer_cache = AnswerCache()
+    app.state.request_capture = RequestCapture()
+    app.state.profile_session = ProfileSession()
+    configure_tracing()
+    #serve /ready and /metrics at once; the index and embedder warm up in the background
+    warming = asyncio.create_task(warm_up(app))
+    yield
+    warming.cancel()
+    await app.state.gemini_client.aclose()
+    await run_in_threadpool(app.state.request_capture.close)
+    await run_in_threadpool(shutdown_tracing)
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -56,87 +140,345 @@ app.add_middleware(
     allow_methods=["POST"],
     allow_headers=["*"],
 )
+app.middleware("http")(capture_middleware)
+app.middleware("http")(profile_middleware)
+app.middleware("http")(metrics_middleware)
+app.middleware("http")(tracing_middleware)
 
-def get_embedding_function():
-    return GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+def latest_question(req: GenerateRequest) -> str:
+    user_msgs = [m.content for m in req.messages if m.role == "user"]
+    if not user_msgs:
+        raise HTTPException(400, "No user message provided.")
+    return user_msgs[-1].strip()
 
-def call_gemini(model_name: str, prompt: str, api_key: str) -> str:
-    """Attempt a single-model call with retries; raise HTTPException on failure."""
-    url = f"{BASE_URL}/{model_name}:generateContent?key={api_key}"
-    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+def require_ready(request: Request):
+    if not request.app.state.ready:
+        raise HTTPException(503, "Service is warming up.", headers={"Retry-After": "1"})
 
-    session = requests.Session()
-    retries = Retry(
-        total=3,
-        backoff_factor=1,
-        status_forcelist=[502, 503, 504],
-        allowed_methods=["POST"],
-    )
-    session.mount("https://", HTTPAdapter(max_retries=retries))
+def start_request(req: GenerateRequest, request: Request):
+    """Set up per-request state (read by the capture middleware); return (timer, question)."""
+    require_ready(request)
+    request.state.timer = StageTimer()
+    request.state.messages = [m.model_dump() for m in req.messages]
+    request.state.question = latest_question(req)
+    return request.state.timer, request.state.question
 
-    try:
-        resp = session.post(
-            url,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=30,
-        )
-    except (requests.exceptions.RetryError, requests.exceptions.ReadTimeout):
-        raise HTTPException(503, f"Model {model_name} busy or timed out.")
-    except Exception as e:
-        raise HTTPException(500, f"Unexpected error calling model {model_name}: {e}")
+def get_api_key() -> str:
+    api_key = os.getenv("GENAI_API_KEY")
+    if not api_key:
+        raise HTTPException(500, "GENAI_API_KEY not set in environment")
+    return api_key
+
+def require_admin(request: Request):
+    """Admin endpoints need `Authorization: Bearer $ADMIN_TOKEN`; without ADMIN_TOKEN they do not exist."""
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(404, "Not Found")
+    supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        raise HTTPException(401, "Invalid admin token.")
+
+async def structured_answer(request: Request, question: str):
+    """(answer, sources) straight from the travel tables for a confident lookup, else None."""
+    fast_path = request.app.state.fast_path
+    if fast_path is None:
+        return None
+    with request.state.timer.stage("structured"):
+        lookup = fast_path.parse(question)
+        if lookup is None:
+            return None
+        result = await run_in_threadpool(fast_path.answer, request.app.state.vector_store.query_travel, lookup)
+    if result is None:
+        return None
+    request.state.model, request.state.sources = "structured", result[1]
+    STRUCTURED_ANSWERS.inc(category=lookup.category)
+    return result
 
-    if not resp.ok:
-        raise HTTPException(503, f"Model {model_name} error {resp.status_code}: {resp.text}")
+async def lookup_cache(request: Request, question: str):
+    """Return (cached answer or None, question embedding, index version)."""
+    store = request.app.state.vector_store
+    cache = request.app.state.answer_cache
+    timer = request.state.timer
+    version = store.version
+    with timer.stage("cache"):
+        cache.check_version(version)
+        hit = cache.get_exact(question)
+    if hit is not None:
+        request.state.cache, request.state.sources = "exact", hit.sources
+        return hit, None, version
+    with timer.stage("embed"):
+        embedding = await request.app.state.query_embedder.embed(question)
+    with timer.stage("cache"):
+        hit = cache.get_semantic(embedding, cache_terms(request.app, question))
+    request.state.cache = "semantic" if hit is not None else "miss"
+    if hit is not None:
+        request.state.sources = hit.sources
+    return hit, embedding, version
 
-    data = resp.json()
-    return "".join(
-        part.get("text", "")
-        for cand in data.get("candidates", [])
-        for part in cand.get("content", {}).get("parts", [])
+def cache_terms(app: FastAPI, question: str):
+    """Key terms a semantic cache hit must share with the question."""
+    matcher = app.state.entity_matcher
+    return key_terms(question, matcher.find(question) if matcher is not None else ())
+
+def entity_filter(app: FastAPI, question: str):
+    """Chroma `where` filter for the cities, countries, categories and airlines in the question."""
+    matcher = app.state.entity_matcher
+    return matcher.where(question) if matcher is not None else None
+
+async def search(store: VectorStore, question: str, embedding, where):
+    #vector and keyword search side by side
+    return await asyncio.gather(
+        run_in_threadpool(store.similarity_search_by_vector_with_score, embedding, SEARCH_CANDIDATES, where),
+        run_in_threadpool(store.lexical_search, question, SEARCH_CANDIDATES, where),
     )
 
+async def build_prompt(request: Request, question: str, embedding):
+    """Retrieve context for the question; return (prompt, source ids)."""
+    #rag
+    store = request.app.state.vector_store
+    timer = request.state.timer
+    with timer.stage("entities"):
+        where = entity_filter(request.app, question)
+    with timer.stage("search"):
+        semantic, lexical = await search(store, question, embedding, where)
+        if where and not semantic and not lexical:
+            #no chunk carries every entity (or the index predates tagging): search everything
+            semantic, lexical = await search(store, question, embedding, None)
+            where = None
+        if where:
+            annotate(current_span(), **{"search.filter": json.dumps(where)})
+        documents = fuse_results(semantic, lexical)
+
+    #prompt
+    with timer.stage("prompt"):
+        context = "\n\n---\n\n".join(doc.page_content for doc in documents)
+        CONTEXT_CHARS.observe(len(context))
+        prompt = PROMPT_TEMPLATE.format(context=context, question=question)
+        sources = [doc.metadata.get("id") for doc in documents]
+    request.state.sources = sources
+    return prompt, sources
+
+def fuse_results(semantic, lexical):
+    """Merge vector and BM25 hits with reciprocal rank fusion.
+
+    Precise keyword hits go first and cut the context to PRECISE_K chunks;
+    otherwise the top SEARCH_K fused chunks are used.
+    """
+    if not lexical:
+        return [doc for doc, _ in semantic[:SEARCH_K]]
+    documents = {doc.metadata.get("id"): doc for doc, _ in semantic}
+    documents.update((doc.metadata.get("id"), doc) for doc, _, _ in lexical)
+    fused = reciprocal_rank_fusion([
+        [doc.metadata.get("id") for doc, _ in semantic],
+        [doc.metadata.get("id") for doc, _, _ in lexical],
+    ])
+    precise = [doc.metadata.get("id") for doc, _, is_precise in lexical if is_precise]
+    if precise:
+        fused = precise + [doc_id for doc_id in fused if doc_id not in precise]
+        return [documents[doc_id] for doc_id in fused[:PRECISE_K]]
+    return [documents[doc_id] for doc_id in fused[:SEARCH_K]]
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def whole_answer_events(answer: str, sources):
+    yield sse_event("sources", {"sources": sources})
+    yield sse_event("token", {"text": answer})
+    yield sse_event("done", {})
+
+class ClosingStreamingResponse(StreamingResponse):
+    """Awaits on_close() however the response ends, including a client that left before the body started."""
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
+
 
 @app.post("/generate", response_model=GenerateResponse)
-async def generate(req: GenerateRequest):
-    user_msgs = [m.content for m in req.messages if m.role == "user"]
-    if not user_msgs:
-        raise HTTPException(400, "No user message provided.")
-    question = user_msgs[-1].strip()
+async def generate(req: GenerateRequest, request: Request, response: Response):
+    timer, question = start_request(req, request)
 
     #greeting
-    if question.lower() in {"hello", "hi", "hey"}:
-        return GenerateResponse(
-            message="Hello there! How can I assist you with your travel plans today?",
-            sources=[]
+    if question.lower() in GREETINGS:
+        return GenerateResponse(message=GREETING_REPLY, sources=[])
+
+    #price / availability lookups are answered from the tables, no retrieval or model call
+    structured = await structured_answer(request, question)
+    if structured is not None:
+        response.headers["Server-Timing"] = timer.server_timing()
+        return GenerateResponse(message=structured[0], sources=structured[1])
+
+    #cache
+    hit, embedding, version = await lookup_cache(request, question)
+    if hit is not None:
+        response.headers["Server-Timing"] = timer.server_timing()
+        return GenerateResponse(message=hit.answer, sources=hit.sources)
+
+    prompt, sources = await build_prompt(request, question, embedding)
+
+    #hedged across all models
+    api_key = get_api_key()
+    gemini = request.app.state.gemini_client
+    with timer.stage("llm"):
+        request.state.model, answer = await request.app.state.model_router.call(
+            lambda model: gemini.call_gemini(model, prompt, api_key)
         )
 
-    #rag
-    db = Chroma(
-        persist_directory=CHROMA_PATH,
-        embedding_function=get_embedding_function(),
-    )
-    results = db.similarity_search_with_score(question, k=5)
-    context = "\n\n---\n\n".join(doc.page_content for doc, _ in results)
+    #generate answer
+    request.app.state.answer_cache.put(question, embedding, answer, sources, version,
+                                       cache_terms(request.app, question))
+    response.headers["Server-Timing"] = timer.server_timing()
+    return GenerateResponse(message=answer, sources=sources)
 
-    #prompt
-    prompt = PROMPT_TEMPLATE.format(context=context, question=question)
 
-    #try all models
-    api_key = os.getenv("GENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(500, "GENAI_API_KEY not set in environment")
+@app.post("/generate/stream")
+async def generate_stream(req: GenerateRequest, request: Request):
+    """Same answer as /generate, sent as Server-Sent Events while the model writes it.
+
+    Events: one `sources` event, then `token` events, then `done` (or `error`).
+    The Server-Timing header covers the stages up to the first token.
+    """
+    timer, question = start_request(req, request)
+
+    if question.lower() in GREETINGS:
+        return StreamingResponse(
+            whole_answer_events(GREETING_REPLY, []), media_type="text/event-stream", headers=SSE_HEADERS
+        )
 
-    last_exc = None
-    for model in MODEL_CANDIDATES:
+    structured = await structured_answer(request, question)
+    if structured is not None:
+        return StreamingResponse(
+            whole_answer_events(*structured),
+            media_type="text/event-stream",
+            headers={**SSE_HEADERS, "Server-Timing": timer.server_timing()},
+        )
+
+    hit, embedding, version = await lookup_cache(request, question)
+    if hit is not None:
+        return StreamingResponse(
+            whole_answer_events(hit.answer, hit.sources),
+            media_type="text/event-stream",
+            headers={**SSE_HEADERS, "Server-Timing": timer.server_timing()},
+        )
+
+    prompt, sources = await build_prompt(request, question, embedding)
+    api_key = get_api_key()
+    gemini = request.app.state.gemini_client
+
+    async def first_token(model: str):
+        stream = gemini.stream_gemini(model, prompt, api_key)
         try:
-            answer = call_gemini(model, prompt, api_key)
-            break
+            return await stream.__anext__(), stream
+        except StopAsyncIteration:
+            return "", stream
+
+    #hedge on time-to-first-token, then stay with the winner; losing streams are closed
+    with timer.stage("first_token"):
+        model, (first, stream) = await request.app.state.model_router.call(
+            first_token, discard=lambda result: result[1].aclose()
+        )
+    request.state.model = model
+
+    async def events():
+        yield sse_event("sources", {"sources": sources})
+        parts = [first]
+        try:
+            if first:
+                yield sse_event("token", {"text": first})
+            async for text in stream:
+                parts.append(text)
+                yield sse_event("token", {"text": text})
         except HTTPException as e:
-            last_exc = e
-    else:
-        raise last_exc
+            yield sse_event("error", {"error": e.detail})
+            return
+        request.app.state.answer_cache.put(question, embedding, "".join(parts), sources, version,
+                                           cache_terms(request.app, question))
+        yield sse_event("done", {"model": model})
 
-    #generate answer
-    sources = [doc.metadata.get("id") for doc, _ in results]
-    return GenerateResponse(message=answer, sources=sources)
\ No newline at end of file
+    return ClosingStreamingResponse(
+        events(),
+        on_close=stream.aclose,
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "Server-Timing": timer.server_timing()},
+    )
+
+
+@app.get("/models/health")
+async def models_health(request: Request):
+    return request.app.state.model_router.snapshot()
+
+
+@app.get("/ready")
+async def ready(request: Request):
+    """Readiness probe: 200 once the index is open and a warm-up query has gone through."""
+    state = request.app.state
+    if not state.ready:
+        return JSONResponse({"ready": False, "error": state.startup_error}, status_code=503)
+    return {
+        "ready": True,
+        "startup_seconds": round(state.startup_seconds, 3),
+        "index_version": state.vector_store.version,
+        "retriever": state.vector_store.retriever.name,
+    }
+
+
+@app.get("/cache/stats", dependencies=[Depends(require_ready)])
+async def cache_stats(request: Request):
+    return {
+        "answers": request.app.state.answer_cache.stats(),
+        "embeddings": request.app.state.query_embedder.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def admin_profile(request: Request, seconds: float = 10, requests: int = 0, interval: float = 0.005):
+    """Sample all threads for `seconds` (or until `requests` more /generate calls finish).
+
+    Returns collapsed stacks: pipe into flamegraph.pl or load in speedscope.
+    """
+    if not 0 < seconds <= 300 or requests < 0 or not 0.001 <= interval <= 1:
+        raise HTTPException(400, "Need 0 < seconds <= 300, requests >= 0 and 0.001 <= interval <= 1.")
+    try:
+        profiler = await request.app.state.profile_session.run(seconds, requests, interval)
+    except RuntimeError as e:
+        raise HTTPException(409, str(e))
+    return PlainTextResponse(profiler.collapsed(), headers={"X-Profile-Samples": str(profiler.sample_count)})
+
+
+@app.post("/admin/memory/start", dependencies=[Depends(require_admin)])
+async def admin_memory_start(frames: int = 1):
+    """Start tracemalloc (slows allocations) and take the baseline snapshot."""
+    if active_tracker() is not None:
+        raise HTTPException(409, "Memory tracing is already running.")
+    await run_in_threadpool(MemoryTracker(frames=frames).start)
+    return {"tracing": True}
+
+
+@app.get("/admin/memory", dependencies=[Depends(require_admin)])
+async def admin_memory(top: int = 20):
+    """Top allocation sites and growth since the previous call."""
+    tracker = active_tracker()
+    if tracker is None:
+        raise HTTPException(409, "Memory tracing is not running; POST /admin/memory/start first.")
+    return await run_in_threadpool(tracker.report, top)
+
+
+@app.post("/admin/memory/stop", dependencies=[Depends(require_admin)])
+async def admin_memory_stop(top: int = 20):
+    tracker = active_tracker()
+    if tracker is None:
+        raise HTTPException(409, "Memory tracing is not running.")
+    report = await run_in_threadpool(tracker.report, top)
+    tracker.stop()
+    return report
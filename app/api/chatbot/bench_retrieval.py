@@ -0,0 +1,281 @@
+"""Retrieval benchmark for the chatbot RAG path.
+
+Builds synthetic travel collections of the requested sizes with a local,
+deterministic embedder, chunks them with populate_database.split_documents,
+and measures what generate() pays for retrieval with each retriever backend:
+
+    python app/api/chatbot/bench_retrieval.py --sizes 1000 10000 100000
+    python app/api/chatbot/bench_retrieval.py --sizes 1000 --retrievers exact
+    python app/api/chatbot/bench_retrieval.py --sizes 100000 --retrievers exact mmap mmap-int8
+    python app/api/chatbot/bench_retrieval.py --sizes 1000 --compare bench-retrieval-abc1234.json
+
+Results go to a JSON file named after the current commit.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain.schema.document import Document
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from ingest import batched
+from local_embeddings import HashingEmbeddings
+from mmap_index import MMAP_FILE, export_collection
+from populate_database import calculate_chunk_ids, split_documents
+from vector_store import VectorStore, new_index_version, write_index_version
+
+
+CITIES = {
+    "New York": "USA", "London": "UK", "Paris": "France", "Tokyo": "Japan",
+    "Sydney": "Australia", "Rio de Janeiro": "Brazil", "Cairo": "Egypt",
+    "Cape Town": "South Africa", "Moscow": "Russia", "Dubai": "UAE",
+    "Mumbai": "India", "Toronto": "Canada",
+}
+AIRLINES = ["Airways Intl", "Global Flights", "Sky High", "Continental Express", "TransWorld Airlines"]
+CAR_TYPES = ["Economy", "Compact", "SUV", "Luxury", "Van"]
+HOTEL_SUFFIXES = ["Grand Hotel", "Inn", "Suites", "Plaza", "Palace"]
+ROWS_PER_PAGE = 40
+ADD_BATCH = 4000
+RETRIEVERS = ["hnsw", "exact", "mmap", "mmap-int8"]
+
+
+def synthetic_row(rng: random.Random) -> str:
+    city, country = rng.choice(list(CITIES.items()))
+    kind = rng.randrange(3)
+    month = rng.randint(7, 12)
+    day = rng.randint(1, 28)
+    if kind == 0:
+        dest, dest_country = rng.choice(list(CITIES.items()))
+        airline = rng.choice(AIRLINES)
+        number = f"{airline[:2].upper()}{rng.randint(100, 999)}"
+        return (f"{country}\n{city}\n{dest_country}\n{dest}\n2025-{month:02d}-{day:02d}\n"
+                f"{airline}\n{number}\n{rng.randint(300, 1800)}")
+    if kind == 1:
+        return (f"{country}\n{city}\n{rng.choice(CAR_TYPES)}\n2025-{month:02d}-{day:02d}\n"
+                f"{rng.randint(30, 1200)}")
+    return (f"{country}\n{city}\n{city} {rng.choice(HOTEL_SUFFIXES)}\n2025-{month:02d}-{day:02d}\n"
+            f"{rng.randint(80, 360)}")
+
+
+def synthetic_chunks(target: int, seed: int):
+    """Chunk synthetic table pages with the ingester's splitter, yielding target chunks."""
+    rng = random.Random(seed)
+
+    def pages():
+        page = 0
+        while True:
+            text = "\n".join(synthetic_row(rng) for _ in range(ROWS_PER_PAGE))
+            yield Document(page_content=text, metadata={"source": "synthetic.pdf", "page": page})
+            page += 1
+
+    for count, chunk in enumerate(calculate_chunk_ids(split_documents(pages())), 1):
+        yield chunk
+        if count >= target:
+            return
+
+
+def get_embedder(name: str, dim: int):
+    if name == "hashing":
+        return HashingEmbeddings(size=dim)
+    return DeterministicFakeEmbedding(size=dim)
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": statistics.fmean(ordered) * 1000,
+    }
+
+
+def dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def brute_force_ids(matrix: np.ndarray, ids, queries: np.ndarray, k: int):
+    """Exact L2 top-k, the same metric Chroma uses by default."""
+    norms = np.einsum("ij,ij->i", matrix, matrix)
+    results = []
+    for query in queries:
+        distances = norms - 2 * matrix @ query
+        top = np.argpartition(distances, k)[:k]
+        results.append({ids[i] for i in top})
+    return results
+
+
+def bench_size(size: int, args) -> dict:
+    print(f"== {size} chunks")
+    embedder = get_embedder(args.embedder, args.dim)
+    rng = random.Random(args.seed + 1)
+    picks = [rng.randrange(size) for _ in range(args.queries)]
+    picked = dict.fromkeys(picks)
+
+    workdir = tempfile.mkdtemp(prefix=f"bench-{size}-", dir=args.workdir)
+    try:
+        store = VectorStore(workdir, embedder, retriever="hnsw")
+        collection = store._db._collection
+        #chunks are embedded and added a batch at a time; only ids and the float32 vectors are kept whole
+        vectors = np.empty((size, args.dim), dtype=np.float32)
+        ids = []
+        embed_seconds = build_seconds = 0.0
+        for batch in batched(synthetic_chunks(size, args.seed), ADD_BATCH):
+            texts = [c.page_content for c in batch]
+            for i, text in enumerate(texts, len(ids)):
+                if i in picked:
+                    picked[i] = text
+            start = time.perf_counter()
+            vectors[len(ids):len(ids) + len(batch)] = embedder.embed_documents(texts)
+            embed_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            collection.add(
+                ids=[c.metadata["id"] for c in batch],
+                embeddings=vectors[len(ids):len(ids) + len(batch)].tolist(),
+                documents=texts,
+                metadatas=[c.metadata for c in batch],
+            )
+            build_seconds += time.perf_counter() - start
+            ids.extend(c.metadata["id"] for c in batch)
+        vectors = vectors[:len(ids)]
+        disk_bytes = dir_size(workdir)
+
+        questions = [" ".join(picked[i].split("\n")[:4]) for i in picks]
+        start = time.perf_counter()
+        query_vectors = [embedder.embed_query(q) for q in questions]
+        query_embed_seconds = (time.perf_counter() - start) / len(questions)
+
+        def search(vector):
+            t0 = time.perf_counter()
+            results = store.similarity_search_by_vector_with_score(vector, args.k)
+            return time.perf_counter() - t0, {doc.metadata["id"] for doc, _ in results}
+
+        exact = brute_force_ids(vectors, ids, np.asarray(query_vectors, dtype=np.float32), args.k)
+        retrievers = {}
+        for name in args.retrievers:
+            start = time.perf_counter()
+            if name.startswith("mmap"):
+                # the export is what populate_database.publish_index does after ingestion
+                version = new_index_version()
+                export_collection(collection, os.path.join(workdir, MMAP_FILE), version,
+                                  name.partition("-")[2] or "float32")
+                write_index_version(workdir, version)
+            store.retriever_mode = name.partition("-")[0]
+            store.reload()
+            load_seconds = time.perf_counter() - start
+
+            for vector in query_vectors[:10]:
+                search(vector)
+            timed = [search(v) for v in query_vectors]
+
+            throughput = {}
+            for workers in args.concurrency:
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    list(pool.map(search, query_vectors))
+                throughput[str(workers)] = len(query_vectors) / (time.perf_counter() - start)
+
+            retrievers[name] = {
+                "load_seconds": load_seconds,
+                "scan_bytes": getattr(store.retriever, "scan_bytes", None),
+                "latency_ms": percentiles([t for t, _ in timed]),
+                "throughput_qps": throughput,
+                f"recall_at_{args.k}": statistics.fmean(
+                    len(found & truth) / args.k for (_, found), truth in zip(timed, exact)
+                ),
+            }
+    finally:
+        from chromadb.api.client import SharedSystemClient
+        SharedSystemClient.clear_system_cache()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "size": size,
+        "dim": args.dim,
+        "embed_seconds": embed_seconds,
+        "build_seconds": build_seconds,
+        "disk_bytes": disk_bytes,
+        "query_embed_ms": query_embed_seconds * 1000,
+        "retrievers": retrievers,
+    }
+    print(json.dumps(result, indent=1))
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {r["size"]: r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}")
+    for result in current["results"]:
+        before = baseline.get(result["size"])
+        if not before:
+            continue
+        #results from before per-retriever reporting were all HNSW
+        before_retrievers = before.get("retrievers", {"hnsw": before})
+        for name, stats in result["retrievers"].items():
+            if name not in before_retrievers:
+                continue
+            for key in ("p50", "p95", "p99"):
+                old, new = before_retrievers[name]["latency_ms"][key], stats["latency_ms"][key]
+                print(f"  {result['size']:>8} {name:>5} {key}: {old:8.2f} -> {new:8.2f} ms "
+                      f"({(new - old) / old:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--retrievers", nargs="+", choices=RETRIEVERS, default=["hnsw", "exact"],
+                        help="mmap-int8 scans int8 vectors and rescores at float32.")
+    parser.add_argument("--embedder", choices=["hashing", "random"], default="hashing",
+                        help="hashing keeps lexical similarity; random is much faster for 1M runs.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", default=None, help="Where temporary collections are built.")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", default=None, help="Earlier results file to diff against.")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "results": [bench_size(size, args) for size in args.sizes],
+    }
+    out = args.out or f"bench-retrieval-{commit}.json"
+    with open(out, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to {out}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
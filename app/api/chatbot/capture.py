@@ -0,0 +1,127 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+
+from metrics import CAPTURES
+from tracing import current_span
+
+
+CAPTURE_PATH = os.getenv("CAPTURE_PATH", "captures/requests.jsonl")
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", "0"))
+CAPTURE_MAX_BYTES = int(os.getenv("CAPTURE_MAX_BYTES", str(50 * 1024 * 1024)))
+CAPTURE_BACKUPS = int(os.getenv("CAPTURE_BACKUPS", "5"))
+CAPTURED_PATHS = ("/generate", "/generate/stream")
+
+
+class RequestCapture:
+    """Samples requests into a rotating JSONL file that loadgen.py can replay.
+
+    Requests only put a dict on a bounded queue; a writer thread serializes
+    and writes them in batches. When the queue is full records are dropped
+    rather than slowing a request down; chatbot_captures_total counts both.
+    """
+
+    def __init__(self, path: str = CAPTURE_PATH, sample_rate: float = CAPTURE_SAMPLE_RATE,
+                 max_bytes: int = CAPTURE_MAX_BYTES, backups: int = CAPTURE_BACKUPS,
+                 queue_size: int = 10000, batch_size: int = 256, flush_interval: float = 1.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        if self.enabled:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="request-capture", daemon=True)
+            self._thread.start()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def sampled(self) -> bool:
+        return self.enabled and random.random() < self.sample_rate
+
+    def submit(self, record: dict):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            CAPTURES.inc(outcome="dropped")
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        done = False
+        while not done:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                done = True
+                batch = [r for r in batch if r is not None]
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        data = "".join(json.dumps(record, default=str) + "\n" for record in batch)
+        if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+            self._rotate()
+        with open(self.path, "a") as f:
+            f.write(data)
+        CAPTURES.inc(len(batch), outcome="written")
+
+    def _rotate(self):
+        #requests.jsonl -> requests.jsonl.1 -> ... -> requests.jsonl.N (dropped)
+        for i in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{i}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+async def capture_middleware(request, call_next):
+    """Record sampled /generate requests once their response has started."""
+    capture = request.app.state.request_capture
+    if request.url.path not in CAPTURED_PATHS or not capture.sampled():
+        return await call_next(request)
+
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    trace = current_span()
+    started = time.time()
+    response = await call_next(request)
+    state = request.state
+    timer = getattr(state, "timer", None)
+    capture.submit({
+        "request_id": request_id,
+        "trace_id": trace.trace_id if trace else None,
+        "timestamp": started,
+        "path": request.url.path,
+        "status": response.status_code,
+        "messages": getattr(state, "messages", None),
+        "question": getattr(state, "question", None),
+        "sources": getattr(state, "sources", None),
+        "model": getattr(state, "model", None),
+        "cache": getattr(state, "cache", None),
+        "timings_ms": {name: round(s * 1000, 2) for name, s in timer.stages.items()} if timer else {},
+        "total_ms": round((time.time() - started) * 1000, 2),
+    })
+    return response
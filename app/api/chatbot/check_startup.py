@@ -0,0 +1,116 @@
+"""Startup-time regression check for the chatbot API.
+
+Measures (1) how long `import app.api.chatbot.app` takes in a fresh
+interpreter and (2) how long a uvicorn worker takes from spawn until /ready
+answers 200, and exits non-zero when either is over budget:
+
+    python app/api/chatbot/check_startup.py
+    python app/api/chatbot/check_startup.py --import-budget 1.0 --ready-budget 8 --runs 5
+
+The ready check uses the local hashing embedder by default so it needs no
+network; pass --embedding-backend google to include the real client.
+tests/test_startup.py runs both checks with the default budgets as part of
+the test suite (marked slow).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+
+# Measured at ~0.7s import / ~3s to ready once langchain_google_genai,
+# langchain_community and the embedders left the import path (import was
+# ~1.9s before). Budgets leave headroom for slower CI machines.
+IMPORT_BUDGET_SECONDS = 1.5
+READY_BUDGET_SECONDS = 8.0
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app.api.chatbot.app; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def measure_import(env) -> float:
+    out = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=REPO_ROOT, env=env, text=True)
+    return float(out.strip().splitlines()[-1])
+
+
+def slowest_imports(env, top: int = 10):
+    """Largest cumulative entries from -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.api.chatbot.app"],
+                          cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), name))
+    return sorted(rows, reverse=True)[:top]
+
+
+def measure_ready(env, port: int, workdir: str, timeout: float) -> float:
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "--app-dir", REPO_ROOT, "app.api.chatbot.app:app",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=env,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise SystemExit(f"API exited with code {proc.returncode} before becoming ready")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.05)
+        return float("inf")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_SECONDS)
+    parser.add_argument("--ready-budget", type=float, default=READY_BUDGET_SECONDS)
+    parser.add_argument("--runs", type=int, default=3, help="Median of this many measurements.")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--workdir", default=REPO_ROOT, help="Directory holding chroma/ for the ready check.")
+    parser.add_argument("--embedding-backend", choices=["local", "google"], default="local")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.embedding_backend == "local":
+        env["EMBEDDING_BACKEND"] = "local"
+
+    import_seconds = statistics.median(measure_import(env) for _ in range(args.runs))
+    ready_seconds = statistics.median(
+        measure_ready(env, args.port, args.workdir, args.ready_budget * 3) for _ in range(args.runs)
+    )
+
+    failed = False
+    for name, value, budget in (("import", import_seconds, args.import_budget),
+                                ("ready", ready_seconds, args.ready_budget)):
+        over = value > budget
+        failed |= over
+        print(f"{name:>6}: {value:6.2f}s (budget {budget:.2f}s){'  OVER BUDGET' if over else ''}")
+
+    if import_seconds > args.import_budget:
+        print("\nSlowest imports (cumulative):")
+        for micros, name in slowest_imports(env):
+            print(f"  {micros / 1e6:6.2f}s  {name}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import inspect
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+
+MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+MAX_DISK_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_DISK_ENTRIES", "100000"))
+BATCH_WINDOW = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "10")) / 1000
+BATCH_MAX = int(os.getenv("EMBEDDING_BATCH_MAX", "64"))
+
+
+class EmbeddingCache:
+    """Bounded LRU of query embeddings, optionally backed by a SQLite file.
+
+    Vectors are kept as float32. The disk store survives restarts; the
+    in-memory LRU sits in front of it. The disk store is an LRU too: rows
+    carry their last use, and the least recently used go once it holds more
+    than max_disk_entries.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, path: Optional[str] = CACHE_PATH,
+                 max_disk_entries: int = MAX_DISK_ENTRIES):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(embeddings)")}
+            if "used" not in columns:  # stores written before the disk cap
+                self._db.execute("ALTER TABLE embeddings ADD COLUMN used REAL NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings (used)")
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def get_from_disk(self, key: str) -> Optional[np.ndarray]:
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE embeddings SET used = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+        if row is None:
+            return None
+        vector = np.frombuffer(row[0], dtype=np.float32)
+        self._remember(key, vector)
+        return vector
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        for key, vector in items.items():
+            self._remember(key, vector)
+        if self._db is not None and items:
+            with self._lock:
+                now = time.time()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, used) VALUES (?, ?, ?)",
+                    [(key, vector.tobytes(), now) for key, vector in items.items()],
+                )
+                excess = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_disk_entries
+                if excess > 0:
+                    self._db.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY used, rowid LIMIT ?)", (excess,)
+                    )
+                self._db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def disk_entries(self) -> int:
+        if self._db is None:
+            return 0
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class QueryEmbedder:
+    """Embeds questions through the cache, coalescing concurrent misses.
+
+    Misses that arrive within BATCH_WINDOW of each other (or until BATCH_MAX
+    texts are waiting) go to the embedder as a single embed_documents call.
+    Identical in-flight questions share one result.
+    """
+
+    def __init__(self, embedding_function, cache: Optional[EmbeddingCache] = None,
+                 window: float = BATCH_WINDOW, max_batch: int = BATCH_MAX):
+        self.embedding_function = embedding_function
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.window = window
+        self.max_batch = max_batch
+        self._namespace = str(getattr(embedding_function, "model", type(embedding_function).__name__))
+        self._query_task_type = "task_type" in inspect.signature(
+            embedding_function.embed_documents
+        ).parameters
+        self._pending: List[tuple] = []
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._timer = None
+        self._tasks = set()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "batches": 0, "batched_texts": 0}
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self._namespace}\0{text}".encode()).hexdigest()
+
+    async def embed(self, text: str) -> np.ndarray:
+        key = self.key(text)
+        vector = self.cache.get(key)
+        if vector is not None:
+            self.counters["hits"] += 1
+            return vector
+
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._inflight[key] = future
+            self._pending.append((key, text))
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {**self.counters, "entries": len(self.cache), "disk_entries": self.cache.disk_entries()}
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        try:
+            vectors = await run_in_threadpool(self._embed_batch, batch)
+        except Exception as e:
+            for key, _ in batch:
+                self._inflight.pop(key).set_exception(e)
+            return
+        for key, _ in batch:
+            self._inflight.pop(key).set_result(vectors[key])
+
+    def _embed_batch(self, batch) -> Dict[str, np.ndarray]:
+        vectors = {}
+        missing = []
+        for key, text in batch:
+            vector = self.cache.get_from_disk(key)
+            if vector is None:
+                missing.append((key, text))
+            else:
+                vectors[key] = vector
+        self.counters["disk_hits"] += len(vectors)
+        self.counters["misses"] += len(missing)
+        if missing:
+            texts = [text for _, text in missing]
+            if self._query_task_type:
+                embedded = self.embedding_function.embed_documents(texts, task_type="RETRIEVAL_QUERY")
+            else:
+                embedded = self.embedding_function.embed_documents(texts)
+            fresh = {key: np.asarray(v, dtype=np.float32) for (key, _), v in zip(missing, embedded)}
+            self.cache.put_many(fresh)
+            vectors.update(fresh)
+            self.counters["batches"] += 1
+            self.counters["batched_texts"] += len(texts)
+        return vectors
@@ -0,0 +1,11 @@
+import os
+
+
+def get_embedding_function():
+    """The document and query embedder: Google's embedding-001, or the offline hasher with EMBEDDING_BACKEND=local."""
+    #embedders pull in langchain; import them on first use, not at module import
+    if os.getenv("EMBEDDING_BACKEND") == "local":
+        from local_embeddings import HashingEmbeddings
+        return HashingEmbeddings()
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(model="models/embedding-001")
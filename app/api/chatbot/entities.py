@@ -0,0 +1,206 @@
+"""Travel entities (city, country, category, airline) found in text.
+
+One token trie holds every phrase: the cities, countries, airlines, car
+types and hotel names from generate_mock_data.py, plus the cities, airport
+names and IATA codes in public/airports.json. A single left-to-right pass
+takes the longest phrase at each position, so a question costs microseconds
+regardless of vocabulary size.
+
+Ingestion tags each chunk with one boolean metadata flag per entity it
+mentions (`city_london`, `category_flight`, ...): Chroma metadata is
+scalar-only and a chunk may mention several cities. At query time the same
+matcher turns a question into a Chroma `where` filter over those flags:
+every named place or airline is required, but the categories are ORed, since
+"flights to Paris and where to stay" wants flight or hotel rows, and no
+single row is both.
+"""
+import importlib.util
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+AIRPORTS_PATH = os.path.join(REPO_ROOT, "public", "airports.json")
+MOCK_DATA_PATH = os.path.join(REPO_ROOT, "generate_mock_data.py")
+
+CATEGORY_WORDS = {
+    "flight": ["flight", "flights", "fly", "flying", "airline", "airlines", "airfare", "plane"],
+    "car": ["car", "cars", "rental", "rentals", "rent"],
+    "hotel": ["hotel", "hotels", "stay", "room", "rooms", "night", "nights", "accommodation"],
+}
+HOTEL_SUFFIXES = ["Grand Hotel", "Inn", "Suites", "Plaza", "Palace"]
+# airports.json spells out countries the mock data abbreviates
+COUNTRY_ALIASES = {"United States": "USA", "United Kingdom": "UK", "United Arab Emirates": "UAE"}
+AIRPORT_SUFFIXES = (" International Airport", " Airport")
+
+# how a phrase must be written to count: any case, Capitalised, or UPPERCASE (IATA codes).
+# PROPER is Capitalised and, for a single word, not the first word of a sentence: "Split the bill".
+ANY, TITLE, PROPER, UPPER = "any", "title", "proper", "upper"
+
+# letters and digits in any script: "Whatì" is one word, not "What" + "ì"
+_WORD = re.compile(r"[^\W_]+")
+_SENTENCE_END = re.compile(r"[.!?]")
+_IATA = re.compile(r"[A-Z]{3}$")
+
+
+def words(text: str) -> List[str]:
+    """The word tokens spans() positions refer to."""
+    return _WORD.findall(text)
+
+
+def slug(value: str) -> str:
+    return re.sub(r"[\W_]+", "_", value.lower()).strip("_")
+
+
+def flag(kind: str, value: str) -> str:
+    """Metadata key for an entity, e.g. flag("city", "Cape Town") == "city_cape_town"."""
+    return f"{kind}_{slug(value)}"
+
+
+def load_mock_data():
+    """The generate_mock_data module (vocabulary and table schemas), imported without writing a PDF."""
+    spec = importlib.util.spec_from_file_location("generate_mock_data", MOCK_DATA_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+
+class EntityMatcher:
+    def __init__(self):
+        self._trie: Dict = {}
+
+    def add(self, phrase: str, kind: str, value: str, case: str = ANY):
+        words = _WORD.findall(phrase)
+        if not words:
+            return
+        node = self._trie
+        for word in words:
+            node = node.setdefault(word.lower(), {})
+        entities = node.setdefault(None, [])
+        if (kind, value, case) not in entities:
+            entities.append((kind, value, case))
+
+    @classmethod
+    def load(cls, airports_path: str = AIRPORTS_PATH) -> "EntityMatcher":
+        matcher = cls()
+        mock = load_mock_data()
+        cities, airlines, car_types = dict(mock.cities), list(mock.airlines), list(mock.car_base_rates)
+        #column labels are capitalised in every table row chunk: "Price" must not become Price, Utah
+        header_words = {w.lower() for columns in mock.tables.values() for c in columns for w in _WORD.findall(c)}
+
+        #airports.json names only count when capitalised, and not as a lone word opening a sentence
+        #("nice", "Split the bill"); IATA codes only when uppercase
+        if os.path.exists(airports_path):
+            with open(airports_path) as f:
+                airports = json.load(f)
+            for airport in airports:
+                city = airport.get("city")
+                if not city:
+                    continue
+                if city.lower() not in header_words:
+                    matcher.add(city, "city", city, PROPER)
+                name = airport.get("name") or ""
+                for suffix in AIRPORT_SUFFIXES:
+                    if name.endswith(suffix):
+                        name = name[:-len(suffix)]
+                        break
+                if name.lower() not in header_words:
+                    matcher.add(name, "city", city, PROPER)
+                if _IATA.match(airport.get("iata") or ""):  # "\\N" marks a missing code
+                    matcher.add(airport["iata"], "city", city, UPPER)
+                country = airport.get("country")
+                if country:
+                    matcher.add(country, "country", COUNTRY_ALIASES.get(country, country), PROPER)
+
+        for city, country in cities.items():
+            matcher.add(city, "city", city)
+            matcher.add(country, "country", country)
+        for airline in airlines:
+            matcher.add(airline, "airline", airline)
+            matcher.add(airline, "category", "flight")
+        for car_type in car_types:
+            matcher.add(car_type, "category", "car")
+        for suffix in HOTEL_SUFFIXES:
+            matcher.add(suffix, "category", "hotel", TITLE)
+        for category, words in CATEGORY_WORDS.items():
+            for word in words:
+                matcher.add(word, "category", category)
+        return matcher
+
+    def spans(self, text: str) -> List[Tuple[str, str, int, int]]:
+        """(kind, value, first word, end word) for every entity occurrence, longest phrase first."""
+        matches = list(_WORD.finditer(text))
+        words = [m.group() for m in matches]
+        found = []
+        i = 0
+        while i < len(words):
+            node, end, entities = self._trie, i, None
+            sentence_start = i == 0 or bool(_SENTENCE_END.search(text, matches[i - 1].end(), matches[i].start()))
+            for j in range(i, len(words)):
+                node = node.get(words[j].lower())
+                if node is None:
+                    break
+                matched = [e for e in node.get(None, ()) if _written_as(words[i:j + 1], e[2], sentence_start)]
+                #the mock data vocabulary (any case) wins over airports.json, e.g. "SUV" is a car, not an IATA code
+                matched = [e for e in matched if e[2] == ANY] or matched
+                if matched:
+                    end, entities = j + 1, matched
+            if entities is None:
+                i += 1
+                continue
+            found.extend((kind, value, i, end) for kind, value, _ in entities)
+            i = end
+        return found
+
+    def find(self, text: str) -> List[Tuple[str, str]]:
+        """(kind, value) for every distinct entity in text, in order of appearance."""
+        return list(dict.fromkeys((kind, value) for kind, value, _, _ in self.spans(text)))
+
+    def tags(self, text: str) -> Dict[str, bool]:
+        """Metadata flags for a chunk of text."""
+        return {flag(kind, value): True for kind, value in self.find(text)}
+
+    def where(self, question: str) -> Optional[dict]:
+        """Chroma `where` filter for the entities in the question, or None if there are none.
+
+        Each city, country, airport or airline is required; the categories
+        mentioned are alternatives.
+        """
+        found = self.find(question)
+        categories = [{flag(kind, value): True} for kind, value in found if kind == "category"]
+        clauses = [{flag(kind, value): True} for kind, value in found if kind != "category"]
+        if len(categories) > 1:
+            clauses.insert(0, {"$or": categories})
+        else:
+            clauses[:0] = categories
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _written_as(words: List[str], case: str, sentence_start: bool = False) -> bool:
+    if case == UPPER:
+        return all(w.isupper() for w in words)
+    if case == PROPER and len(words) == 1 and sentence_start:
+        return False
+    if case in (TITLE, PROPER):
+        return all(w[0].isupper() or not w[0].isalpha() for w in words if len(w) > 2)
+    return True
+
+
+def where_clauses(where: Optional[dict]) -> List[List[Tuple[str, object]]]:
+    """A filter built by EntityMatcher.where as ANDed groups of ORed (key, value) equality pairs."""
+    if not where:
+        return []
+    if "$and" in where:
+        return [group for clause in where["$and"] for group in where_clauses(clause)]
+    if "$or" in where:
+        return [[pair for clause in where["$or"] for group in where_clauses(clause) for pair in group]]
+    return [[pair] for pair in where.items()]
+
+
+def metadata_matches(metadata: dict, where: Optional[dict]) -> bool:
+    return all(any(metadata.get(key) == value for key, value in group) for group in where_clauses(where))
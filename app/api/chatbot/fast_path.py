@@ -0,0 +1,224 @@
+"""Answer structured travel lookups straight from the travel tables.
+
+"cheapest flight from London to Tokyo in August", "SUV rental in Dubai" or
+"flight GL984" name a table and the slots to filter it by, so they need one
+indexed SQL query, not retrieval plus a model call. parse() only returns a
+Lookup when every word of the question is either a slot it fills (city,
+airline, category, month, flight number) or on a short list of filler words
+("show", "from", "cheapest", ...). Anything else - "cancel", "baggage",
+"under 500", a date, a country, two categories, a city with no direction -
+means the question asks for more than a table lookup, and it goes down the
+normal RAG path instead.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from entities import HOTEL_SUFFIXES, EntityMatcher, words
+
+
+MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august",
+          "september", "october", "november", "december"]
+CHEAPEST = {"cheapest", "lowest"}
+PRICIEST = {"priciest", "highest"}
+ORIGIN_WORDS = {"from", "leaving", "departing"}
+DESTINATION_WORDS = {"to", "into", "arriving"}
+# words a lookup may contain besides its slots; "how" only in "how much", "expensive" only after most / least
+FILLER_WORDS = {
+    "a", "an", "the", "in", "at", "for", "with", "of", "is", "are", "s", "there", "any", "all",
+    "show", "me", "list", "find", "get", "give", "what", "which", "i", "need", "want", "please",
+    "can", "you", "how", "much", "cost", "costs", "price", "prices", "fare", "fares", "rate", "rates",
+    "options", "available", "cheap", "budget", "most", "least", "expensive",
+} | CHEAPEST | PRICIEST | ORIGIN_WORDS | DESTINATION_WORDS
+LIST_LIMIT = 5
+FLIGHT_NUMBER = re.compile(r"[A-Za-z]{2}\d{3}")
+
+
+@dataclass
+class Lookup:
+    category: str                 # flight / car / hotel
+    filters: List[Tuple[str, object]] = field(default_factory=list)
+    month: Optional[int] = None
+    order: str = "asc"            # by adult price
+    limit: int = LIST_LIMIT
+
+
+TABLES = {
+    "flight": ("flights", "departure_date", "adult_price"),
+    "car": ("cars", "rental_start", "adult_price"),
+    "hotel": ("hotels", "check_in", "adult_price_per_night"),
+}
+NOUNS = {"flight": ("flight", "flights"), "car": ("car rental", "car rentals"), "hotel": ("hotel stay", "hotel stays")}
+
+
+class FastPath:
+    def __init__(self, matcher: EntityMatcher, car_types: List[str]):
+        self.matcher = matcher
+        self.car_types = car_types
+
+    def parse(self, question: str) -> Optional[Lookup]:
+        original = words(question)
+        tokens = [w.lower() for w in original]
+        text = " ".join(tokens)
+
+        spans = self.matcher.spans(question)
+        if any(kind == "country" for kind, _, _, _ in spans):
+            return None  # the tables are filtered by city; a country would be silently dropped
+        covered = {i for _, _, start, end in spans for i in range(start, end)}
+        flight_numbers = [i for i, word in enumerate(original) if FLIGHT_NUMBER.fullmatch(word)]
+        if len(flight_numbers) > 1:
+            return None
+        covered.update(flight_numbers)
+        #"may" is only a month when capitalised or after "in": "which flights may I take" is not a lookup
+        months = [i for i, token in enumerate(tokens)
+                  if token in MONTHS and (token != "may" or original[i] == "May" or (i and tokens[i - 1] == "in"))]
+        if len(months) > 1:
+            return None
+        covered.update(months)
+        #an unparsed number or date ("under 500", "2025-12-01") or any other word is a constraint we cannot apply
+        if any(i not in covered and token not in FILLER_WORDS for i, token in enumerate(tokens)):
+            return None
+        if "how" in tokens and "how much" not in text:
+            return None
+        if "expensive" in tokens and "most expensive" not in text and "least expensive" not in text:
+            return None
+
+        categories = {value for kind, value, _, _ in spans if kind == "category"}
+        flight_number = original[flight_numbers[0]].upper() if flight_numbers else None
+        if flight_number:
+            categories.add("flight")
+        if len(categories) != 1:
+            return None
+        category = categories.pop()
+        cities = [(value, start) for kind, value, start, _ in spans if kind == "city"]
+        airlines = [value for kind, value, _, _ in spans if kind == "airline"]
+
+        lookup = Lookup(category)
+        if PRICIEST.intersection(tokens) or "most expensive" in text:
+            lookup.limit, lookup.order = 1, "desc"
+        elif CHEAPEST.intersection(tokens) or "least expensive" in text:
+            lookup.limit = 1
+        lookup.month = MONTHS.index(tokens[months[0]]) + 1 if months else None
+
+        if category == "flight":
+            if not self._flight_slots(lookup, tokens, cities, airlines, flight_number):
+                return None
+        elif airlines:
+            return None
+        else:
+            if len(set(c for c, _ in cities)) != 1:
+                return None
+            city = cities[0][0]
+            lookup.filters.append(("city", city))
+            if category == "car":
+                types = [t for t in self.car_types if t.lower() in tokens]
+                if len(types) > 1:
+                    return None
+                if types:
+                    lookup.filters.append(("car_type", types[0]))
+            else:
+                padded = f" {text} "
+                names = [f"{city} {s}" for s in HOTEL_SUFFIXES if f" {city} {s} ".lower() in padded]
+                if len(names) > 1:
+                    return None
+                if names:
+                    lookup.filters.append(("hotel_name", names[0]))
+                elif any(f" {s.lower()} " in padded for s in HOTEL_SUFFIXES):
+                    return None  # "Grand Hotel in Paris" names a hotel that is not "<city> Grand Hotel"
+        return lookup
+
+    def _flight_slots(self, lookup, tokens, cities, airlines, flight_number) -> bool:
+        if flight_number:
+            lookup.filters.append(("flight_number", flight_number))
+        origin = destination = None
+        unplaced = []
+        for city, start in cities:
+            before = tokens[start - 1] if start else ""
+            if before in ORIGIN_WORDS and origin is None:
+                origin = city
+            elif before in DESTINATION_WORDS and destination is None:
+                destination = city
+            else:
+                unplaced.append(city)
+        #"London to Tokyo": the unmarked city takes the free end
+        if len(unplaced) == 1 and (origin is None) != (destination is None):
+            origin, destination = (unplaced[0], destination) if origin is None else (origin, unplaced[0])
+            unplaced = []
+        if unplaced or (origin is None and destination is None and not flight_number):
+            return False
+        if origin:
+            lookup.filters.append(("origin_city", origin))
+        if destination:
+            lookup.filters.append(("destination_city", destination))
+        if len(set(airlines)) == 1:
+            lookup.filters.append(("airline", airlines[0]))
+        elif airlines:
+            return False
+        return True
+
+    def sql(self, lookup: Lookup):
+        table, date_column, price_column = TABLES[lookup.category]
+        where = [f"{column} = ?" for column, _ in lookup.filters]
+        params = [value for _, value in lookup.filters]
+        if lookup.month:
+            where.append(f"CAST(strftime('%m', {date_column}) AS INTEGER) = ?")
+            params.append(lookup.month)
+        sql = f"SELECT * FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {price_column} {'DESC' if lookup.order == 'desc' else 'ASC'}, {date_column} LIMIT ?"
+        return sql, params + [lookup.limit]
+
+    def answer(self, query, lookup: Lookup):
+        """(answer text, source chunk IDs) for a parsed lookup, or None if query() has no tables.
+
+        query(sql, params) returns rows as dicts (VectorStore.query_travel).
+        """
+        rows = query(*self.sql(lookup))
+        if rows is None:
+            return None
+        if not rows:
+            return f"I couldn't find any {describe(lookup)} in our travel data.", []
+        lines = [format_row(lookup.category, row) for row in rows]
+        if lookup.limit == 1:
+            superlative = "most expensive" if lookup.order == "desc" else "cheapest"
+            message = f"The {superlative} {describe(lookup, plural=False)} is {lines[0]}."
+        elif len(rows) == 1:
+            message = f"I found one {describe(lookup, plural=False)}: {lines[0]}."
+        else:
+            message = f"Here are the {len(rows)} lowest-priced {describe(lookup)}:\n" + "\n".join(f"- {l}" for l in lines)
+        return message, [row["chunk_id"] for row in rows]
+
+
+def describe(lookup: Lookup, plural: bool = True) -> str:
+    parts = [NOUNS[lookup.category][1 if plural else 0]]
+    filters = dict(lookup.filters)
+    if "car_type" in filters:
+        parts.insert(0, filters["car_type"])
+    if "flight_number" in filters:
+        parts.append(f"numbered {filters['flight_number']}")
+    if "origin_city" in filters:
+        parts.append(f"from {filters['origin_city']}")
+    if "destination_city" in filters:
+        parts.append(f"to {filters['destination_city']}")
+    if "hotel_name" in filters:
+        parts.append(f"at {filters['hotel_name']}")
+    elif "city" in filters:
+        parts.append(f"in {filters['city']}")
+    if "airline" in filters:
+        parts.append(f"with {filters['airline']}")
+    if lookup.month:
+        parts.append(f"in {MONTHS[lookup.month - 1].capitalize()}")
+    return " ".join(parts)
+
+
+def format_row(category: str, row: dict) -> str:
+    if category == "flight":
+        return (f"{row['airline']} {row['flight_number']} from {row['origin_city']} to {row['destination_city']}, "
+                f"departing {row['departure_date']} and returning {row['return_date']}, "
+                f"adult price {row['adult_price']}, child price {row['child_price']}")
+    if category == "car":
+        return (f"a {row['car_type']} in {row['city']} from {row['rental_start']} to {row['rental_end']}, "
+                f"adult price {row['adult_price']}, child price {row['child_price']}")
+    return (f"{row['hotel_name']} in {row['city']}, {row['check_in']} to {row['check_out']}, "
+            f"{row['adult_price_per_night']} per adult per night, {row['child_price_per_night']} per child per night")
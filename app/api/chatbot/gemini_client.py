@@ -0,0 +1,193 @@
+import asyncio
+import json
+import os
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+
+from tracing import SPAN_KIND_CLIENT, annotate, end_span, fail_span, span, start_span
+
+
+BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/models")
+REQUEST_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5"))
+
+# Same policy as the old Retry(total=3, backoff_factor=1, status_forcelist=[502, 503, 504]).
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 1
+RETRY_BACKOFF_MAX = 120
+RETRY_STATUS_FORCELIST = {502, 503, 504}
+# generateContent is a POST: only retry errors raised before the request reached the model. A read
+# timeout or a dropped response fails at once so the hedge and circuit breaker see it.
+RETRY_TRANSPORT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY", "30"))
+
+
+def _http2_available() -> bool:
+    if os.getenv("GEMINI_HTTP2", "1") == "0":
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def backoff_delay(errors: int) -> float:
+    """urllib3 backoff: no wait before the first retry, then factor * 2**(n-1)."""
+    if errors <= 1:
+        return 0
+    return min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_FACTOR * 2 ** (errors - 1))
+
+
+def _retry_after(resp: httpx.Response) -> float:
+    try:
+        return max(0.0, float(resp.headers.get("Retry-After", 0)))
+    except ValueError:
+        return 0.0
+
+
+class GeminiClient:
+    """One pooled, keep-alive HTTP client for every model call in the process."""
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        max_connections: int = MAX_CONNECTIONS,
+        max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY,
+        timeout: float = REQUEST_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        # transport lets tests serve stub_gemini.create_app() in-process (httpx.ASGITransport)
+        self.base_url = base_url
+        self._client = httpx.AsyncClient(
+            transport=transport,
+            http2=_http2_available() and transport is None,
+            timeout=httpx.Timeout(timeout, connect=min(timeout, CONNECT_TIMEOUT)),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            headers={"Content-Type": "application/json"},
+        )
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def call_gemini(self, model_name: str, prompt: str, api_key: str) -> str:
+        """Attempt a single-model call with retries; raise HTTPException on failure."""
+        url = f"{self.base_url}/{model_name}:generateContent?key={api_key}"
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+
+        errors = 0
+        with span("call_gemini", model=model_name):
+            while True:
+                with span("gemini.request", SPAN_KIND_CLIENT, model=model_name, attempt=errors + 1) as attempt:
+                    try:
+                        resp = await self._client.post(url, json=payload)
+                    except RETRY_TRANSPORT_ERRORS as e:
+                        fail_span(attempt, e)
+                        resp = None
+                    except httpx.TransportError as e:
+                        fail_span(attempt, e)
+                        raise HTTPException(503, f"Model {model_name} failed: {type(e).__name__}")
+                    except Exception as e:
+                        raise HTTPException(500, f"Unexpected error calling model {model_name}: {e}")
+                    if resp is not None:
+                        annotate(attempt, **{"http.status_code": resp.status_code})
+                        if not resp.is_success:
+                            fail_span(attempt, f"HTTP {resp.status_code}")
+
+                if resp is not None and resp.status_code not in RETRY_STATUS_FORCELIST:
+                    break
+                errors += 1
+                if errors > RETRY_TOTAL:
+                    raise HTTPException(503, f"Model {model_name} busy or timed out.")
+                delay = backoff_delay(errors) if resp is None else max(backoff_delay(errors), _retry_after(resp))
+                with span("retry.backoff", model=model_name, retry=errors, delay=delay):
+                    await asyncio.sleep(delay)
+
+            if not resp.is_success:
+                raise HTTPException(503, f"Model {model_name} error {resp.status_code}: {resp.text}")
+
+            return _candidate_text(resp.json())
+
+    async def stream_gemini(self, model_name: str, prompt: str, api_key: str):
+        """Yield answer text as the model produces it.
+
+        Retries follow the same policy as call_gemini, but only until the
+        response starts; once text has been yielded the stream is not replayed.
+        """
+        url = f"{self.base_url}/{model_name}:streamGenerateContent?alt=sse&key={api_key}"
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+
+        errors = 0
+        started = False
+        #spans are ended explicitly: a generator cannot hold the current-span context across yields
+        call = start_span("stream_gemini", model=model_name)
+        try:
+            while True:
+                attempt = start_span("gemini.request", SPAN_KIND_CLIENT, parent=call,
+                                     model=model_name, attempt=errors + 1)
+                try:
+                    async with self._client.stream("POST", url, json=payload) as resp:
+                        annotate(attempt, **{"http.status_code": resp.status_code})
+                        if resp.status_code in RETRY_STATUS_FORCELIST:
+                            fail_span(attempt, f"HTTP {resp.status_code}")
+                            retry_after = _retry_after(resp)
+                        elif not resp.is_success:
+                            body = (await resp.aread()).decode(errors="replace")
+                            raise HTTPException(503, f"Model {model_name} error {resp.status_code}: {body}")
+                        else:
+                            async for line in resp.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                text = _candidate_text(json.loads(line[5:]))
+                                if text:
+                                    started = True
+                                    yield text
+                            return
+                except RETRY_TRANSPORT_ERRORS as e:
+                    fail_span(attempt, e)
+                    retry_after = 0.0
+                except httpx.TransportError as e:
+                    fail_span(attempt, e)
+                    if started:
+                        raise HTTPException(503, f"Model {model_name} stream interrupted.")
+                    raise HTTPException(503, f"Model {model_name} failed: {type(e).__name__}")
+                except HTTPException as e:
+                    fail_span(attempt, e.detail)
+                    raise
+                except Exception as e:
+                    fail_span(attempt, e)
+                    raise HTTPException(500, f"Unexpected error calling model {model_name}: {e}")
+                finally:
+                    end_span(attempt)
+
+                errors += 1
+                if errors > RETRY_TOTAL:
+                    fail_span(call, "retries exhausted")
+                    raise HTTPException(503, f"Model {model_name} busy or timed out.")
+                delay = max(backoff_delay(errors), retry_after)
+                backoff = start_span("retry.backoff", parent=call, model=model_name, retry=errors, delay=delay)
+                await asyncio.sleep(delay)
+                end_span(backoff)
+        except asyncio.CancelledError:
+            fail_span(call, "cancelled")
+            raise
+        finally:
+            end_span(call)
+
+
+def _candidate_text(data: dict) -> str:
+    return "".join(
+        part.get("text", "")
+        for cand in data.get("candidates", [])
+        for part in cand.get("content", {}).get("parts", [])
+    )
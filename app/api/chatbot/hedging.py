@@ -0,0 +1,169 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from metrics import FALLBACK_DEPTH, MODEL_ATTEMPTS, MODEL_RESULTS
+
+
+@dataclass
+class HedgePolicy:
+    """When to start the next model candidate and when to stop trying a sick one."""
+
+    hedge_delay: float = 4.0
+    min_hedge_delay: float = 0.25
+    latency_multiplier: float = 2.0
+    max_parallel: int = 2
+    failure_threshold: int = 3
+    open_seconds: float = 30.0
+    latency_alpha: float = 0.2
+
+    @classmethod
+    def from_env(cls) -> "HedgePolicy":
+        return cls(
+            hedge_delay=float(os.getenv("HEDGE_DELAY", cls.hedge_delay)),
+            min_hedge_delay=float(os.getenv("HEDGE_MIN_DELAY", cls.min_hedge_delay)),
+            latency_multiplier=float(os.getenv("HEDGE_LATENCY_MULTIPLIER", cls.latency_multiplier)),
+            max_parallel=int(os.getenv("HEDGE_MAX_PARALLEL", cls.max_parallel)),
+            failure_threshold=int(os.getenv("BREAKER_FAILURE_THRESHOLD", cls.failure_threshold)),
+            open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", cls.open_seconds)),
+        )
+
+
+class ModelHealth:
+    """Circuit breaker plus a moving-average latency for one model."""
+
+    def __init__(self, policy: HedgePolicy):
+        self.policy = policy
+        self.latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.opened_until = 0.0
+
+    def is_open(self, now: float) -> bool:
+        return now < self.opened_until
+
+    def hedge_after(self) -> float:
+        if self.latency is None:
+            return self.policy.hedge_delay
+        budget = self.latency * self.policy.latency_multiplier
+        return max(self.policy.min_hedge_delay, min(self.policy.hedge_delay, budget))
+
+    def record_success(self, latency: float):
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.opened_until = 0.0
+        if self.latency is None:
+            self.latency = latency
+        else:
+            alpha = self.policy.latency_alpha
+            self.latency = alpha * latency + (1 - alpha) * self.latency
+
+    def record_failure(self, now: float):
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.policy.failure_threshold:
+            # Also re-opens straight away when the half-open trial call fails.
+            self.opened_until = now + self.policy.open_seconds
+
+    def snapshot(self, now: float) -> dict:
+        return {
+            "state": "open" if self.is_open(now) else "closed",
+            "latency_ewma": self.latency,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+
+class ModelRouter:
+    """Hedged fallback across model candidates, in preference order.
+
+    The first healthy model starts at once. If it has not answered within its
+    latency budget, the next one starts alongside it (up to max_parallel); a
+    failure starts the next one immediately. The first good answer wins and
+    the remaining calls are cancelled. Models with an open circuit are skipped.
+
+    A call that also succeeded but lost (it finished in the same round as
+    the winner, or before it could be cancelled) has its result passed to
+    `discard`, so results that hold resources, such as open streams, get closed.
+    """
+
+    def __init__(self, models: List[str], policy: Optional[HedgePolicy] = None):
+        self.models = list(models)
+        self.policy = policy or HedgePolicy()
+        self.health: Dict[str, ModelHealth] = {m: ModelHealth(self.policy) for m in self.models}
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        return {m: h.snapshot(now) for m, h in self.health.items()}
+
+    async def call(self, fn: Callable[[str], Awaitable], discard: Optional[Callable[[object], Awaitable]] = None):
+        """Run fn(model) with hedging; return (model, result) or raise the last error."""
+        now = time.monotonic()
+        candidates = [m for m in self.models if not self.health[m].is_open(now)]
+        if not candidates:
+            raise HTTPException(503, "All models are temporarily unavailable.")
+
+        pending: Dict[asyncio.Task, str] = {}
+        started: Dict[str, float] = {}
+        last_exc: Optional[BaseException] = None
+        next_idx = 0
+
+        def launch(reason: str):
+            nonlocal next_idx
+            model = candidates[next_idx]
+            next_idx += 1
+            MODEL_ATTEMPTS.inc(model=model, reason=reason)
+            started[model] = time.monotonic()
+            pending[asyncio.create_task(fn(model))] = model
+            return model
+
+        latest = launch("first")
+        try:
+            while pending:
+                can_hedge = next_idx < len(candidates) and len(pending) < self.policy.max_parallel
+                timeout = None
+                if can_hedge:
+                    deadline = started[latest] + self.health[latest].hedge_after()
+                    timeout = max(0.0, deadline - time.monotonic())
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    latest = launch("hedge")
+                    continue
+
+                for task in done:
+                    model = pending.pop(task)
+                    finished = time.monotonic()
+                    exc = task.exception()
+                    if exc is None:
+                        self.health[model].record_success(finished - started[model])
+                        MODEL_RESULTS.inc(model=model, outcome="success")
+                        FALLBACK_DEPTH.observe(self.models.index(model))
+                        return model, task.result()
+                    self.health[model].record_failure(finished)
+                    MODEL_RESULTS.inc(model=model, outcome="failure")
+                    last_exc = exc
+
+                if next_idx < len(candidates) and len(pending) < self.policy.max_parallel:
+                    latest = launch("fallback")
+        finally:
+            losers = list(pending)
+            for task in losers:
+                if not task.done():
+                    task.cancel()
+                    MODEL_RESULTS.inc(model=pending[task], outcome="cancelled")
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
+                if discard is not None:
+                    for task in losers:
+                        if not task.cancelled() and task.exception() is None:
+                            await discard(task.result())
+
+        raise last_exc
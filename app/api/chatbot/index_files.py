@@ -0,0 +1,21 @@
+import os
+
+
+def open_versioned(persist_directory: str, filename: str, index_version: str, opener):
+    """opener(path) for a file populate_database publishes next to Chroma, if it matches index_version.
+
+    A missing file, one the opener rejects with ValueError, or one stamped with
+    another index version gives None, so the caller falls back to Chroma.
+    """
+    path = os.path.join(persist_directory, filename)
+    if not os.path.exists(path):
+        return None
+    try:
+        opened = opener(path)
+    except ValueError as e:
+        print(f"Ignoring {path}: {e}")
+        return None
+    if opened.index_version != index_version:
+        print(f"Ignoring {path}: built for index version {opened.index_version}, not {index_version}")
+        return None
+    return opened
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+
+
+MANIFEST_FILE = "manifest.json"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IndexManifest:
+    """What has been indexed: per source file its stat, content hash and chunk hashes.
+
+    A file whose mtime and size match is skipped without being read. If only
+    the stat changed but the content hash matches, it is still skipped. When
+    the chunking signature differs from the one recorded, every file counts
+    as changed so its chunks are rebuilt.
+    """
+
+    def __init__(self, path: str, files: dict = None, chunking: str = None):
+        self.path = path
+        self.files = files or {}
+        self.chunking = chunking
+
+    @classmethod
+    def load(cls, persist_directory: str, chunking: str = None) -> "IndexManifest":
+        path = os.path.join(persist_directory, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return cls(path, chunking=chunking)
+        with open(path) as f:
+            data = json.load(f)
+        files = data.get("files", {})
+        if chunking is not None and data.get("chunking") != chunking:
+            print(f"Chunking changed ({data.get('chunking')} -> {chunking}); re-indexing every source")
+            #keep the entries (so removed files are still noticed) but force a re-read
+            files = {source: {**entry, "sha256": None, "mtime_ns": None} for source, entry in files.items()}
+        return cls(path, files, chunking)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"files": self.files, "chunking": self.chunking}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def classify(self, source: str):
+        """Return (changed, file hash or None) for a source file on disk."""
+        st = os.stat(source)
+        entry = self.files.get(source)
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            return False, entry["sha256"]
+        sha = file_sha256(source)
+        if entry and entry["sha256"] == sha:
+            entry["mtime_ns"], entry["size"] = st.st_mtime_ns, st.st_size
+            return False, sha
+        return True, sha
+
+    def record(self, source: str, sha: str, chunk_hashes: dict):
+        st = os.stat(source)
+        self.files[source] = {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "sha256": sha,
+            "chunks": dict(chunk_hashes),
+        }
+
+    def forget(self, source: str):
+        self.files.pop(source, None)
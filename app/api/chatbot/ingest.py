@@ -0,0 +1,263 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional
+
+from langchain.schema.document import Document
+from pypdf import PdfReader
+
+
+PAGES_PER_TASK = 8
+TABLE_SUFFIXES = (".csv", ".jsonl", ".parquet")
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is free."""
+
+    def __init__(self, rate_per_second: float, capacity: Optional[float] = None):
+        self.rate = rate_per_second
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_second)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_for = (tokens - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+@dataclass
+class IngestReport:
+    committed_batches: int = 0
+    committed_chunks: int = 0
+    failed_batches: int = 0
+    failed_ids: List[str] = field(default_factory=list)
+
+
+def _parse_page_range(source: str, start: int, end: int) -> List[Document]:
+    reader = PdfReader(source)
+    total = len(reader.pages)
+    return [
+        Document(
+            page_content=reader.pages[page].extract_text(),
+            metadata={"source": source, "page": page, "total_pages": total},
+        )
+        for page in range(start, min(end, total))
+    ]
+
+
+def iter_pdf_pages(sources: Iterable[str], processes: int = 2,
+                   pages_per_task: int = PAGES_PER_TASK) -> Iterator[Document]:
+    """Yield PDF pages in order, parsed on a process pool a few page ranges ahead."""
+    def tasks():
+        for source in sources:
+            total = len(PdfReader(source).pages)
+            for start in range(0, total, pages_per_task):
+                yield source, start, start + pages_per_task
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = deque()
+        for task in tasks():
+            pending.append(pool.submit(_parse_page_range, *task))
+            if len(pending) >= processes * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def read_table_file(source: str) -> List[dict]:
+    """Rows of a CSV / JSONL / Parquet table as {column: value} with plain Python values.
+
+    Integers and floats stay numbers, empty cells are None, and dates (Parquet
+    date32, or timestamps) become ISO date strings, the form the PDF tables
+    print them in.
+    """
+    import pandas as pd
+
+    if source.endswith(".csv"):
+        df = pd.read_csv(source)
+    elif source.endswith(".jsonl"):
+        df = pd.read_json(source, lines=True, convert_dates=False, dtype=False)
+    elif source.endswith(".parquet"):
+        df = pd.read_parquet(source)
+    else:
+        raise ValueError(f"Not a table file: {source}")
+    return [{column: _plain_value(value) for column, value in row.items()} for row in df.to_dict("records")]
+
+
+def _plain_value(value):
+    if value is None or value != value:  # NaN / NaT: an empty cell
+        return None
+    if hasattr(value, "item"):  # numpy scalar
+        value = value.item()
+    if hasattr(value, "isoformat"):
+        if getattr(value, "hour", 0) or getattr(value, "minute", 0) or getattr(value, "second", 0):
+            return value.isoformat()
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class _StageError:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+_STAGE_DONE = object()
+
+
+def prefetch(items: Iterable, maxsize: int) -> Iterator:
+    """Run a pipeline stage on its own thread, at most maxsize items ahead of the consumer."""
+    buffer = queue.Queue(maxsize=maxsize)
+
+    def produce():
+        try:
+            for item in items:
+                buffer.put(item)
+            buffer.put(_STAGE_DONE)
+        except BaseException as e:
+            buffer.put(_StageError(e))
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is _STAGE_DONE:
+            return
+        if isinstance(item, _StageError):
+            raise item.exc
+        yield item
+
+
+def batched(chunks: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class IngestEngine:
+    """Embeds chunks in batches on a worker pool and commits each batch as it finishes.
+
+    Embedding calls share a token bucket (requests per minute). A batch that
+    still fails after max_retries is recorded and skipped; everything
+    committed before it stays in Chroma, so a re-run only has to embed what is
+    missing. Progress is written to a small checkpoint file after every batch.
+    """
+
+    def __init__(
+        self,
+        db,
+        embedding_function,
+        batch_size: int = 64,
+        workers: int = 4,
+        requests_per_minute: float = 0,
+        max_retries: int = 3,
+        checkpoint_path: Optional[str] = None,
+    ):
+        self.db = db
+        self.embedding_function = embedding_function
+        self.batch_size = batch_size
+        self.workers = workers
+        self.bucket = TokenBucket(requests_per_minute / 60.0)
+        self.max_retries = max_retries
+        self.checkpoint_path = checkpoint_path
+
+    def run(self, chunks: Iterable[Document]) -> IngestReport:
+        report = IngestReport()
+        self._announce_resume()
+        max_in_flight = self.workers * 2
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = {}
+            for batch in batched(chunks, self.batch_size):
+                while len(in_flight) >= max_in_flight:
+                    self._collect(in_flight, report)
+                in_flight[pool.submit(self._embed_with_retry, batch)] = batch
+            while in_flight:
+                self._collect(in_flight, report)
+        self._write_checkpoint(report, finished=True)
+        return report
+
+    def _collect(self, in_flight, report: IngestReport):
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        # Batches that finished together commit in submission order. With several workers a later batch
+        # can still commit before an earlier one; a re-run embeds whatever IDs Chroma is missing, so order
+        # does not matter for resuming.
+        for future in [f for f in in_flight if f in done]:
+            batch = in_flight.pop(future)
+            try:
+                embeddings = future.result()
+            except Exception as e:
+                report.failed_batches += 1
+                report.failed_ids.extend(c.metadata["id"] for c in batch)
+                print(f"⚠️ Batch of {len(batch)} chunks failed: {e}")
+                continue
+            self._commit(batch, embeddings)
+            report.committed_batches += 1
+            report.committed_chunks += len(batch)
+            self._write_checkpoint(report, finished=False)
+            print(f"Committed batch {report.committed_batches} ({report.committed_chunks} chunks)")
+
+    def _embed_with_retry(self, batch: List[Document]):
+        texts = [chunk.page_content for chunk in batch]
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                return self.embedding_function.embed_documents(texts)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(2 ** attempt)
+
+    def _commit(self, batch: List[Document], embeddings):
+        # Single writer: only the coordinating thread touches Chroma.
+        self.db._collection.upsert(
+            ids=[chunk.metadata["id"] for chunk in batch],
+            embeddings=[list(map(float, e)) for e in embeddings],
+            metadatas=[chunk.metadata for chunk in batch],
+            documents=[chunk.page_content for chunk in batch],
+        )
+
+    def _announce_resume(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path) as f:
+            previous = json.load(f)
+        if not previous.get("finished"):
+            print(
+                f"Resuming interrupted ingestion: {previous.get('committed_chunks', 0)} chunks "
+                "were already committed and will be skipped"
+            )
+
+    def _write_checkpoint(self, report: IngestReport, finished: bool):
+        if not self.checkpoint_path:
+            return
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "committed_batches": report.committed_batches,
+                "committed_chunks": report.committed_chunks,
+                "failed_batches": report.failed_batches,
+                "finished": finished,
+                "updated": time.time(),
+            }, f)
+        os.replace(tmp_path, self.checkpoint_path)
@@ -0,0 +1,146 @@
+"""BM25 inverted index over the chunk texts, for exact tokens embeddings blur.
+
+Flight numbers (AI123), airline and city names match here even when the
+embedding of a question lands elsewhere. populate_database builds it next to
+the mmap export with the same index version; the API searches it alongside
+the vectors and fuses both rankings with reciprocal rank fusion.
+
+Stored as one .npz of plain arrays (no pickle): the vocabulary, CSR postings
+(term -> chunk rows and term frequencies), chunk lengths and chunk IDs.
+"""
+import os
+import re
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from index_files import open_versioned
+
+
+LEXICAL_FILE = "bm25.npz"
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = int(os.getenv("RRF_K", "60"))
+# An identifier-like query term (letters and digits, e.g. flight number ai123) found in at most
+# this many chunks is a precise hit.
+PRECISE_MAX_DF = int(os.getenv("PRECISE_MAX_DF", "3"))
+# With an entity filter, keyword search ranks k * FILTER_OVERSAMPLE chunks so that enough are left after filtering.
+FILTER_OVERSAMPLE = int(os.getenv("LEXICAL_FILTER_OVERSAMPLE", "20"))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_IDENTIFIER = re.compile(r"(?=.*[a-z])(?=.*[0-9])")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    def __init__(self, ids: Sequence[str], terms: Sequence[str], offsets: np.ndarray,
+                 rows: np.ndarray, frequencies: np.ndarray, lengths: np.ndarray, index_version: str):
+        self.ids = list(ids)
+        self.index_version = index_version
+        self.vocabulary: Dict[str, int] = {term: i for i, term in enumerate(terms)}
+        self.terms = list(terms)
+        self.offsets = offsets
+        self.rows = rows
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.average_length = float(lengths.mean()) if len(lengths) else 0.0
+        # length normalisation does not depend on the query, so it is computed once
+        self._norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(self.average_length, 1e-9))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids: Sequence[str], documents: Sequence[str], index_version: str) -> "BM25Index":
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths = np.zeros(len(ids), dtype=np.int32)
+        for row, text in enumerate(documents):
+            tokens = tokenize(text or "")
+            lengths[row] = len(tokens)
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[row] = counts.get(row, 0) + 1
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(postings[t]) for t in terms], out=offsets[1:])
+        rows = np.empty(offsets[-1], dtype=np.int32)
+        frequencies = np.empty(offsets[-1], dtype=np.float32)
+        for i, term in enumerate(terms):
+            rows[offsets[i]:offsets[i + 1]] = list(postings[term])
+            frequencies[offsets[i]:offsets[i + 1]] = list(postings[term].values())
+        return cls(ids, terms, offsets, rows, frequencies, lengths, index_version)
+
+    def save(self, path: str):
+        """Write to a temporary file, then atomically replace `path`."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                ids=np.array(self.ids, dtype=str),
+                terms=np.array(self.terms, dtype=str),
+                offsets=self.offsets,
+                rows=self.rows,
+                frequencies=self.frequencies,
+                lengths=self.lengths,
+                index_version=np.array(self.index_version),
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["ids"].tolist(), data["terms"].tolist(), data["offsets"], data["rows"],
+                       data["frequencies"], data["lengths"], str(data["index_version"]))
+
+    def _postings(self, term: str):
+        i = self.vocabulary.get(term)
+        if i is None:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.rows[start:end], self.frequencies[start:end]
+
+    def search(self, query: str, k: int = 5):
+        """Top-k (chunk ID, BM25 score, precise) for the query.
+
+        precise is True for chunks containing an identifier-like query term
+        that occurs in at most PRECISE_MAX_DF chunks.
+        """
+        if not len(self):
+            return []
+        scores = np.zeros(len(self), dtype=np.float32)
+        precise_rows = set()
+        for term in set(tokenize(query)):
+            postings = self._postings(term)
+            if postings is None:
+                continue
+            rows, tf = postings
+            df = len(rows)
+            idf = np.log(1 + (len(self) - df + 0.5) / (df + 0.5))
+            scores[rows] += idf * tf * (BM25_K1 + 1) / (tf + self._norms[rows])
+            if df <= PRECISE_MAX_DF and _IDENTIFIER.match(term):
+                precise_rows.update(rows.tolist())
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        top = matched[np.argsort(-scores[matched])[:k]]
+        return [(self.ids[i], float(scores[i]), int(i) in precise_rows) for i in top]
+
+
+def open_lexical_index(persist_directory: str, index_version: str):
+    """The BM25 index, if present and built for this index version."""
+    return open_versioned(persist_directory, LEXICAL_FILE, index_version, BM25Index.load)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[str]:
+    """Merge ranked ID lists: each ID scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,245 @@
+"""Replay recorded chat requests against the chatbot API.
+
+Each JSONL line is a GenerateRequest payload ({"messages": [...]}), a
+captured record with a "question", or any record with a "title"/"body"
+text, which is sent as the question.
+
+Closed loop (fixed concurrency) against a running server:
+
+    python app/api/chatbot/loadgen.py requests.jsonl --mode closed --concurrency 16 --duration 30
+
+Open loop (Poisson arrivals) against a freshly spawned API and stub Gemini:
+
+    python app/api/chatbot/loadgen.py requests.jsonl --spawn --mode open --rate 50 \
+        --stub-latency 0.5 --stub-error-rate 0.05
+
+Reports throughput, status counts and latency percentiles, overall and per
+pipeline stage (from the API's Server-Timing header).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+from timing import parse_server_timing
+
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+
+
+def load_payloads(path: str):
+    payloads = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "messages" in record:
+                payloads.append({"messages": record["messages"]})
+                continue
+            question = record.get("question") or record.get("title") or record.get("body")
+            if question:
+                payloads.append({"messages": [{"role": "user", "content": question}]})
+    if not payloads:
+        raise SystemExit(f"No replayable requests in {path}")
+    return payloads
+
+
+class Results:
+    def __init__(self):
+        self.latencies = []
+        self.first_token = []
+        self.stages = {}
+        self.statuses = {}
+        self.errors = 0
+
+    def record(self, status, latency, server_timing=None, first_token=None):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status != 200:
+            self.errors += 1
+            return
+        self.latencies.append(latency)
+        if first_token is not None:
+            self.first_token.append(first_token)
+        for stage, ms in parse_server_timing(server_timing or "").items():
+            self.stages.setdefault(stage, []).append(ms / 1000)
+
+
+def summarize(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {"count": len(ordered), "p50": pick(0.5), "p90": pick(0.9), "p95": pick(0.95),
+            "p99": pick(0.99), "max": round(ordered[-1] * 1000, 2)}
+
+
+async def send(client, url, payload, stream, results, started):
+    try:
+        if stream:
+            async with client.stream("POST", f"{url}/generate/stream", json=payload) as resp:
+                first = None
+                async for line in resp.aiter_lines():
+                    if first is None and line.startswith("event: token"):
+                        first = time.perf_counter() - started
+                results.record(resp.status_code, time.perf_counter() - started,
+                               resp.headers.get("server-timing"), first)
+        else:
+            resp = await client.post(f"{url}/generate", json=payload)
+            results.record(resp.status_code, time.perf_counter() - started,
+                           resp.headers.get("server-timing"))
+    except httpx.HTTPError as e:
+        results.record(type(e).__name__, time.perf_counter() - started)
+
+
+def next_payload(payloads, counter, bust_cache):
+    n = next(counter)
+    payload = payloads[n % len(payloads)]
+    if not bust_cache:
+        return payload
+    messages = [dict(m) for m in payload["messages"]]
+    messages[-1]["content"] = f"{messages[-1]['content']} (#{n})"
+    return {"messages": messages}
+
+
+async def closed_loop(args, url, payloads, results):
+    counter = itertools.count()
+    issued = itertools.count(1)
+    deadline = time.perf_counter() + args.duration
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                if args.requests and next(issued) > args.requests:
+                    return
+                payload = next_payload(payloads, counter, args.bust_cache)
+                await send(client, url, payload, args.stream, results, time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+
+async def open_loop(args, url, payloads, results):
+    counter = itertools.count()
+    rng = random.Random(args.seed)
+    tasks = []
+    async with httpx.AsyncClient(timeout=args.timeout, limits=httpx.Limits(max_connections=None)) as client:
+        start = time.perf_counter()
+        scheduled = start
+        while scheduled - start < args.duration and (not args.requests or len(tasks) < args.requests):
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            payload = next_payload(payloads, counter, args.bust_cache)
+            # latency counts from the scheduled arrival, so a slow server cannot hide queueing
+            tasks.append(asyncio.create_task(send(client, url, payload, args.stream, results, scheduled)))
+            gap = rng.expovariate(args.rate) if args.arrival == "poisson" else 1 / args.rate
+            scheduled += gap
+        await asyncio.gather(*tasks)
+
+
+def spawn_servers(args):
+    """Start stub Gemini and the chatbot API as subprocesses; return (url, processes)."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    stub = subprocess.Popen([
+        sys.executable, os.path.join(here, "stub_gemini.py"),
+        "--port", str(args.stub_port),
+        "--latency", str(args.stub_latency),
+        "--jitter", str(args.stub_jitter),
+        "--error-rate", str(args.stub_error_rate),
+    ])
+    env = {
+        **os.environ,
+        "GEMINI_BASE_URL": f"http://127.0.0.1:{args.stub_port}/v1beta/models",
+        "GENAI_API_KEY": os.getenv("GENAI_API_KEY", "stub"),
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.api.chatbot.app:app",
+         "--port", str(args.api_port), "--log-level", "warning", "--workers", str(args.api_workers)],
+        cwd=REPO_ROOT,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{args.api_port}"
+    for _ in range(240):
+        try:
+            if httpx.get(f"{url}/ready", timeout=1).status_code == 200:
+                return url, [api, stub]
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    for proc in (api, stub):
+        proc.terminate()
+    raise SystemExit("Chatbot API did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", nargs="?", default=os.path.join(REPO_ROOT, "requests.jsonl"))
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed loop: concurrent clients.")
+    parser.add_argument("--rate", type=float, default=10, help="Open loop: arrivals per second.")
+    parser.add_argument("--arrival", choices=["poisson", "uniform"], default="poisson")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run.")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests.")
+    parser.add_argument("--stream", action="store_true", help="Use /generate/stream and time the first token.")
+    parser.add_argument("--bust-cache", action="store_true", help="Make every question unique.")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write the report as JSON.")
+    parser.add_argument("--spawn", action="store_true", help="Start the API and a stub Gemini locally.")
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--api-workers", type=int, default=1)
+    parser.add_argument("--stub-port", type=int, default=8500)
+    parser.add_argument("--stub-latency", type=float, default=0.5)
+    parser.add_argument("--stub-jitter", type=float, default=0.1)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.input)
+    url, processes = args.url, []
+    if args.spawn:
+        url, processes = spawn_servers(args)
+
+    results = Results()
+    try:
+        started = time.perf_counter()
+        runner = closed_loop if args.mode == "closed" else open_loop
+        asyncio.run(runner(args, url, payloads, results))
+        elapsed = time.perf_counter() - started
+    finally:
+        for proc in processes:
+            proc.terminate()
+
+    completed = sum(results.statuses.values())
+    report = {
+        "mode": args.mode,
+        "concurrency": args.concurrency if args.mode == "closed" else None,
+        "rate": args.rate if args.mode == "open" else None,
+        "elapsed_s": round(elapsed, 2),
+        "requests": completed,
+        "throughput_rps": round(completed / elapsed, 2) if elapsed else 0,
+        "error_rate": round(results.errors / completed, 4) if completed else 0,
+        "statuses": {str(k): v for k, v in results.statuses.items()},
+        "latency_ms": summarize(results.latencies),
+        "first_token_ms": summarize(results.first_token),
+        "stages_ms": {stage: summarize(v) for stage, v in results.stages.items()},
+    }
+    print(json.dumps(report, indent=1))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
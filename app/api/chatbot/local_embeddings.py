@@ -0,0 +1,44 @@
+import hashlib
+import re
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic offline embedder for tests, benchmarks and load runs.
+
+    Words and character trigrams are hashed into a fixed-size signed vector
+    which is then L2-normalized, so texts that share tokens land close
+    together. No network calls; the same text always gives the same vector.
+    """
+
+    def __init__(self, size: int = 768):
+        self.size = size
+        self.model = f"local-hashing-{size}"
+
+    def _features(self, text: str):
+        words = re.findall(r"\w+", text.lower())
+        for word in words:
+            yield word, 1.0
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for feature, weight in self._features(text):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+            sign = 1.0 if digest & 1 else -1.0
+            vector[(digest >> 1) % self.size] += sign * weight
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str, **kwargs) -> List[float]:
+        return self._embed(text)
@@ -0,0 +1,175 @@
+"""tracemalloc-based memory reports for the API and the ingester.
+
+MemoryTracker records, per named stage, the peak of Python allocations
+(tracemalloc) and the peak RSS (a sampler thread reading /proc/self/statm),
+and can list the top allocation sites and their growth since the previous
+snapshot. memory_stage() is a no-op unless a tracker has been activated, so
+code paths can be annotated unconditionally. Stages may nest: an outer
+stage's peak includes its inner stages'.
+
+A tracker only stops tracemalloc if it started it, so tracing enabled by
+PYTHONTRACEMALLOC or by someone else keeps running.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>",
+                 "<unknown>")
+
+_active: Optional["MemoryTracker"] = None
+
+
+def current_rss() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss(children: bool = False) -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _filtered(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces([tracemalloc.Filter(False, name) for name in IGNORED_FILES])
+
+
+def _site(stat) -> str:
+    frame = stat.traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+class MemoryTracker:
+    def __init__(self, frames: int = 1, sample_interval: float = 0.02):
+        self.frames = frames
+        self.sample_interval = sample_interval
+        self.stages = {}
+        self._stage = None
+        self._stage_rss = 0
+        # tracemalloc has one resettable peak; peaks of finished inner stages are carried here for the outer one
+        self._carried_peak = 0
+        self._started_tracing = False
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        global _active
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start(self.frames)
+        self._previous = _filtered(tracemalloc.take_snapshot())
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample_rss, name="rss-sampler", daemon=True)
+        self._sampler.start()
+        _active = self
+
+    def stop(self):
+        global _active
+        if _active is self:
+            _active = None
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _sample_rss(self):
+        while not self._stop.wait(self.sample_interval):
+            rss = current_rss()
+            if rss is not None and self._stage is not None:
+                self._stage_rss = max(self._stage_rss, rss)
+
+    @contextmanager
+    def stage(self, name: str):
+        outer, outer_rss = self._stage, self._stage_rss
+        outer_peak = max(self._carried_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._carried_peak = 0
+        self._stage, self._stage_rss = name, current_rss() or 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            python_peak = max(tracemalloc.get_traced_memory()[1], self._carried_peak)
+            rss_end = current_rss()
+            self.stages[name] = {
+                "seconds": round(time.perf_counter() - start, 3),
+                "python_peak_bytes": python_peak,
+                "rss_peak_bytes": max(self._stage_rss, rss_end or 0) or None,
+                "rss_end_bytes": rss_end,
+            }
+            self._stage, self._stage_rss = outer, max(outer_rss, self._stage_rss)
+            self._carried_peak = max(outer_peak, python_peak)
+
+    def report(self, top: int = 20) -> dict:
+        """Top allocation sites now and the biggest growth since the previous report."""
+        snapshot = _filtered(tracemalloc.take_snapshot())
+        current, peak = tracemalloc.get_traced_memory()
+        growth = snapshot.compare_to(self._previous, "lineno") if self._previous else []
+        self._previous = snapshot
+        return {
+            "rss_bytes": current_rss(),
+            "peak_rss_bytes": peak_rss(),
+            "children_peak_rss_bytes": peak_rss(children=True),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "stages": dict(self.stages),
+            "top_sites": [
+                {"site": _site(stat), "bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:top]
+            ],
+            "growth": [
+                {"site": _site(stat), "bytes_diff": stat.size_diff, "count_diff": stat.count_diff,
+                 "bytes": stat.size}
+                for stat in growth[:top] if stat.size_diff
+            ],
+        }
+
+
+def active_tracker() -> Optional[MemoryTracker]:
+    return _active
+
+
+@contextmanager
+def memory_stage(name: str):
+    if _active is None:
+        yield
+        return
+    with _active.stage(name):
+        yield
+
+
+def _mb(n: Optional[int]) -> str:
+    return f"{n / 2**20:9.1f} MB" if n is not None else "        n/a"
+
+
+def format_report(report: dict) -> str:
+    lines = ["Memory by stage:", f"  {'stage':<20}{'seconds':>9}{'py peak':>13}{'RSS peak':>13}{'RSS end':>13}"]
+    for name, stage in report["stages"].items():
+        lines.append(f"  {name:<20}{stage['seconds']:>9}{_mb(stage['python_peak_bytes']):>13}"
+                     f"{_mb(stage['rss_peak_bytes']):>13}{_mb(stage['rss_end_bytes']):>13}")
+    lines.append(f"Peak RSS: {_mb(report['peak_rss_bytes']).strip()}"
+                 f" (largest child process: {_mb(report['children_peak_rss_bytes']).strip()})")
+    lines.append("Top allocation sites:")
+    lines.extend(f"  {_mb(site['bytes'])}  {site['count']:>8}  {site['site']}" for site in report["top_sites"])
+    if report["growth"]:
+        lines.append("Growth since the previous snapshot:")
+        lines.extend(f"  {_mb(site['bytes_diff'])}  {site['count_diff']:>+8}  {site['site']}" for site in report["growth"])
+    return "\n".join(lines)
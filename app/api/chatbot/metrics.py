@@ -0,0 +1,141 @@
+"""Process-local metrics in the Prometheus text exposition format.
+
+Updating a metric is a dict lookup and an add, so instrumentation can stay
+on in production. Labels are passed as keyword arguments; every metric keeps
+one value (or bucket row) per distinct label set.
+"""
+import bisect
+import time
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (500, 1000, 2000, 4000, 8000, 16000, 32000)
+REGISTRY = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(key) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        REGISTRY.append(self)
+
+    def header(self):
+        help = self.help.replace("\\", "\\\\").replace("\n", "\\n")
+        return [f"# HELP {self.name} {help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self.values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        return self.header() + [f"{self.name}{_labels(k)} {v}" for k, v in self.values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            #per-bucket counts (non-cumulative), sum, count
+            series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = self.header()
+        for key, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_labels(key)} {count}")
+        return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUESTS = Counter("chatbot_requests_total", "HTTP requests by path and status.")
+REQUEST_SECONDS = Histogram("chatbot_request_seconds", "Time until the response started, by path.")
+IN_FLIGHT = Gauge("chatbot_requests_in_flight",
+                  "Requests not yet responding, by path (streams count until their first byte).")
+STAGE_SECONDS = Histogram("chatbot_stage_seconds", "Duration of each generate() stage.")
+CACHE_RESULTS = Counter("chatbot_answer_cache_total", "Answer cache lookups by result.")
+CONTEXT_CHARS = Histogram("chatbot_context_chars", "Characters of retrieved context in the prompt.",
+                          buckets=SIZE_BUCKETS)
+MODEL_ATTEMPTS = Counter("chatbot_model_attempts_total", "Model calls started, by model and reason.")
+MODEL_RESULTS = Counter("chatbot_model_results_total", "Model calls finished, by model and outcome.")
+STRUCTURED_ANSWERS = Counter("chatbot_structured_answers_total",
+                             "Questions answered from the travel tables without the LLM, by category.")
+CAPTURES = Counter("chatbot_captures_total",
+                   "Sampled requests written to the capture file, or dropped because its queue was full.")
+FALLBACK_DEPTH = Histogram("chatbot_fallback_depth",
+                           "Position in the candidate list of the model that answered (0 = preferred).",
+                           buckets=(0, 1, 2, 3))
+
+INSTRUMENTED_PATHS = ("/generate", "/generate/stream")
+
+
+async def metrics_middleware(request, call_next):
+    path = request.url.path
+    if path not in INSTRUMENTED_PATHS:
+        return await call_next(request)
+
+    IN_FLIGHT.inc(path=path)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        IN_FLIGHT.dec(path=path)
+        REQUEST_SECONDS.observe(time.perf_counter() - started, path=path)
+        REQUESTS.inc(path=path, status=status)
+        timer = getattr(request.state, "timer", None)
+        if timer is not None:
+            for stage, seconds in timer.stages.items():
+                STAGE_SECONDS.observe(seconds, stage=stage)
+        cache = getattr(request.state, "cache", None)
+        if cache is not None:
+            CACHE_RESULTS.inc(result=cache)
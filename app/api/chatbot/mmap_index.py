@@ -0,0 +1,264 @@
+"""Single-file, memory-mapped copy of the vector index.
+
+populate_database exports the collection here after every change, and API
+workers map it read-only: vectors and texts are read straight from the page
+cache, so N workers share one copy and a new worker has nothing to load.
+
+Layout (little-endian; every section starts on a 64-byte boundary):
+
+    magic     8 bytes   b"CHATIDX\\0"
+    hlen      uint32    length of the JSON header that follows
+    header    JSON      format, index_version, count, dim, dtype, scan_dtype
+                        and {offset, length} for each section below
+    vectors   count x dim float32
+    norms     count float32 (squared L2 norms)
+    scan      count x dim int8, only when scan_dtype is int8
+    scales    count float32, int8 only: x ~= scan * scale
+    ids / documents / metadatas
+              string tables: (count + 1) uint64 offsets, then a UTF-8 blob
+              (metadatas are JSON objects)
+
+With scan_dtype int8, searches scan the `scan` matrix and only read
+full-precision `vectors` rows to rescore the best candidates: the pages that
+stay hot are 4x smaller, but the file grows by a quarter (the float32 copy
+stays) and each scan costs about 2x the CPU of a float32 one, because every
+block is upcast before the matrix product. It is for collections whose
+vectors no longer fit the page cache, not a speed-up. (float16 was dropped:
+without hardware conversion the upcast made scans about 27x slower.)
+
+The export streams the collection page by page (vectors go straight to
+their fixed offsets, strings through temporary spill files), so populate
+does not hold the collection in memory.
+
+A new index is written to a temporary file and published with os.replace, so
+readers see either the old file or the new one. A reader keeps its mapping
+(and thus the old inode) until it reopens.
+"""
+import itertools
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from typing import Iterable, List
+
+import numpy as np
+
+
+MMAP_FILE = "index.mmap"
+MAGIC = b"CHATIDX\0"
+FORMAT_VERSION = 1
+ALIGN = 64
+VECTOR_DTYPES = ("float32", "int8")
+
+
+def _pad(f):
+    f.write(b"\0" * (-f.tell() % ALIGN))
+
+
+def _aligned(position: int) -> int:
+    return position + (-position % ALIGN)
+
+
+def quantize_int8(matrix: np.ndarray):
+    """Symmetric per-vector int8 quantization: returns (codes, scales)."""
+    scales = (np.abs(matrix).max(axis=1) / 127).astype("<f4") if len(matrix) else np.zeros(0, "<f4")
+    safe = np.where(scales > 0, scales, 1)[:, None]
+    codes = np.clip(np.rint(matrix / safe), -127, 127).astype("i1")
+    return codes, scales
+
+
+class _StringSpill:
+    """A string table built page by page: offsets in memory, the UTF-8 blob in a temporary file."""
+
+    def __init__(self, count: int):
+        self.offsets = np.zeros(count + 1, dtype="<u8")
+        self.blob = tempfile.TemporaryFile()
+        self.written = 0
+
+    def extend(self, values: List[str]):
+        for value in values:
+            data = value.encode("utf-8")
+            self.blob.write(data)
+            self.offsets[self.written + 1] = self.offsets[self.written] + len(data)
+            self.written += 1
+
+    def copy_to(self, f) -> dict:
+        _pad(f)
+        start = f.tell()
+        f.write(self.offsets.tobytes())
+        self.blob.seek(0)
+        shutil.copyfileobj(self.blob, f)
+        self.blob.close()
+        return {"offset": start, "length": f.tell() - start}
+
+
+def write_mmap_index_pages(path: str, pages: Iterable[tuple], count: int, index_version: str,
+                           vector_dtype: str = "float32"):
+    """Write the index from (ids, vectors, documents, metadatas) pages, then atomically replace `path`.
+
+    count is the total number of rows the pages hold. Vector sections have a
+    fixed size, so each page is written straight to its place in the file;
+    strings go to temporary spill files and are appended at the end. Memory
+    stays at one page whatever the collection size.
+
+    vector_dtype picks what searches scan: float32, or an int8 copy stored
+    next to the float32 vectors used for rescoring.
+    """
+    if vector_dtype not in VECTOR_DTYPES:
+        raise ValueError(f"Unknown vector dtype {vector_dtype!r}; use {', '.join(VECTOR_DTYPES)}.")
+    pages = iter(pages)
+    first = next(pages, None)
+    dim = int(np.asarray(first[1]).reshape(len(first[0]), -1).shape[1]) if first and len(first[0]) else 0
+    # Sections are written after a fixed-size header slot, then the header is filled in.
+    header_slot = 4096
+    layout = [("vectors", 4 * dim), ("norms", 4)]
+    if vector_dtype == "int8":
+        layout += [("scan", dim), ("scales", 4)]
+    sections, position = {}, header_slot
+    for name, row_bytes in layout:
+        sections[name] = {"offset": position, "length": count * row_bytes}
+        position = _aligned(position + count * row_bytes)
+    strings = {name: _StringSpill(count) for name in ("ids", "documents", "metadatas")}
+
+    tmp_path = f"{path}.tmp"
+    written = 0
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * header_slot)
+        for ids, vectors, documents, metadatas in itertools.chain([first] if first else [], pages):
+            if written + len(ids) > count:
+                raise ValueError(f"pages hold more than the {count} rows announced")
+            matrix = np.asarray(vectors, dtype="<f4").reshape(len(ids), dim)
+            arrays = {"vectors": matrix, "norms": np.einsum("ij,ij->i", matrix, matrix).astype("<f4")}
+            if vector_dtype == "int8":
+                arrays["scan"], arrays["scales"] = quantize_int8(matrix)
+            for name, row_bytes in layout:
+                f.seek(sections[name]["offset"] + written * row_bytes)
+                f.write(np.ascontiguousarray(arrays[name]).tobytes())
+            strings["ids"].extend(ids)
+            strings["documents"].extend([d or "" for d in documents])
+            strings["metadatas"].extend([json.dumps(m or {}) for m in metadatas])
+            written += len(ids)
+        if written != count:
+            raise ValueError(f"pages hold {written} rows, expected {count}")
+        f.seek(position)
+        for name, spill in strings.items():
+            sections[name] = spill.copy_to(f)
+        header = json.dumps({
+            "format": FORMAT_VERSION,
+            "index_version": index_version,
+            "count": count,
+            "dim": dim,
+            "dtype": "float32",
+            "scan_dtype": vector_dtype,
+            "sections": sections,
+        }).encode("utf-8")
+        if len(MAGIC) + 4 + len(header) > header_slot:
+            raise ValueError("mmap index header does not fit its slot")
+        f.seek(0)
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_mmap_index(path: str, ids: List[str], vectors, documents: List[str],
+                     metadatas: List[dict], index_version: str, vector_dtype: str = "float32"):
+    """write_mmap_index_pages for rows already in memory."""
+    write_mmap_index_pages(path, [(ids, vectors, documents, metadatas)], len(ids), index_version, vector_dtype)
+
+
+class _StringTable:
+    def __init__(self, buffer, section: dict, count: int):
+        self.offsets = np.frombuffer(buffer, dtype="<u8", count=count + 1, offset=section["offset"])
+        self.base = section["offset"] + (count + 1) * 8
+        self.buffer = buffer
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return bytes(self.buffer[self.base + start:self.base + end]).decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class MmapIndex:
+    """Read-only, zero-copy view of a file written by write_mmap_index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a chatbot mmap index")
+        (header_length,) = struct.unpack_from("<I", buffer, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(buffer[start:start + header_length]))
+        if self.header["format"] != FORMAT_VERSION:
+            raise ValueError(f"{path} has format {self.header['format']}, expected {FORMAT_VERSION}")
+
+        self.index_version = self.header["index_version"]
+        self.count = self.header["count"]
+        self.dim = self.header["dim"]
+        sections = self.header["sections"]
+        self.vectors = np.frombuffer(buffer, dtype="<f4", count=self.count * self.dim,
+                                     offset=sections["vectors"]["offset"]).reshape(self.count, self.dim)
+        self.norms = np.frombuffer(buffer, dtype="<f4", count=self.count, offset=sections["norms"]["offset"])
+        # Files written before quantization existed scan the float32 vectors.
+        self.scan_dtype = self.header.get("scan_dtype", "float32")
+        self.scan = self.vectors
+        self.scales = None
+        if self.scan_dtype not in VECTOR_DTYPES:
+            raise ValueError(f"{path} scans {self.scan_dtype}, which is no longer supported; re-run populate_database")
+        if self.scan_dtype == "int8":
+            self.scan = np.frombuffer(buffer, dtype="i1", count=self.count * self.dim,
+                                      offset=sections["scan"]["offset"]).reshape(self.count, self.dim)
+            self.scales = np.frombuffer(buffer, dtype="<f4", count=self.count, offset=sections["scales"]["offset"])
+        self.ids = _StringTable(buffer, sections["ids"], self.count)
+        self.documents = _StringTable(buffer, sections["documents"], self.count)
+        self._metadatas = _StringTable(buffer, sections["metadatas"], self.count)
+
+    def __len__(self):
+        return self.count
+
+    def metadata(self, i: int) -> dict:
+        return json.loads(self._metadatas[i])
+
+
+def iter_collection(collection, page_size: int = 5000):
+    """Yield (ids, float32 vectors, documents, metadatas) pages of a Chroma collection."""
+    for offset in range(0, collection.count(), page_size):
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        vectors = np.asarray(page["embeddings"], dtype=np.float32).reshape(len(page["ids"]), -1)
+        yield page["ids"], vectors, page["documents"], page["metadatas"]
+
+
+def read_collection(collection, page_size: int = 5000):
+    """Return (ids, vectors, documents, metadatas) for a whole Chroma collection, read in pages."""
+    ids, vectors, documents, metadatas = [], [], [], []
+    for page_ids, page_vectors, page_documents, page_metadatas in iter_collection(collection, page_size):
+        ids.extend(page_ids)
+        vectors.append(page_vectors)
+        documents.extend(page_documents)
+        metadatas.extend(page_metadatas)
+    return ids, np.concatenate(vectors) if vectors else np.zeros((0, 0), np.float32), documents, metadatas
+
+
+def read_scan_dtype(path: str):
+    """scan_dtype of an existing index file, or None if there is no readable one."""
+    try:
+        return MmapIndex(path).scan_dtype
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def export_collection(collection, path: str, index_version: str, vector_dtype: str = "float32") -> int:
+    """Dump a Chroma collection (vectors, texts, metadata) into a new mmap index file, one page at a time."""
+    count = collection.count()
+    write_mmap_index_pages(path, iter_collection(collection), count, index_version, vector_dtype)
+    return count
@@ -7,88 +7,302 @@ load_dotenv(dotenv_path)
 
 import argparse
 import shutil
-from langchain_community.document_loaders import PyPDFDirectoryLoader
+from pathlib import Path
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain.schema.document import Document
 from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+from embeddings import get_embedding_function
+from entities import EntityMatcher, load_mock_data
+from index_manifest import IndexManifest, chunk_sha256
+from ingest import TABLE_SUFFIXES, IngestEngine, iter_pdf_pages, prefetch, read_table_file
+from memory_report import MemoryTracker, format_report, memory_stage
+from lexical_index import LEXICAL_FILE, BM25Index
+from mmap_index import MMAP_FILE, VECTOR_DTYPES, MmapIndex, export_collection, read_scan_dtype
+from table_splitter import TableRowSplitter
+from travel_store import TRAVEL_FILE, build_travel_store
+from vector_store import new_index_version, write_index_version
 
 
 CHROMA_PATH = "chroma"
 DATA_PATH = "data"
+CHECKPOINT_FILE = "ingest_checkpoint.json"
+PAGE_QUEUE_SIZE = 64
+ROWS_PER_CHUNK = 1
 
 
-def get_embedding_function():
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    return embeddings
-
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--reset", action="store_true", help="Reset the database.")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per embedding call.")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel embedding calls.")
+    parser.add_argument("--requests-per-minute", type=float, default=0,
+                        help="Embedding call rate limit (0 = unlimited).")
+    parser.add_argument("--processes", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Processes parsing PDFs.")
+    parser.add_argument("--rows-per-chunk", type=int, default=ROWS_PER_CHUNK,
+                        help="Table rows per chunk for the travel tables.")
+    parser.add_argument("--vector-dtype", choices=VECTOR_DTYPES, default="float32",
+                        help="What API searches scan. int8 keeps 4x fewer bytes hot but scans about 2x slower "
+                             "and grows the export; use it only when vectors outgrow the page cache. "
+                             "RETRIEVER=auto or mmap searches an int8 export at any size; RETRIEVER=exact "
+                             "or hnsw ignores it.")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="Trace allocations and print peak memory per stage.")
     args = parser.parse_args()
+    if not args.memory_report:
+        return populate(args)
+
+    tracker = MemoryTracker()
+    tracker.start()
+    try:
+        populate(args)
+    finally:
+        print(format_report(tracker.report(top=10)))
+        tracker.stop()
+
+
+def populate(args):
     if args.reset:
         print("Clearing Database")
         clear_database()
-    documents = load_documents()
-    chunks = split_documents(documents)
-    add_to_chroma(chunks)
+
+    with memory_stage("scan"):
+        file_tables = tables_in_files(list_sources())
+        manifest = IndexManifest.load(CHROMA_PATH, chunking=chunking_signature(args.rows_per_chunk, file_tables))
+        changed, removed = scan_sources(manifest)
+    if not changed and not removed:
+        manifest.save()
+        print("No new documents to add")
+        if needs_export(args.vector_dtype) and os.path.exists(CHROMA_PATH):
+            publish_index(Chroma(persist_directory=CHROMA_PATH, embedding_function=get_embedding_function()),
+                          args.vector_dtype)
+        return
+
+    #pages -> chunks -> batches, streamed so embedding starts while parsing continues
+    chunk_hashes = {source: {} for source, _ in changed}
+    pdf_sources = [source for source, _ in changed if source.endswith(".pdf")]
+    table_sources = [source for source, _ in changed if source.endswith(TABLE_SUFFIXES)]
+    documents = load_documents(pdf_sources, args.processes)
+    chunks = split_documents(documents, args.rows_per_chunk, table_sources, skip_pdf_tables=file_tables)
+    chunks = track_chunk_hashes(tag_entities(calculate_chunk_ids(chunks), EntityMatcher.load()), chunk_hashes)
+    failed_ids = add_to_chroma(
+        chunks,
+        replaced_sources=[source for source, _ in changed] + removed,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        requests_per_minute=args.requests_per_minute,
+        vector_dtype=args.vector_dtype,
+    )
+
+    #only files that were fully indexed go into the manifest
+    for source, sha in changed:
+        if not failed_ids.intersection(chunk_hashes[source]):
+            manifest.record(source, sha, chunk_hashes[source])
+    for source in removed:
+        manifest.forget(source)
+    manifest.save()
+    if failed_ids:
+        raise SystemExit("Some batches failed; re-run to resume from the last committed batch.")
+
+
+def list_sources():
+    suffixes = (".pdf",) + TABLE_SUFFIXES
+    return sorted(str(path) for path in Path(DATA_PATH).glob("**/[!.]*") if path.suffix in suffixes)
+
+
+def scan_sources(manifest: IndexManifest):
+    """Split source files into (changed, removed) against the manifest."""
+    sources = list_sources()
+    changed = []
+    for source in sources:
+        is_changed, sha = manifest.classify(source)
+        if is_changed:
+            changed.append((source, sha))
+    removed = [source for source in manifest.files if source not in sources]
+    print(f"Source files: {len(sources) - len(changed)} unchanged, "
+          f"{len(changed)} new or changed, {len(removed)} removed")
+    return changed, removed
+
+
+def load_documents(sources: list[str], processes: int = 1):
+    """Yield pages of the given PDFs; parsing runs ahead on a process pool."""
+    return prefetch(iter_pdf_pages(sources, processes), PAGE_QUEUE_SIZE)
+
+
+def tables_in_files(sources) -> list:
+    """Titles of the tables that a CSV / JSONL / Parquet file in the data folder supplies."""
+    splitter = TableRowSplitter.from_mock_data(fallback=None)
+    titles = [table[0] for table in (splitter.table_for_file(source) for source in sources
+                                     if source.endswith(TABLE_SUFFIXES)) if table]
+    for title in sorted({t for t in titles if titles.count(t) > 1}):
+        print(f"⚠️ Several files supply {title}; each of their rows will be indexed once per file")
+    return sorted(set(titles))
 
 
-def load_documents():
-    document_loader = PyPDFDirectoryLoader(DATA_PATH)
-    return document_loader.load()
+def chunking_signature(rows_per_chunk: int = ROWS_PER_CHUNK, file_tables=()) -> str:
+    """Changes whenever chunk text or metadata would; the manifest re-indexes every source then.
 
+    Adding or removing a table file changes which PDF rows are indexed, so the tables that
+    come from files are part of the signature.
+    """
+    return f"table-rows:{rows_per_chunk}/entities:2/ids:content/files:{','.join(file_tables)}"
 
-def split_documents(documents: list[Document]):
+
+def split_documents(documents, rows_per_chunk: int = ROWS_PER_CHUNK, table_sources=(), skip_pdf_tables=()):
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=800,
         chunk_overlap=80,
         length_function=len,
         is_separator_regex=False,
     )
-    return text_splitter.split_documents(documents)
+    #table rows become one chunk each (or per rows_per_chunk); other text falls back to the character splitter
+    splitter = TableRowSplitter.from_mock_data(text_splitter, rows_per_chunk, skip_pdf_tables)
+    #CSV / JSONL / Parquet tables are rows already: no PDF parsing, typed cells kept as metadata
+    for source in table_sources:
+        if splitter.table_for_file(source) is None:
+            print(f"⚠️ Skipping {source}: the file name matches none of {', '.join(splitter.tables)}")
+            continue
+        try:
+            chunks = splitter.split_records(source, read_table_file(source))
+        except ValueError as e:
+            print(f"⚠️ Skipping {e}")
+            continue
+        yield from chunks
+    for document in documents:
+        yield from splitter.split_document(document)
+
+
+def tag_entities(chunks, matcher: EntityMatcher):
+    """Add a metadata flag (city_london, category_flight, ...) for every entity a chunk mentions."""
+    for chunk in chunks:
+        chunk.metadata.update(matcher.tags(chunk.page_content))
+        yield chunk
+
 
-def add_to_chroma(chunks: list[Document]):
-    db = Chroma(persist_directory=CHROMA_PATH, embedding_function=get_embedding_function())
-    chunks_with_ids = calculate_chunk_ids(chunks)
-    existing_items = db.get(include=[])
-    existing_ids = set(existing_items["ids"])
+def track_chunk_hashes(chunks, chunk_hashes: dict):
+    for chunk in chunks:
+        chunk_hashes[chunk.metadata["source"]][chunk.metadata["id"]] = chunk.metadata["chunk_hash"]
+        yield chunk
+
+def add_to_chroma(chunks, replaced_sources=(), batch_size=64, workers=4,
+                  requests_per_minute=0, vector_dtype="float32"):
+    """Embed chunks that are not indexed yet and drop vectors the sources no longer produce.
+
+    Chroma always keeps float32 vectors; vector_dtype sets what the exported
+    mmap index scans (float32, or int8 with full-precision rescoring).
+    Chunks already indexed are not re-embedded, but their metadata (page
+    numbers, entity flags) is rewritten in case it moved.
+    Returns the IDs of chunks that could not be embedded.
+    """
+    with memory_stage("open_index"):
+        embedding_function = get_embedding_function()
+        db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
+        existing_items = db.get(include=[])
+        existing_ids = set(existing_items["ids"])
     print(f"Number of existing documents in DB: {len(existing_ids)}")
 
-    new_chunks = []
-    for chunk in chunks_with_ids:
-        if chunk.metadata["id"] not in existing_ids:
-            new_chunks.append(chunk)
+    current_ids = set()
+    moved = []
+    refreshed = 0
+
+    def refresh_metadata():
+        nonlocal refreshed
+        if moved:
+            db._collection.update(ids=[i for i, _ in moved], metadatas=[m for _, m in moved])
+            refreshed += len(moved)
+            moved.clear()
 
-    if len(new_chunks):
-        print(f"👉 Adding new documents: {len(new_chunks)}")
-        new_chunk_ids = [chunk.metadata["id"] for chunk in new_chunks]
-        db.add_documents(new_chunks, ids=new_chunk_ids)
-        db.persist()
+    def new_chunks():
+        #runs on the engine's coordinating thread, the only one writing to Chroma
+        for chunk in chunks:
+            current_ids.add(chunk.metadata["id"])
+            if chunk.metadata["id"] not in existing_ids:
+                yield chunk
+                continue
+            moved.append((chunk.metadata["id"], chunk.metadata))
+            if len(moved) >= batch_size:
+                refresh_metadata()
+        refresh_metadata()
+
+    engine = IngestEngine(
+        db,
+        embedding_function,
+        batch_size=batch_size,
+        workers=workers,
+        requests_per_minute=requests_per_minute,
+        checkpoint_path=os.path.join(CHROMA_PATH, CHECKPOINT_FILE),
+    )
+    #parsing, splitting, embedding and upserts are streamed, so they share one stage
+    with memory_stage("parse_embed_commit"):
+        report = engine.run(new_chunks())
+    failed_ids = set(report.failed_ids)
+    committed = report.committed_chunks
+    if committed or failed_ids:
+        print(f"👉 Added {committed} new documents, {report.failed_batches} batches failed")
     else:
         print("No new documents to add")
 
+    with memory_stage("remove_stale"):
+        stale_ids = []
+        for source in replaced_sources:
+            source_ids = db.get(where={"source": source}, include=[])["ids"]
+            stale_ids.extend(i for i in source_ids if i not in current_ids)
+        if stale_ids:
+            print(f"🗑️ Removing stale documents: {len(stale_ids)}")
+            db.delete(ids=stale_ids)
+
+    if committed or refreshed or stale_ids or needs_export(vector_dtype):
+        publish_index(db, vector_dtype)
+    return failed_ids
+
+
+def needs_export(vector_dtype: str) -> bool:
+    """True when an exported index is missing, or the mmap one has another vector dtype."""
+    return (read_scan_dtype(os.path.join(CHROMA_PATH, MMAP_FILE)) != vector_dtype
+            or not os.path.exists(os.path.join(CHROMA_PATH, LEXICAL_FILE))
+            or not os.path.exists(os.path.join(CHROMA_PATH, TRAVEL_FILE)))
+
+
+def publish_index(db, vector_dtype="float32"):
+    """Export the mmap, BM25 and travel-table indexes, then bump the index version so API workers reopen them."""
+    version = new_index_version()
+    with memory_stage("export_mmap"):
+        path = os.path.join(CHROMA_PATH, MMAP_FILE)
+        count = export_collection(db._collection, path, version, vector_dtype)
+    print(f"Exported {count} {vector_dtype} vectors to {path}")
+    #the keyword index and travel tables read texts back from the export instead of holding the collection
+    index = MmapIndex(path)
+    metadatas = (index.metadata(i) for i in range(len(index)))
+    with memory_stage("build_bm25"):
+        lexical = BM25Index.build(list(index.ids), index.documents, version)
+        lexical.save(os.path.join(CHROMA_PATH, LEXICAL_FILE))
+    print(f"Indexed {len(lexical.terms)} terms for keyword search")
+    with memory_stage("build_travel_store"):
+        rows = build_travel_store(os.path.join(CHROMA_PATH, TRAVEL_FILE), index.ids, index.documents, metadatas,
+                                  load_mock_data().tables, version)
+    print(f"Loaded {rows} table rows into {TRAVEL_FILE}")
+    write_index_version(CHROMA_PATH, version)
+
 
 def calculate_chunk_ids(chunks):
-    last_page_id = None
-    current_chunk_index = 0
+    # IDs come from the source and chunk text only, so an edit only changes the IDs of the chunks it
+    # touches; a page inserted before them moves their page numbers, which add_to_chroma updates in place.
+    seen = {}
     for chunk in chunks:
         source = chunk.metadata.get("source")
-        page = chunk.metadata.get("page")
-        current_page_id = f"{source}:{page}"
-        if current_page_id == last_page_id:
-            current_chunk_index += 1
-        else:
-            current_chunk_index = 0
-        chunk_id = f"{current_page_id}:{current_chunk_index}"
-        last_page_id = current_page_id
-        chunk.metadata["id"] = chunk_id
-    return chunks
+        chunk_hash = chunk_sha256(chunk.page_content)
+        base_id = f"{source}:{chunk_hash[:16]}"
+        duplicate = seen.get(base_id, 0)
+        seen[base_id] = duplicate + 1
+        chunk.metadata["id"] = base_id if not duplicate else f"{base_id}:{duplicate}"
+        chunk.metadata["chunk_hash"] = chunk_hash
+        yield chunk
 
 
 def clear_database():
     if os.path.exists(CHROMA_PATH):
         shutil.rmtree(CHROMA_PATH)
+    write_index_version(CHROMA_PATH)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""In-process sampling CPU profiler that emits flamegraph-ready collapsed stacks.
+
+A sampler thread reads sys._current_frames() at a fixed interval, so the
+running worker can be profiled without a restart or an external tool. The
+output is one `thread;outer;...;inner count` line per distinct stack, ready for
+flamegraph.pl or speedscope.
+"""
+import asyncio
+import os
+import sys
+import threading
+from collections import Counter
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfileSession:
+    """Guards against overlapping profiles and counts requests finished meanwhile."""
+
+    def __init__(self):
+        self.active = False
+        self.finished_requests = 0
+        self._changed = asyncio.Condition()
+
+    async def request_finished(self):
+        if self.active:
+            async with self._changed:
+                self.finished_requests += 1
+                self._changed.notify_all()
+
+    async def run(self, seconds: float, requests: int = 0, interval: float = 0.005) -> SamplingProfiler:
+        """Sample for `seconds`, or until `requests` more /generate calls finish (capped by `seconds`)."""
+        if self.active:
+            raise RuntimeError("A profile is already running.")
+        self.active = True
+        self.finished_requests = 0
+        profiler = SamplingProfiler(interval)
+        profiler.start()
+        try:
+            if requests:
+                async with self._changed:
+                    await asyncio.wait_for(
+                        self._changed.wait_for(lambda: self.finished_requests >= requests), seconds
+                    )
+            else:
+                await asyncio.sleep(seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            profiler.stop()
+            self.active = False
+        return profiler
+
+
+PROFILED_PATHS = ("/generate", "/generate/stream")
+
+
+async def profile_middleware(request, call_next):
+    response = await call_next(request)
+    if request.url.path in PROFILED_PATHS:
+        await request.app.state.profile_session.request_finished()
+    return response
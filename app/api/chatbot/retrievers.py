@@ -0,0 +1,218 @@
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from entities import where_clauses
+from index_files import open_versioned
+from mmap_index import MMAP_FILE, MmapIndex, read_collection
+
+
+RETRIEVER = os.getenv("RETRIEVER", "auto")
+EXACT_SEARCH_MAX_VECTORS = int(os.getenv("EXACT_SEARCH_MAX_VECTORS", "20000"))
+# Quantized scans keep k * RESCORE_OVERSAMPLE candidates for full-precision rescoring.
+RESCORE_OVERSAMPLE = int(os.getenv("RESCORE_OVERSAMPLE", "4"))
+SCAN_BLOCK_ROWS = 8192
+
+
+class HnswRetriever:
+    """Chroma's HNSW index, through the LangChain wrapper."""
+
+    name = "hnsw"
+
+    def __init__(self, db):
+        self.db = db
+
+    def __len__(self):
+        return self.db._collection.count()
+
+    def search(self, embedding, k: int = 5, where: Optional[dict] = None):
+        return self.db.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=where)
+
+    def search_many(self, embeddings, k: int = 5, where: Optional[dict] = None):
+        return [self.search(e, k, where) for e in embeddings]
+
+
+class ExactRetriever:
+    """Every vector in one float32 matrix, searched exhaustively.
+
+    Scores are squared L2 distances, the metric Chroma's collection uses, so
+    results are interchangeable with HnswRetriever (but exact). A `where`
+    filter (see entities.EntityMatcher.where) restricts the scan to the
+    matching rows before any distance is computed.
+    """
+
+    name = "exact"
+
+    def __init__(self, ids: List[str], vectors, documents: List[str], metadatas: List[dict]):
+        from langchain.schema.document import Document
+        self._document = Document
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = [m or {} for m in metadatas]
+        #an empty collection has no dimension to reshape to
+        self.matrix = (np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(self.ids), -1) if self.ids
+                       else np.zeros((0, 0), dtype=np.float32))
+        self.norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        self._flag_rows = None
+
+    @classmethod
+    def from_collection(cls, collection) -> "ExactRetriever":
+        return cls(*read_collection(collection))
+
+    def __len__(self):
+        return len(self.matrix)
+
+    @property
+    def scan_bytes(self) -> int:
+        """Bytes of vectors every search reads."""
+        return self.norms.nbytes + self.matrix.nbytes
+
+    def document_at(self, i: int):
+        return self._document(page_content=self.documents[i], metadata=self.metadatas[i])
+
+    def metadata_at(self, i: int) -> dict:
+        return self.metadatas[i]
+
+    def rows_matching(self, where: dict) -> np.ndarray:
+        """Rows whose metadata satisfies the filter: every group, through any of its clauses."""
+        if self._flag_rows is None:
+            #one pass over the metadata indexes every boolean entity flag
+            flags = {}
+            for i in range(len(self)):
+                for key, value in self.metadata_at(i).items():
+                    if value is True:
+                        flags.setdefault(key, []).append(i)
+            self._flag_rows = {key: np.array(rows, dtype=np.int64) for key, rows in flags.items()}
+        rows = np.arange(len(self))
+        for group in where_clauses(where):
+            matching = rows[:0]
+            for key, value in group:
+                if value is True:
+                    alternative = self._flag_rows.get(key, rows[:0])
+                else:
+                    alternative = np.array([i for i in rows if self.metadata_at(i).get(key) == value], dtype=np.int64)
+                matching = np.union1d(matching, alternative)
+            rows = np.intersect1d(rows, matching, assume_unique=True)
+        return rows
+
+    def search(self, embedding, k: int = 5, where: Optional[dict] = None):
+        return self.search_many([embedding], k, where)[0]
+
+    def search_many(self, embeddings, k: int = 5, where: Optional[dict] = None):
+        """Top-k for a batch of queries with one matrix product."""
+        queries = np.asarray(embeddings, dtype=np.float32)
+        rows = self.rows_matching(where) if where else None
+        count = len(self) if rows is None else len(rows)
+        if not count:
+            return [[] for _ in queries]
+        k = min(k, count)
+        matrix, norms = (self.matrix, self.norms) if rows is None else (self.matrix[rows], self.norms[rows])
+        # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2
+        distances = norms[None, :] - 2 * (queries @ matrix.T)
+        distances += np.einsum("ij,ij->i", queries, queries)[:, None]
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(distances, top):
+            ranked = candidates[np.argsort(row[candidates])]
+            positions = ranked if rows is None else rows[ranked]
+            results.append([(self.document_at(int(i)), float(max(d, 0.0))) for i, d in zip(positions, row[ranked])])
+        return results
+
+
+class MmapRetriever(ExactRetriever):
+    """Exact search over the memory-mapped export; nothing is copied into the process.
+
+    When the export carries an int8 scan matrix, the scan ranks on
+    that and the best k * oversample candidates are rescored against the
+    float32 vectors, so returned scores are still exact squared L2.
+    """
+
+    name = "mmap"
+
+    def __init__(self, index: MmapIndex, oversample: int = RESCORE_OVERSAMPLE):
+        from langchain.schema.document import Document
+        self._document = Document
+        self.index = index
+        self.matrix = index.vectors
+        self.norms = index.norms
+        self.oversample = oversample
+        self._flag_rows = None
+        if index.scan_dtype != "float32":
+            self.name = f"mmap-{index.scan_dtype}"
+
+    def document_at(self, i: int):
+        return self._document(page_content=self.index.documents[i], metadata=self.index.metadata(i))
+
+    def metadata_at(self, i: int) -> dict:
+        return self.index.metadata(i)
+
+    @property
+    def scan_bytes(self) -> int:
+        if self.index.scan_dtype == "float32":
+            return super().scan_bytes
+        scales = self.index.scales.nbytes if self.index.scales is not None else 0
+        return self.norms.nbytes + self.index.scan.nbytes + scales
+
+    def search_many(self, embeddings, k: int = 5, where: Optional[dict] = None):
+        if self.index.scan_dtype == "float32":
+            return super().search_many(embeddings, k, where)
+        queries = np.asarray(embeddings, dtype=np.float32)
+        rows = self.rows_matching(where) if where else None
+        count = len(self) if rows is None else len(rows)
+        if not count:
+            return [[] for _ in queries]
+        k = min(k, count)
+        shortlist = min(k * self.oversample, count)
+        candidates = np.argpartition(self._scan_distances(queries, rows), shortlist - 1, axis=1)[:, :shortlist]
+        results = []
+        for query, picked in zip(queries, candidates):
+            picked = np.sort(picked if rows is None else rows[picked])  # sequential reads from the float32 vectors
+            exact = self.norms[picked] - 2 * (self.matrix[picked] @ query) + query @ query
+            order = np.argsort(exact)[:k]
+            results.append([(self.document_at(int(picked[i])), float(max(exact[i], 0.0))) for i in order])
+        return results
+
+    def _scan_distances(self, queries, rows):
+        """||x||^2 - 2 x.q from the quantized matrix (all rows, or just `rows`), upcast one block at a time."""
+        scan, scales = self.index.scan, self.index.scales
+        count = len(self) if rows is None else len(rows)
+        distances = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, SCAN_BLOCK_ROWS):
+            block = slice(start, start + SCAN_BLOCK_ROWS)
+            picked = block if rows is None else rows[block]
+            dots = queries @ scan[picked].astype(np.float32).T
+            if scales is not None:
+                dots *= scales[picked]
+            distances[:, block] = self.norms[picked] - 2 * dots
+        return distances
+
+
+def open_mmap_index(persist_directory: str, index_version: str):
+    """The exported mmap index, if present and written for this index version."""
+    return open_versioned(persist_directory, MMAP_FILE, index_version, MmapIndex)
+
+
+def select_retriever(db, mode: str = RETRIEVER, max_exact: int = EXACT_SEARCH_MAX_VECTORS,
+                     persist_directory: str = None, index_version: str = None):
+    """mmap / exact / hnsw, or auto.
+
+    auto searches exhaustively while the collection fits under max_exact
+    vectors, on the memory-mapped export when it matches the index version,
+    else on an in-memory copy; above max_exact it uses HNSW, unless the export
+    was written with an int8 scan, which was only built to be searched at
+    that size.
+    """
+    if mode not in ("auto", "mmap", "exact", "hnsw"):
+        raise ValueError(f"Unknown retriever {mode!r}; use auto, mmap, exact or hnsw.")
+    if mode in ("auto", "mmap") and persist_directory:
+        index = open_mmap_index(persist_directory, index_version)
+        if index is not None and (mode == "mmap" or len(index) <= max_exact or index.scan_dtype != "float32"):
+            return MmapRetriever(index)
+        if mode == "mmap":
+            print("No current mmap index; falling back to exact search")
+            mode = "exact"
+    collection = db._collection
+    if mode == "exact" or (mode == "auto" and collection.count() <= max_exact):
+        return ExactRetriever.from_collection(collection)
+    return HnswRetriever(db)
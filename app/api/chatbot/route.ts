@@ -1,27 +1,52 @@
 import { NextResponse } from "next/server";
 
 const PYTHON_API_URL = process.env.PYTHON_API_URL;
+const TRACEPARENT = /^00-[0-9a-f]{32}-[0-9a-f]{16}-[0-9a-f]{2}$/;
+
+// W3C trace context: pass the caller's trace on. This route exports no spans, so it does not
+// start traces itself; without a caller's trace the FastAPI server span is the root.
+function traceHeaders(request: Request): Record<string, string> {
+  const incoming = request.headers.get("traceparent");
+  return incoming && TRACEPARENT.test(incoming) ? { traceparent: incoming } : {};
+}
 
 export async function POST(request: Request) {
   try {
     const { messages } = await request.json();
+    const wantsStream = request.headers.get("accept")?.includes("text/event-stream");
 
-    const res = await fetch(`${PYTHON_API_URL}/generate`, {
+    const res = await fetch(`${PYTHON_API_URL}/generate${wantsStream ? "/stream" : ""}`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: { "Content-Type": "application/json", ...traceHeaders(request) },
       body: JSON.stringify({ messages }),
     });
 
+    const trace = res.headers.get("traceparent");
     if (!res.ok) {
       const err = await res.text();
-      console.error("FastAPI error:", err);
+      console.error("FastAPI error:", err, "traceparent:", trace);
       return NextResponse.json({ error: err }, { status: res.status });
     }
 
+    if (wantsStream) {
+      // hand the SSE body straight through so tokens are not buffered here
+      return new Response(res.body, {
+        headers: {
+          "Content-Type": "text/event-stream",
+          "Cache-Control": "no-cache, no-transform",
+          Connection: "keep-alive",
+          "X-Accel-Buffering": "no",
+          ...(trace ? { traceparent: trace } : {}),
+        },
+      });
+    }
+
     const data = await res.json();
-    return NextResponse.json(data);
+    return NextResponse.json(data, {
+      headers: trace ? { traceparent: trace } : {},
+    });
   } catch (e: any) {
     console.error(e);
     return NextResponse.json({ error: e.message }, { status: 500 });
   }
-}
\ No newline at end of file
+}
@@ -0,0 +1,114 @@
+"""Local stand-in for the Gemini REST API, for load and failure testing.
+
+Point the chatbot at it with
+GEMINI_BASE_URL=http://127.0.0.1:8500/v1beta/models, then inject latency
+and errors per model:
+
+    python stub_gemini.py --latency 0.3 --error-rate 0.1 \
+        --model-latency gemini-1.5-flash=5 --model-error-rate gemini-2.5-flash=1
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class StubConfig:
+    def __init__(self, latency=0.2, jitter=0.0, error_rate=0.0, error_status=503,
+                 model_latency=None, model_error_rate=None, answer="This is a stub answer.",
+                 token_delay=0.02, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.model_latency = model_latency or {}
+        self.model_error_rate = model_error_rate or {}
+        self.answer = answer
+        self.token_delay = token_delay
+        self.random = random.Random(seed)
+        self.calls = {}
+
+    def delay_for(self, model: str) -> float:
+        base = self.model_latency.get(model, self.latency)
+        return max(0.0, base + self.random.uniform(-self.jitter, self.jitter))
+
+    def should_fail(self, model: str) -> bool:
+        return self.random.random() < self.model_error_rate.get(model, self.error_rate)
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    stub = FastAPI()
+    stub.state.config = config
+
+    @stub.post("/v1beta/models/{target}")
+    async def generate_content(target: str):
+        model, _, method = target.partition(":")
+        if method not in {"generateContent", "streamGenerateContent"}:
+            raise HTTPException(404, f"Unsupported method {method}")
+        config.calls[model] = config.calls.get(model, 0) + 1
+        await asyncio.sleep(config.delay_for(model))
+        if config.should_fail(model):
+            return JSONResponse({"error": {"message": "stub overloaded"}}, status_code=config.error_status)
+        answer = f"[{model}] {config.answer}"
+        if method == "generateContent":
+            return _candidate(answer)
+
+        async def chunks():
+            for i, word in enumerate(answer.split(" ")):
+                if i:
+                    await asyncio.sleep(config.token_delay)
+                yield f"data: {json.dumps(_candidate(word if i == 0 else ' ' + word))}\r\n\r\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @stub.get("/calls")
+    async def calls():
+        return config.calls
+
+    return stub
+
+
+def _candidate(text: str) -> dict:
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]}
+
+
+def _parse_overrides(values, cast=float):
+    overrides = {}
+    for value in values or []:
+        model, _, number = value.partition("=")
+        overrides[model] = cast(number)
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8500)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before each reply.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls that fail.")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--model-latency", action="append", help="MODEL=SECONDS override.")
+    parser.add_argument("--model-error-rate", action="append", help="MODEL=RATE override.")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between streamed chunks.")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    import uvicorn
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        model_latency=_parse_overrides(args.model_latency),
+        model_error_rate=_parse_overrides(args.model_error_rate),
+        token_delay=args.token_delay,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
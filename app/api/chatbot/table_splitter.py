@@ -0,0 +1,142 @@
+"""Row-aware splitting for the travel tables in mock_travel_data.pdf.
+
+pypdf extracts a reportlab table one cell per line, and every page repeats
+the header row. A fixed-size character window cuts those rows mid-record and
+duplicates them in its overlap; this splitter finds the header rows that
+generate_mock_data.py writes and emits each row (or a small group of rows)
+as its own chunk with the column names folded in:
+
+    Flight Data
+    Origin Country: USA | Origin City: New York | ... | Adult Price: 686 | Child Price: 514
+
+Anything on a page that is not a recognised table row goes through the
+fallback text splitter.
+
+The same tables written as CSV / JSONL / Parquet (generate_mock_data.py
+--formats) skip PDF parsing: split_records() builds identical chunk text
+straight from the rows and, with one row per chunk, adds each cell as typed
+metadata (adult_price=686, departure_date="2025-12-01").
+"""
+import os
+import re
+from typing import Dict, List, Optional
+
+from langchain.schema.document import Document
+
+from entities import load_mock_data, slug
+
+
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}$")
+_NUMBER = re.compile(r"-?\d+(\.\d+)?$")
+DATE_COLUMNS = {"Check-in", "Check-out", "Rental Start", "Rental End"}
+CELL_SEPARATOR = " | "
+
+
+def _valid_cell(column: str, value: str) -> bool:
+    """Cheap type check so a wrapped cell cannot shift every following row."""
+    if "Date" in column or column in DATE_COLUMNS:
+        return bool(_DATE.match(value))
+    if "Price" in column:
+        return bool(_NUMBER.match(value))
+    return bool(value)
+
+
+class TableRowSplitter:
+    def __init__(self, tables: Dict[str, List[str]], fallback, rows_per_chunk: int = 1, skip_tables=()):
+        self.tables = tables
+        self.fallback = fallback
+        self.rows_per_chunk = rows_per_chunk
+        # tables whose rows come from a CSV / JSONL / Parquet file: their PDF rows are dropped, not indexed twice
+        self.skip_tables = set(skip_tables)
+        self._by_first_column: Dict[str, List[tuple]] = {}
+        for title, columns in tables.items():
+            self._by_first_column.setdefault(columns[0], []).append((title, columns))
+
+    @classmethod
+    def from_mock_data(cls, fallback, rows_per_chunk: int = 1, skip_tables=()) -> "TableRowSplitter":
+        return cls(load_mock_data().tables, fallback, rows_per_chunk, skip_tables)
+
+    def _header_at(self, lines: List[str], i: int) -> Optional[tuple]:
+        for title, columns in self._by_first_column.get(lines[i], ()):
+            if lines[i:i + len(columns)] == columns:
+                return title, columns
+        return None
+
+    def _row_at(self, lines: List[str], i: int, columns: List[str]) -> Optional[List[str]]:
+        row = lines[i:i + len(columns)]
+        if len(row) < len(columns) or self._header_at(lines, i):
+            return None
+        if not all(_valid_cell(c, v) for c, v in zip(columns, row)):
+            return None
+        return row
+
+    def _chunk(self, document: Document, title: str, columns: List[str], rows: List[List[str]]) -> Document:
+        lines = [_row_line(columns, row) for row in rows]
+        return Document(page_content="\n".join([title] + lines), metadata={**document.metadata, "table": title})
+
+    def split_document(self, document: Document) -> List[Document]:
+        lines = [line.strip() for line in document.page_content.splitlines() if line.strip()]
+        chunks, other = [], []
+        i = 0
+        while i < len(lines):
+            header = self._header_at(lines, i)
+            if header is None:
+                if lines[i] not in self.tables:  # table titles are folded into every row chunk
+                    other.append(lines[i])
+                i += 1
+                continue
+            title, columns = header
+            i += len(columns)
+            rows = []
+            while True:
+                row = self._row_at(lines, i, columns)
+                if row is None:
+                    break
+                rows.append(row)
+                i += len(columns)
+            if title in self.skip_tables:
+                continue
+            for start in range(0, len(rows), self.rows_per_chunk):
+                chunks.append(self._chunk(document, title, columns, rows[start:start + self.rows_per_chunk]))
+        if other:
+            rest = Document(page_content="\n".join(other), metadata=dict(document.metadata))
+            chunks.extend(self.fallback.split_documents([rest]))
+        return chunks
+
+    def table_for_file(self, source: str) -> Optional[tuple]:
+        """(title, columns) of the table a data file holds, by file name: flight_data.csv -> Flight Data."""
+        name = slug(os.path.splitext(os.path.basename(source))[0])
+        for title, columns in self.tables.items():
+            if slug(title) == name:
+                return title, columns
+        return None
+
+    def split_records(self, source: str, records: List[dict]) -> List[Document]:
+        """Row chunks for a table file's rows ({column: value}, as ingest.read_table_file returns them)."""
+        table = self.table_for_file(source)
+        if table is None:
+            raise ValueError(f"{source}: file name does not match any of {list(self.tables)}")
+        title, columns = table
+        missing = [c for c in columns if records and c not in records[0]]
+        if missing:
+            raise ValueError(f"{source}: missing columns {missing}")
+        chunks = []
+        for start in range(0, len(records), self.rows_per_chunk):
+            rows = [[record.get(c) for c in columns] for record in records[start:start + self.rows_per_chunk]]
+            metadata = {"source": source, "row": start, "table": title}
+            if self.rows_per_chunk == 1:
+                metadata.update((slug(c), v) for c, v in zip(columns, rows[0]) if v is not None)
+            text = "\n".join([title] + [_row_line(columns, row) for row in rows])
+            chunks.append(Document(page_content=text, metadata=metadata))
+        return chunks
+
+
+def _row_line(columns: List[str], row: list) -> str:
+    return CELL_SEPARATOR.join(f"{c}: {v}" for c, v in zip(columns, row) if v is not None)
+
+
+def parse_row_chunk(text: str):
+    """Inverse of the row chunk format: (table title, [{column: value}, ...])."""
+    title, *lines = text.split("\n")
+    rows = [dict(cell.split(": ", 1) for cell in line.split(CELL_SEPARATOR)) for line in lines]
+    return title, rows
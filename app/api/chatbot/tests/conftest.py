@@ -0,0 +1,9 @@
+import os
+import sys
+
+# the chatbot modules import each other as top-level siblings
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: spawns interpreters or servers; deselect with -m 'not slow'")
@@ -0,0 +1,43 @@
+import numpy as np
+
+from answer_cache import AnswerCache, key_terms
+
+
+EMBEDDING = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+
+
+def cache_with(question, terms=None):
+    cache = AnswerCache()
+    cache.check_version("v1")
+    cache.put(question, EMBEDDING, "answer", ["src"], "v1", terms)
+    return cache
+
+
+def test_key_terms_keep_names_numbers_and_months():
+    assert key_terms("What is the cheapest flight GL984 to Paris in may?") == {"gl984", "paris", "may"}
+    assert key_terms("Flights to Paris. Hotels too") == {"paris"}
+
+
+def test_key_terms_include_entities():
+    assert key_terms("flights to paris", [("city", "Paris")]) == {"city:Paris"}
+
+
+def test_semantic_hit_needs_the_same_key_terms():
+    cache = cache_with("cheapest flight to Paris in May")
+    hit = cache.get_semantic(EMBEDDING, key_terms("the cheapest flight to Paris in May"))
+    assert hit is not None and hit.answer == "answer"
+    for question in ("cheapest flight to Tokyo in May", "cheapest flight to Paris in June",
+                     "cheapest flight to Paris in May on GL984"):
+        assert cache.get_semantic(EMBEDDING, key_terms(question)) is None
+
+
+def test_semantic_hit_skips_a_closer_entry_with_other_terms():
+    cache = cache_with("flights to Tokyo")
+    cache.put("flights to Paris", np.array([0.99, 0.1, 0.0], dtype=np.float32), "paris", [], "v1")
+    hit = cache.get_semantic(EMBEDDING, key_terms("flights to Paris"))
+    assert hit is not None and hit.answer == "paris"
+
+
+def test_lowercased_cities_differ_through_entities():
+    cache = cache_with("flights to paris", key_terms("flights to paris", [("city", "Paris")]))
+    assert cache.get_semantic(EMBEDDING, key_terms("flights to tokyo", [("city", "Tokyo")])) is None
@@ -0,0 +1,20 @@
+from capture import RequestCapture
+from metrics import CAPTURES, render
+
+
+def count(outcome):
+    return CAPTURES.values.get((("outcome", outcome),), 0)
+
+
+def test_written_and_dropped_captures_reach_the_metrics(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    capture = RequestCapture(str(path), sample_rate=0, queue_size=1)  # no writer thread: the queue stays full
+    written, dropped = count("written"), count("dropped")
+
+    capture.submit({"question": "a"})
+    capture.submit({"question": "b"})
+    capture._write([{"question": "c"}, {"question": "d"}])
+
+    assert (count("written"), count("dropped")) == (written + 2, dropped + 1)
+    assert len(path.read_text().splitlines()) == 2
+    assert 'chatbot_captures_total{outcome="dropped"}' in render()
@@ -0,0 +1,93 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache, QueryEmbedder
+from local_embeddings import HashingEmbeddings
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self, error=None):
+        super().__init__(size=16)
+        self.calls = []
+        self.error = error
+
+    def embed_documents(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        if self.error:
+            raise self.error
+        return super().embed_documents(texts)
+
+
+def embed_all(embedder, texts):
+    async def scenario():
+        return await asyncio.gather(*(embedder.embed(t) for t in texts), return_exceptions=True)
+    return asyncio.run(scenario())
+
+
+def test_concurrent_misses_in_one_window_are_one_call():
+    embeddings = CountingEmbeddings()
+    embedder = QueryEmbedder(embeddings, EmbeddingCache(path=None), window=0.05)
+    vectors = embed_all(embedder, ["paris", "tokyo", "rome"])
+    assert embeddings.calls == [["paris", "tokyo", "rome"]]
+    assert np.allclose(vectors[1], embeddings.embed_query("tokyo"))
+
+
+def test_max_batch_splits_the_window():
+    embeddings = CountingEmbeddings()
+    embedder = QueryEmbedder(embeddings, EmbeddingCache(path=None), window=0.05, max_batch=2)
+    embed_all(embedder, ["a", "b", "c", "d", "e"])
+    assert sorted(map(len, embeddings.calls)) == [1, 2, 2]
+
+
+def test_in_flight_duplicates_share_one_embedding():
+    embeddings = CountingEmbeddings()
+    embedder = QueryEmbedder(embeddings, EmbeddingCache(path=None), window=0.05)
+    first, second = embed_all(embedder, ["paris", "paris"])
+    assert embeddings.calls == [["paris"]]
+    assert first is second
+
+
+def test_an_embedder_error_reaches_every_waiter():
+    embedder = QueryEmbedder(CountingEmbeddings(error=RuntimeError("quota")), EmbeddingCache(path=None), window=0.01)
+
+    async def scenario():
+        return await asyncio.wait_for(
+            asyncio.gather(*(embedder.embed(t) for t in ["a", "b", "a"]), return_exceptions=True), timeout=2
+        )
+
+    results = asyncio.run(scenario())
+    assert [str(r) for r in results] == ["quota"] * 3
+    assert not embedder._inflight
+
+
+def test_disk_store_survives_a_restart(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    embed_all(QueryEmbedder(CountingEmbeddings(), EmbeddingCache(path=path), window=0.01), ["paris"])
+
+    embeddings = CountingEmbeddings()
+    restarted = QueryEmbedder(embeddings, EmbeddingCache(path=path), window=0.01)
+    vector, = embed_all(restarted, ["paris"])
+    assert embeddings.calls == []
+    assert restarted.counters["disk_hits"] == 1
+    assert np.allclose(vector, embeddings.embed_query("paris"))
+
+
+def test_disk_store_evicts_the_least_recently_used(tmp_path):
+    cache = EmbeddingCache(max_entries=1, path=str(tmp_path / "embeddings.sqlite3"), max_disk_entries=2)
+    vector = np.ones(4, dtype=np.float32)
+    cache.put_many({"a": vector})
+    cache.put_many({"b": vector})
+    assert cache.get_from_disk("a") is not None  # a is now more recent than b
+    cache.put_many({"c": vector})
+    assert cache.disk_entries() == 2
+    assert cache.get_from_disk("b") is None
+    assert cache.get_from_disk("a") is not None and cache.get_from_disk("c") is not None
+
+
+@pytest.mark.parametrize("max_entries", [1, 3])
+def test_memory_lru_stays_under_its_cap(max_entries):
+    cache = EmbeddingCache(max_entries=max_entries, path=None)
+    cache.put_many({str(i): np.zeros(2, dtype=np.float32) for i in range(5)})
+    assert len(cache) == max_entries and cache.get("4") is not None
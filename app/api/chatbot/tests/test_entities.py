@@ -0,0 +1,80 @@
+import pytest
+
+from entities import EntityMatcher, flag, metadata_matches, words
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return EntityMatcher.load()
+
+
+def test_words_keep_non_ascii_letters():
+    assert words("Flights to Whatì?") == ["Flights", "to", "Whatì"]
+
+
+def test_non_ascii_airport_name_is_one_token(matcher):
+    assert ("city", "Whatì") in matcher.find("Is there an airport in Whatì?")
+    assert ("city", "Whatì") not in matcher.find("What flights go to Paris?")
+
+
+def test_question_starting_with_what_has_no_stray_city(matcher):
+    where = matcher.where("What is the cheapest flight from London to Tokyo in August?")
+    assert where == {"$and": [{"category_flight": True}, {"city_london": True}, {"city_tokyo": True}]}
+
+
+@pytest.mark.parametrize("question", [
+    "Mobile check-in is available for flights to Tokyo?",
+    "Reading the fine print, are hotels in Paris refundable?",
+    "Split the cost of a car rental in Dubai?",
+])
+def test_sentence_initial_airport_word_is_not_a_city(matcher, question):
+    cities = {value for kind, value in matcher.find(question) if kind == "city"}
+    assert cities <= {"Tokyo", "Paris", "Dubai"}
+
+
+def test_airport_word_mid_sentence_is_a_city(matcher):
+    assert ("city", "Split") in matcher.find("Are there flights to Split in August?")
+
+
+def test_airport_word_opening_a_later_sentence_is_ignored(matcher):
+    assert ("city", "Split") not in matcher.find("Flights are full. Split the booking?")
+
+
+def test_lowercase_airport_word_is_ignored(matcher):
+    assert not [e for e in matcher.find("that would be nice") if e[0] == "city"]
+
+
+def test_mock_vocabulary_wins_over_iata_codes(matcher):
+    assert matcher.find("SUV rental in Dubai") == [("category", "car"), ("city", "Dubai")]
+
+
+def test_table_headers_are_not_cities(matcher):
+    assert ("city", "Price") not in matcher.find("Adult Price: 686 | Child Price: 514")
+
+
+def test_missing_iata_code_is_not_indexed(matcher):
+    assert not matcher.find("Plan N")
+
+
+def test_flag_slugs_keep_non_ascii_letters():
+    assert flag("city", "Whatì") == "city_whatì"
+    assert flag("city", "Cape Town") == "city_cape_town"
+
+
+def test_several_categories_are_alternatives(matcher):
+    where = matcher.where("Flights to Paris and where to stay?")
+    assert where == {"$and": [{"$or": [{"category_flight": True}, {"category_hotel": True}]}, {"city_paris": True}]}
+
+
+@pytest.mark.parametrize("metadata, matches", [
+    ({"category_flight": True, "city_paris": True}, True),
+    ({"category_hotel": True, "city_paris": True}, True),
+    ({"category_car": True, "city_paris": True}, False),
+    ({"category_hotel": True, "city_tokyo": True}, False),
+])
+def test_multi_category_filter_matches_either_category(matcher, metadata, matches):
+    assert metadata_matches(metadata, matcher.where("Flights to Paris and a hotel room?")) is matches
+
+
+def test_single_category_stays_required(matcher):
+    assert matcher.where("hotels in Paris") == {"$and": [{"category_hotel": True}, {"city_paris": True}]}
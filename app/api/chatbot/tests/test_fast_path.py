@@ -0,0 +1,88 @@
+import pytest
+
+from entities import EntityMatcher, load_mock_data
+from fast_path import FastPath
+from table_splitter import TableRowSplitter
+from travel_store import TravelStore, build_travel_store
+
+
+@pytest.fixture(scope="module")
+def fast_path():
+    return FastPath(EntityMatcher.load(), list(load_mock_data().car_base_rates))
+
+
+@pytest.mark.parametrize("question, category, filters, month, limit", [
+    ("cheapest flight from London to Tokyo in August", "flight",
+     [("origin_city", "London"), ("destination_city", "Tokyo")], 8, 1),
+    ("What is the cheapest flight from London to Tokyo in August?", "flight",
+     [("origin_city", "London"), ("destination_city", "Tokyo")], 8, 1),
+    ("SUV rental in Dubai", "car", [("city", "Dubai"), ("car_type", "SUV")], None, 5),
+    ("flight GL984", "flight", [("flight_number", "GL984")], None, 5),
+    ("How much is the Tokyo Grand Hotel?", "hotel", [("city", "Tokyo"), ("hotel_name", "Tokyo Grand Hotel")], None, 5),
+    ("London to Tokyo flights with Sky High", "flight",
+     [("origin_city", "London"), ("destination_city", "Tokyo"), ("airline", "Sky High")], None, 5),
+    ("flights to Tokyo in may", "flight", [("destination_city", "Tokyo")], 5, 5),
+    ("Show me hotels in Paris", "hotel", [("city", "Paris")], None, 5),
+])
+def test_parses_table_lookups(fast_path, question, category, filters, month, limit):
+    lookup = fast_path.parse(question)
+    assert lookup is not None
+    assert (lookup.category, lookup.filters, lookup.month, lookup.limit) == (category, filters, month, limit)
+
+
+def test_most_expensive_sorts_descending(fast_path):
+    lookup = fast_path.parse("most expensive hotel in Cairo")
+    assert (lookup.order, lookup.limit) == ("desc", 1)
+
+
+@pytest.mark.parametrize("question", [
+    "Is it possible to cancel my hotel booking in Paris?",
+    "what is the baggage allowance for flights to Tokyo",
+    "flights to Tokyo under 500 dollars",
+    "flights to Tokyo on 2025-12-01",
+    "which flights may I take to Tokyo",
+    "flights to Tokyo in June or July",
+    "Why is Tokyo so expensive for flights?",
+    "expensive hotels in Paris",
+    "hotel and flight to Paris",
+    "flights in Tokyo",
+    "flights to Japan",
+    "Grand Hotel in Paris",
+    "Sky High hotels in Paris",
+])
+def test_anything_beyond_a_lookup_goes_to_rag(fast_path, question):
+    assert fast_path.parse(question) is None
+
+
+@pytest.fixture
+def travel_query(tmp_path):
+    tables = load_mock_data().tables
+    splitter = TableRowSplitter(tables, fallback=None)
+    columns = tables["Flight Data"]
+    values = [
+        ["UK", "London", "Japan", "Tokyo", "2025-08-03", "2025-08-10", "Sky High", "SK100", 900, 675],
+        ["UK", "London", "Japan", "Tokyo", "2025-08-20", "2025-08-27", "Airways Intl", "AI200", 700, 525],
+        ["UK", "London", "Japan", "Tokyo", "2025-09-01", "2025-09-09", "Sky High", "SK300", 500, 375],
+    ]
+    chunks = splitter.split_records("data/flight_data.csv", [dict(zip(columns, row)) for row in values])
+    ids = [f"chunk-{i}" for i in range(len(chunks))]
+    path = str(tmp_path / "travel.sqlite3")
+    build_travel_store(path, ids, [c.page_content for c in chunks], [c.metadata for c in chunks], tables, "v1")
+    return TravelStore(path).query
+
+
+def test_answers_from_the_travel_tables(fast_path, travel_query):
+    lookup = fast_path.parse("cheapest flight from London to Tokyo in August")
+    message, sources = fast_path.answer(travel_query, lookup)
+    assert "AI200" in message and message.startswith("The cheapest flight from London to Tokyo in August")
+    assert sources == ["chunk-1"]
+
+
+def test_empty_result_says_so(fast_path, travel_query):
+    message, sources = fast_path.answer(travel_query, fast_path.parse("flights from London to Paris"))
+    assert message == "I couldn't find any flights from London to Paris in our travel data."
+    assert sources == []
+
+
+def test_no_travel_tables_means_no_answer(fast_path):
+    assert fast_path.answer(lambda sql, params: None, fast_path.parse("flight GL984")) is None
@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import gemini_client
+from gemini_client import RETRY_BACKOFF_MAX, RETRY_TOTAL, GeminiClient, backoff_delay
+
+ANSWER = {"candidates": [{"content": {"parts": [{"text": "Paris"}]}}]}
+
+
+def test_backoff_sequence_and_cap():
+    assert [backoff_delay(n) for n in range(1, 5)] == [0, 2, 4, 8]
+    assert backoff_delay(20) == RETRY_BACKOFF_MAX
+
+
+def run(outcomes, monkeypatch, stream=False):
+    """Serve outcomes in order (a status, a (status, headers) pair, or an exception); return (result, requests, delays)."""
+    requests, delays = [], []
+
+    def handler(request):
+        requests.append(request)
+        outcome = outcomes[min(len(requests), len(outcomes)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, headers = outcome if isinstance(outcome, tuple) else (outcome, {})
+        if stream and status == 200:
+            return httpx.Response(200, headers=headers, text='data: {"candidates": [{"content": {"parts": [{"text": "Paris"}]}}]}\n\n')
+        return httpx.Response(status, headers=headers, json=ANSWER)
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(gemini_client.asyncio, "sleep", sleep)
+
+    async def scenario():
+        client = GeminiClient(base_url="http://stub/models", transport=httpx.MockTransport(handler))
+        try:
+            if stream:
+                return "".join([text async for text in client.stream_gemini("m", "q", "key")])
+            return await client.call_gemini("m", "q", "key")
+        finally:
+            await client.aclose()
+
+    try:
+        result = asyncio.run(scenario())
+    except HTTPException as e:
+        result = e
+    return result, requests, delays
+
+
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("status", sorted(gemini_client.RETRY_STATUS_FORCELIST))
+def test_gateway_statuses_are_retried(monkeypatch, stream, status):
+    result, requests, delays = run([status, status, 200], monkeypatch, stream)
+    assert result == "Paris"
+    assert len(requests) == 3 and delays == [0, 2]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_retry_after_stretches_the_backoff(monkeypatch, stream):
+    result, _, delays = run([(503, {"Retry-After": "7"}), 200], monkeypatch, stream)
+    assert result == "Paris" and delays == [7]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("status", [400, 429, 500])
+def test_other_errors_fail_at_once(monkeypatch, stream, status):
+    result, requests, _ = run([status], monkeypatch, stream)
+    assert isinstance(result, HTTPException) and result.status_code == 503
+    assert f"error {status}" in result.detail and len(requests) == 1
+
+
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("error", [httpx.ConnectError("refused"), httpx.ConnectTimeout("slow"),
+                                   httpx.PoolTimeout("pool")])
+def test_errors_before_sending_are_retried(monkeypatch, stream, error):
+    result, requests, _ = run([error, 200], monkeypatch, stream)
+    assert result == "Paris" and len(requests) == 2
+
+
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("error", [httpx.ReadTimeout("hung"), httpx.RemoteProtocolError("dropped")])
+def test_errors_after_sending_are_not_retried(monkeypatch, stream, error):
+    result, requests, _ = run([error, 200], monkeypatch, stream)
+    assert isinstance(result, HTTPException) and result.status_code == 503
+    assert len(requests) == 1
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_retries_run_out(monkeypatch, stream):
+    result, requests, delays = run([503], monkeypatch, stream)
+    assert isinstance(result, HTTPException) and result.status_code == 503
+    assert "busy or timed out" in result.detail
+    assert len(requests) == RETRY_TOTAL + 1
+    assert delays == [backoff_delay(n) for n in range(1, RETRY_TOTAL + 1)]
+
+
+def test_connect_timeout_is_short():
+    client = GeminiClient(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+    assert client._client.timeout.connect == gemini_client.CONNECT_TIMEOUT
+    assert client._client.timeout.read == gemini_client.REQUEST_TIMEOUT
+    asyncio.run(client.aclose())
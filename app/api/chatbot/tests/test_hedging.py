@@ -0,0 +1,80 @@
+import asyncio
+
+from hedging import HedgePolicy, ModelRouter
+
+
+def test_losing_results_are_discarded():
+    async def scenario():
+        router = ModelRouter(["a", "b"], HedgePolicy(hedge_delay=0, min_hedge_delay=0))
+        both_started, release = asyncio.Event(), asyncio.Event()
+        started = []
+
+        async def fn(model):
+            started.append(model)
+            if len(started) == 2:
+                both_started.set()
+            await release.wait()  # both finish in the same round
+            return f"stream from {model}"
+
+        async def release_when_hedged():
+            await both_started.wait()
+            release.set()
+
+        discarded = []
+
+        async def discard(result):
+            discarded.append(result)
+
+        releaser = asyncio.create_task(release_when_hedged())
+        model, result = await router.call(fn, discard=discard)
+        await releaser
+        return model, result, discarded
+
+    model, result, discarded = asyncio.run(scenario())
+    assert result == f"stream from {model}"
+    assert discarded == [f"stream from {'b' if model == 'a' else 'a'}"]
+
+
+def test_cancelled_losers_are_not_discarded():
+    async def scenario():
+        router = ModelRouter(["slow", "fast"], HedgePolicy(hedge_delay=0.01, min_hedge_delay=0.01))
+
+        async def fn(model):
+            await asyncio.sleep(5 if model == "slow" else 0)
+            return model
+
+        discarded = []
+
+        async def discard(result):
+            discarded.append(result)
+
+        return await router.call(fn, discard=discard), discarded
+
+    (model, result), discarded = asyncio.run(scenario())
+    assert (model, result, discarded) == ("fast", "fast", [])
+
+
+def test_closing_response_closes_when_the_client_is_gone_before_the_body():
+    import app
+
+    closed = []
+
+    async def on_close():
+        closed.append(True)
+
+    async def body():
+        yield "never sent"
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client went away")
+
+    response = app.ClosingStreamingResponse(body(), on_close=on_close, media_type="text/event-stream")
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    try:
+        asyncio.run(response(scope, receive, send))
+    except Exception:
+        pass
+    assert closed == [True]
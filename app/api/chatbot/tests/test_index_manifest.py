@@ -0,0 +1,109 @@
+import os
+
+from langchain.schema.document import Document
+from langchain_community.vectorstores import Chroma
+
+import populate_database
+from index_manifest import IndexManifest, file_sha256
+from local_embeddings import HashingEmbeddings
+
+
+def manifest_for(tmp_path, text="flights to Paris", chunking="v1"):
+    source = tmp_path / "data.csv"
+    source.write_text(text)
+    manifest = IndexManifest.load(str(tmp_path / "chroma"), chunking=chunking)
+    changed, sha = manifest.classify(str(source))
+    manifest.record(str(source), sha, {"id": "hash"})
+    manifest.save()
+    return str(source), changed
+
+
+def test_new_file_is_changed(tmp_path):
+    _, changed = manifest_for(tmp_path)
+    assert changed
+
+
+def test_unchanged_stat_is_skipped_without_reading(tmp_path, monkeypatch):
+    source, _ = manifest_for(tmp_path)
+    manifest = IndexManifest.load(str(tmp_path / "chroma"), chunking="v1")
+    sha = file_sha256(source)
+
+    def read(path):
+        raise AssertionError(f"{path} was read")
+
+    monkeypatch.setattr("index_manifest.file_sha256", read)
+    assert manifest.classify(source) == (False, sha)
+
+
+def test_touched_file_with_the_same_content_is_skipped_and_restatted(tmp_path):
+    source, _ = manifest_for(tmp_path)
+    os.utime(source, ns=(1, 1))
+    manifest = IndexManifest.load(str(tmp_path / "chroma"), chunking="v1")
+    changed, _ = manifest.classify(source)
+    assert not changed
+    assert manifest.files[source]["mtime_ns"] == 1
+
+
+def test_edited_file_is_changed(tmp_path):
+    source, _ = manifest_for(tmp_path)
+    with open(source, "a") as f:
+        f.write(" and Tokyo")
+    changed, sha = IndexManifest.load(str(tmp_path / "chroma"), chunking="v1").classify(source)
+    assert changed and sha == file_sha256(source)
+
+
+def test_removed_file_is_stale(tmp_path, monkeypatch):
+    source, _ = manifest_for(tmp_path)
+    os.remove(source)
+    monkeypatch.setattr(populate_database, "list_sources", lambda: [])
+    changed, removed = populate_database.scan_sources(IndexManifest.load(str(tmp_path / "chroma"), chunking="v1"))
+    assert (changed, removed) == ([], [source])
+
+
+def test_chunking_change_marks_every_file_changed(tmp_path):
+    source, _ = manifest_for(tmp_path)
+    manifest = IndexManifest.load(str(tmp_path / "chroma"), chunking="v2")
+    assert manifest.classify(source)[0]
+    assert source in manifest.files  # still known, so a removal is noticed too
+
+
+def chunk(text, page=0, source="a.pdf"):
+    return Document(page_content=text, metadata={"source": source, "page": page})
+
+
+def test_duplicate_chunk_text_gets_a_counter():
+    ids = [c.metadata["id"] for c in populate_database.calculate_chunk_ids(
+        [chunk("Paris"), chunk("Tokyo"), chunk("Paris", page=3), chunk("Paris", source="b.pdf")])]
+    assert ids[0].startswith("a.pdf:") and ids[2] == f"{ids[0]}:1"
+    assert len(set(ids)) == 4 and ids[3].startswith("b.pdf:")
+
+
+def test_chunk_ids_do_not_depend_on_the_page():
+    before = [c.metadata["id"] for c in populate_database.calculate_chunk_ids([chunk("Paris", 0), chunk("Rome", 1)])]
+    after = [c.metadata["id"] for c in populate_database.calculate_chunk_ids(
+        [chunk("Tokyo", 0), chunk("Paris", 1), chunk("Rome", 2)])]
+    assert after[1:] == before
+
+
+def test_inserted_page_embeds_only_itself_and_moves_the_rest(tmp_path, monkeypatch):
+    embedded = []
+
+    class CountingEmbeddings(HashingEmbeddings):
+        def embed_documents(self, texts, **kwargs):
+            embedded.extend(texts)
+            return super().embed_documents(texts, **kwargs)
+
+    monkeypatch.setattr(populate_database, "CHROMA_PATH", str(tmp_path / "chroma"))
+    monkeypatch.setattr(populate_database, "get_embedding_function", lambda: CountingEmbeddings(size=16))
+    populate_database.add_to_chroma(populate_database.calculate_chunk_ids([chunk("Paris", 0), chunk("Rome", 1)]),
+                                    replaced_sources=["a.pdf"], workers=1)
+    embedded.clear()
+    populate_database.add_to_chroma(
+        populate_database.calculate_chunk_ids([chunk("Tokyo", 0), chunk("Paris", 1), chunk("Rome", 2)]),
+        replaced_sources=["a.pdf"], workers=1)
+
+    assert embedded == ["Tokyo"]
+    db = Chroma(persist_directory=populate_database.CHROMA_PATH, embedding_function=HashingEmbeddings(size=16))
+    stored = db._collection.get(include=["documents", "metadatas"])
+    assert {text: m["page"] for text, m in zip(stored["documents"], stored["metadatas"])} == \
+        {"Tokyo": 0, "Paris": 1, "Rome": 2}
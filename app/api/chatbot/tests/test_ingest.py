@@ -0,0 +1,67 @@
+import json
+import os
+
+import pytest
+from langchain.schema.document import Document
+from langchain_community.vectorstores import Chroma
+
+import populate_database
+from ingest import IngestEngine
+from local_embeddings import HashingEmbeddings
+
+
+class Interrupted(BaseException):
+    """Stands in for Ctrl-C / a killed process: not caught as a failed batch."""
+
+
+class FlakyEmbeddings(HashingEmbeddings):
+    def __init__(self, poison=None, error=RuntimeError):
+        super().__init__(size=64)
+        self.poison, self.error = poison, error
+
+    def embed_documents(self, texts, **kwargs):
+        if self.poison and any(self.poison in t for t in texts):
+            raise self.error("embedding service down")
+        return super().embed_documents(texts, **kwargs)
+
+
+def chunks(count=10):
+    return [Document(page_content=f"chunk {i} about Paris", metadata={"id": f"c{i}", "source": "a.pdf"})
+            for i in range(count)]
+
+
+def test_failed_batches_are_reported_and_the_rest_committed(tmp_path):
+    db = Chroma(persist_directory=str(tmp_path), embedding_function=HashingEmbeddings(size=64))
+    engine = IngestEngine(db, FlakyEmbeddings(poison="chunk 4"), batch_size=2, workers=2, max_retries=0)
+    report = engine.run(chunks())
+    assert sorted(report.failed_ids) == ["c4", "c5"]
+    assert (report.committed_chunks, report.failed_batches) == (8, 1)
+    assert db._collection.count() == 8
+
+
+def test_interrupted_ingestion_resumes_with_only_the_missing_chunks(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(populate_database, "CHROMA_PATH", str(tmp_path / "chroma"))
+    monkeypatch.setattr(populate_database, "get_embedding_function",
+                        lambda: FlakyEmbeddings(poison="chunk 4", error=Interrupted))
+    with pytest.raises(Interrupted):
+        populate_database.add_to_chroma(iter(chunks()), batch_size=2, workers=1)
+    checkpoint_path = os.path.join(populate_database.CHROMA_PATH, populate_database.CHECKPOINT_FILE)
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    assert checkpoint["finished"] is False
+    assert checkpoint["committed_chunks"] == 4
+
+    embedder = FlakyEmbeddings()
+    embedded = []
+    original = embedder.embed_documents
+    embedder.embed_documents = lambda texts, **kw: embedded.extend(texts) or original(texts, **kw)
+    monkeypatch.setattr(populate_database, "get_embedding_function", lambda: embedder)
+    failed = populate_database.add_to_chroma(iter(chunks()), batch_size=2, workers=1)
+
+    assert failed == set()
+    assert "Resuming interrupted ingestion: 4 chunks" in capsys.readouterr().out
+    assert sorted(embedded) == sorted(c.page_content for c in chunks()[4:])  # committed chunks are not re-embedded
+    db = Chroma(persist_directory=populate_database.CHROMA_PATH, embedding_function=embedder)
+    assert db._collection.count() == 10
+    with open(checkpoint_path) as f:
+        assert json.load(f)["finished"] is True
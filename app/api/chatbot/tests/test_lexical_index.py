@@ -0,0 +1,93 @@
+from langchain.schema.document import Document
+from langchain_community.vectorstores import Chroma
+
+import app as chatbot
+from lexical_index import LEXICAL_FILE, PRECISE_MAX_DF, BM25Index, open_lexical_index, reciprocal_rank_fusion
+from local_embeddings import HashingEmbeddings
+from vector_store import VectorStore, write_index_version
+
+
+DOCUMENTS = {
+    "a": "flight AI123 from Paris to Tokyo",
+    "b": "hotel in Paris near the river, Paris Plaza",
+    "c": "car rental in Tokyo",
+    "d": "flight from London to Paris",
+}
+
+
+def index():
+    return BM25Index.build(list(DOCUMENTS), list(DOCUMENTS.values()), "v1")
+
+
+def test_rare_and_repeated_terms_rank_first():
+    ids = [doc_id for doc_id, _, _ in index().search("paris plaza")]
+    assert ids[0] == "b"
+    assert set(ids) == {"a", "b", "d"}
+    assert index().search("cruise") == []
+
+
+def test_scores_fall_in_rank_order():
+    scores = [score for _, score, _ in index().search("flight tokyo")]
+    assert scores == sorted(scores, reverse=True) and all(s > 0 for s in scores)
+
+
+def test_npz_round_trip(tmp_path):
+    path = str(tmp_path / LEXICAL_FILE)
+    index().save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.index_version == "v1"
+    assert loaded.search("paris tokyo") == index().search("paris tokyo")
+    assert open_lexical_index(str(tmp_path), "v1") is not None
+    assert open_lexical_index(str(tmp_path), "v2") is None
+
+
+def test_rare_identifiers_are_precise():
+    hits = {doc_id: precise for doc_id, _, precise in index().search("ai123 paris")}
+    assert hits["a"] is True
+    assert hits["b"] is False and hits["d"] is False  # plain words are never precise
+
+
+def test_common_identifiers_are_not_precise():
+    count = PRECISE_MAX_DF + 1
+    common = BM25Index.build([str(i) for i in range(count)], ["gate b12"] * count, "v1")
+    assert not any(precise for _, _, precise in common.search("b12"))
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    assert reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "d"]]) == ["b", "c", "a", "d"]
+    assert reciprocal_rank_fusion([["x"], []]) == ["x"]
+
+
+def doc(doc_id):
+    return Document(page_content=doc_id, metadata={"id": doc_id})
+
+
+def test_precise_hits_lead_and_cut_the_context():
+    semantic = [(doc(i), 0.1) for i in "pqrstu"]
+    lexical = [(doc("z"), 9.0, True), (doc("p"), 5.0, False)]
+    fused = [d.metadata["id"] for d in chatbot.fuse_results(semantic, lexical)]
+    assert fused == ["z", "p"][:chatbot.PRECISE_K]
+
+
+def test_without_precise_hits_the_fused_top_k_is_used():
+    semantic = [(doc(i), 0.1) for i in "pqrstu"]
+    lexical = [(doc("u"), 5.0, False)]
+    fused = [d.metadata["id"] for d in chatbot.fuse_results(semantic, lexical)]
+    assert len(fused) == chatbot.SEARCH_K and fused[0] in ("p", "u")
+    assert [d.metadata["id"] for d in chatbot.fuse_results(semantic, [])] == list("pqrst")[:chatbot.SEARCH_K]
+
+
+def test_filtered_keyword_search_looks_past_the_unfiltered_top_k(tmp_path):
+    texts = [f"flight to Paris number {i}" for i in range(30)] + ["flight to Tokyo"]
+    ids = [f"c{i}" for i in range(len(texts))]
+    metadatas = [{"id": doc_id, "city_tokyo": "Tokyo" in text} for doc_id, text in zip(ids, texts)]
+    db = Chroma(persist_directory=str(tmp_path), embedding_function=HashingEmbeddings(size=16))
+    db._collection.add(ids=ids, documents=texts, metadatas=metadatas,
+                       embeddings=HashingEmbeddings(size=16).embed_documents(texts))
+    BM25Index.build(ids, texts, "v1").save(str(tmp_path / LEXICAL_FILE))
+    write_index_version(str(tmp_path), "v1")
+    store = VectorStore(str(tmp_path), HashingEmbeddings(size=16), retriever="exact")
+
+    hits = store.lexical_search("flight paris", k=2, where={"city_tokyo": True})
+    assert [d.metadata["id"] for d, _, _ in hits] == ["c30"]
+    assert len(store.lexical_search("flight paris", k=2)) == 2
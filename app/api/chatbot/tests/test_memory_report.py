@@ -0,0 +1,68 @@
+import tracemalloc
+
+from memory_report import MemoryTracker
+
+
+def test_tracing_started_elsewhere_keeps_running():
+    tracemalloc.start()
+    try:
+        tracker = MemoryTracker()
+        tracker.start()
+        tracker.stop()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_tracing_the_tracker_started_is_stopped():
+    assert not tracemalloc.is_tracing()
+    tracker = MemoryTracker()
+    tracker.start()
+    tracker.stop()
+    assert not tracemalloc.is_tracing()
+
+
+def test_inner_stages_keep_the_outer_peak():
+    tracker = MemoryTracker()
+    tracker.start()
+    try:
+        with tracker.stage("outer"):
+            buffer = bytearray(8 << 20)
+            del buffer
+            with tracker.stage("inner"):
+                small = bytearray(1 << 20)
+                del small
+    finally:
+        tracker.stop()
+    assert tracker.stages["inner"]["python_peak_bytes"] < 8 << 20
+    assert tracker.stages["outer"]["python_peak_bytes"] >= 8 << 20
+
+
+def test_an_inner_peak_counts_for_the_outer_stage():
+    tracker = MemoryTracker()
+    tracker.start()
+    try:
+        with tracker.stage("outer"):
+            with tracker.stage("inner"):
+                large = bytearray(16 << 20)
+                del large
+            after = bytearray(1 << 20)
+            del after
+    finally:
+        tracker.stop()
+    assert tracker.stages["outer"]["python_peak_bytes"] >= 16 << 20
+
+
+def test_a_later_stage_does_not_see_an_earlier_peak():
+    tracker = MemoryTracker()
+    tracker.start()
+    try:
+        with tracker.stage("big"):
+            buffer = bytearray(8 << 20)
+            del buffer
+        with tracker.stage("small"):
+            pass
+    finally:
+        tracker.stop()
+    assert tracker.stages["big"]["python_peak_bytes"] >= 8 << 20
+    assert tracker.stages["small"]["python_peak_bytes"] < 8 << 20
@@ -0,0 +1,59 @@
+import pytest
+
+import metrics
+from metrics import Counter, Gauge, Histogram
+
+
+@pytest.fixture
+def registered():
+    created = []
+
+    def make(cls, *args, **kwargs):
+        metric = cls(*args, **kwargs)
+        created.append(metric)
+        return metric
+
+    yield make
+    for metric in created:
+        metrics.REGISTRY.remove(metric)
+
+
+def test_histogram_buckets_are_cumulative(registered):
+    histogram = registered(Histogram, "test_seconds", "Test latency.", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, path="/generate")
+    assert histogram.render() == [
+        "# HELP test_seconds Test latency.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{path="/generate",le="0.1"} 2',
+        'test_seconds_bucket{path="/generate",le="1"} 3',
+        'test_seconds_bucket{path="/generate",le="+Inf"} 4',
+        'test_seconds_sum{path="/generate"} 3.65',
+        'test_seconds_count{path="/generate"} 4',
+    ]
+
+
+def test_counter_and_gauge_series(registered):
+    counter = registered(Counter, "test_total", "Test events.")
+    counter.inc(status=200, path="/a")
+    counter.inc(2, path="/a", status=200)
+    gauge = registered(Gauge, "test_in_flight", "Test gauge.")
+    gauge.inc()
+    gauge.dec()
+    assert counter.render()[2:] == ['test_total{path="/a",status="200"} 3']
+    assert gauge.render() == ["# HELP test_in_flight Test gauge.", "# TYPE test_in_flight gauge", "test_in_flight 0"]
+
+
+def test_label_values_and_help_are_escaped(registered):
+    counter = registered(Counter, "test_escaped_total", "Line one\\nand a \\\\ backslash.")
+    counter.inc(error='bad "quote"\\path\nnext')
+    help_line, _, sample = counter.render()
+    assert help_line == "# HELP test_escaped_total Line one\\\\nand a \\\\\\\\ backslash."
+    assert sample == 'test_escaped_total{error="bad \\"quote\\"\\\\path\\nnext"} 1'
+
+
+def test_render_ends_with_a_newline_and_lists_every_metric(registered):
+    registered(Counter, "test_rendered_total", "Rendered.").inc()
+    text = metrics.render()
+    assert text.endswith("\n")
+    assert "# TYPE test_rendered_total counter\ntest_rendered_total 1\n" in text
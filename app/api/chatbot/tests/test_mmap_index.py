@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from mmap_index import MmapIndex, write_mmap_index, write_mmap_index_pages
+
+
+def rows(count, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [f"id-{i}" for i in range(count)]
+    documents = [f"document {i} ü" for i in range(count)]
+    metadatas = [{"source": "a.pdf", "row": i} for i in range(count)]
+    return ids, rng.standard_normal((count, dim)).astype(np.float32), documents, metadatas
+
+
+def pages_of(ids, vectors, documents, metadatas, size):
+    for start in range(0, len(ids), size):
+        end = start + size
+        yield ids[start:end], vectors[start:end], documents[start:end], metadatas[start:end]
+
+
+@pytest.mark.parametrize("vector_dtype", ["float32", "int8"])
+def test_paged_export_matches_one_shot(tmp_path, vector_dtype):
+    ids, vectors, documents, metadatas = rows(10)
+    one_shot, paged = str(tmp_path / "one.mmap"), str(tmp_path / "paged.mmap")
+    write_mmap_index(one_shot, ids, vectors, documents, metadatas, "v1", vector_dtype)
+    write_mmap_index_pages(paged, pages_of(ids, vectors, documents, metadatas, 3), 10, "v1", vector_dtype)
+    a, b = MmapIndex(one_shot), MmapIndex(paged)
+    assert list(b.ids) == ids and list(b.documents) == documents
+    assert [b.metadata(i) for i in range(len(b))] == metadatas
+    np.testing.assert_array_equal(a.vectors, b.vectors)
+    np.testing.assert_array_equal(a.norms, b.norms)
+    np.testing.assert_array_equal(a.scan, b.scan)
+    np.testing.assert_array_equal(b.vectors, vectors)
+
+
+def test_row_count_must_match(tmp_path):
+    ids, vectors, documents, metadatas = rows(4)
+    with pytest.raises(ValueError):
+        write_mmap_index_pages(str(tmp_path / "x.mmap"), pages_of(ids, vectors, documents, metadatas, 2), 5, "v1")
+
+
+def test_empty_index(tmp_path):
+    path = str(tmp_path / "empty.mmap")
+    write_mmap_index_pages(path, [], 0, "v1")
+    index = MmapIndex(path)
+    assert len(index) == 0 and list(index.ids) == []
+
+
+def test_float16_is_no_longer_written(tmp_path):
+    ids, vectors, documents, metadatas = rows(2)
+    with pytest.raises(ValueError):
+        write_mmap_index(str(tmp_path / "x.mmap"), ids, vectors, documents, metadatas, "v1", "float16")
@@ -0,0 +1,123 @@
+"""ModelRouter hedging and circuit breakers against the in-process Gemini stub."""
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from gemini_client import GeminiClient
+from hedging import HedgePolicy, ModelRouter
+from stub_gemini import StubConfig, create_app
+
+PROMPT, KEY = "Where should I stay in Paris?", "test-key"
+
+
+def client_for(config: StubConfig) -> GeminiClient:
+    # 500 is not retried by the client, so a failing model fails at once
+    return GeminiClient(base_url="http://stub/v1beta/models", transport=httpx.ASGITransport(app=create_app(config)))
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_slow_model_is_hedged_and_cancelled():
+    config = StubConfig(latency=0.0, model_latency={"slow": 5.0})
+    router = ModelRouter(["slow", "fast"], HedgePolicy(hedge_delay=0.05))
+
+    async def scenario():
+        gemini = client_for(config)
+        start = time.monotonic()
+        try:
+            model, answer = await router.call(lambda m: gemini.call_gemini(m, PROMPT, KEY))
+        finally:
+            await gemini.aclose()
+        return model, answer, time.monotonic() - start
+
+    model, answer, elapsed = run(scenario())
+    assert model == "fast" and answer.startswith("[fast]")
+    assert config.calls == {"slow": 1, "fast": 1}
+    assert elapsed < 1.0  # the slow call was cancelled, not awaited
+
+
+def test_failure_falls_back_without_waiting_for_the_hedge_delay():
+    config = StubConfig(latency=0.0, model_error_rate={"bad": 1.0}, error_status=500)
+    router = ModelRouter(["bad", "good"], HedgePolicy(hedge_delay=10))
+
+    async def scenario():
+        gemini = client_for(config)
+        try:
+            return await router.call(lambda m: gemini.call_gemini(m, PROMPT, KEY))
+        finally:
+            await gemini.aclose()
+
+    model, _ = run(scenario())
+    assert model == "good"
+
+
+def test_breaker_opens_then_closes_after_a_good_trial_call():
+    config = StubConfig(latency=0.0, model_error_rate={"bad": 1.0}, error_status=500)
+    router = ModelRouter(["bad", "good"], HedgePolicy(failure_threshold=2, open_seconds=0.2))
+
+    async def scenario():
+        gemini = client_for(config)
+        call = lambda m: gemini.call_gemini(m, PROMPT, KEY)  # noqa: E731
+        try:
+            for _ in range(3):
+                assert (await router.call(call))[0] == "good"
+            opened = router.snapshot()["bad"]["state"], config.calls["bad"]
+            await asyncio.sleep(0.25)
+            config.model_error_rate["bad"] = 0.0
+            model, _ = await router.call(call)
+            return opened, model, router.snapshot()["bad"]
+        finally:
+            await gemini.aclose()
+
+    (state, bad_calls), model, health = run(scenario())
+    assert state == "open" and bad_calls == 2  # the third call skipped the open model
+    assert model == "bad"  # half-open trial call went through and succeeded
+    assert health["state"] == "closed" and health["consecutive_failures"] == 0
+
+
+def test_all_breakers_open_is_a_503():
+    config = StubConfig(latency=0.0, error_rate=1.0, error_status=500)
+    router = ModelRouter(["a"], HedgePolicy(failure_threshold=1, open_seconds=60))
+
+    async def scenario():
+        gemini = client_for(config)
+        call = lambda m: gemini.call_gemini(m, PROMPT, KEY)  # noqa: E731
+        try:
+            with pytest.raises(HTTPException):
+                await router.call(call)
+            with pytest.raises(HTTPException) as unavailable:
+                await router.call(call)
+            return unavailable.value.status_code
+        finally:
+            await gemini.aclose()
+
+    assert run(scenario()) == 503
+    assert config.calls == {"a": 1}
+
+
+def test_hedged_streams_keep_the_winner_and_close_the_rest():
+    config = StubConfig(latency=0.0, token_delay=0.0, model_latency={"slow": 5.0})
+    router = ModelRouter(["slow", "fast"], HedgePolicy(hedge_delay=0.05))
+
+    async def scenario():
+        gemini = client_for(config)
+
+        async def first_token(model):
+            stream = gemini.stream_gemini(model, PROMPT, KEY)
+            return await stream.__anext__(), stream
+
+        try:
+            model, (first, stream) = await router.call(first_token, discard=lambda result: result[1].aclose())
+            rest = [text async for text in stream]
+            return model, first + "".join(rest)
+        finally:
+            await gemini.aclose()
+
+    model, answer = run(scenario())
+    assert model == "fast"
+    assert answer == f"[fast] {StubConfig().answer}"
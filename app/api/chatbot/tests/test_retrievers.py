@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from mmap_index import MMAP_FILE, write_mmap_index
+from retrievers import ExactRetriever, HnswRetriever, MmapRetriever, select_retriever
+
+
+class Collection:
+    def __init__(self, ids, vectors, documents, metadatas):
+        self.rows = ids, vectors, documents, metadatas
+
+    def count(self):
+        return len(self.rows[0])
+
+    def get(self, include, limit, offset):
+        ids, vectors, documents, metadatas = (r[offset:offset + limit] for r in self.rows)
+        return {"ids": ids, "embeddings": vectors, "documents": documents, "metadatas": metadatas}
+
+
+def store(tmp_path, count=6, vector_dtype="float32"):
+    vectors = np.random.default_rng(0).standard_normal((count, 4)).astype(np.float32)
+    ids = [f"id-{i}" for i in range(count)]
+    documents = [f"text {i}" for i in range(count)]
+    metadatas = [{"i": i} for i in range(count)]
+    write_mmap_index(str(tmp_path / MMAP_FILE), ids, vectors, documents, metadatas, "v1", vector_dtype)
+    return SimpleNamespace(_collection=Collection(ids, vectors, documents, metadatas)), vectors
+
+
+def test_auto_uses_the_export_while_it_is_small(tmp_path):
+    db, _ = store(tmp_path)
+    retriever = select_retriever(db, "auto", max_exact=10, persist_directory=str(tmp_path), index_version="v1")
+    assert isinstance(retriever, MmapRetriever)
+
+
+def test_auto_uses_hnsw_above_max_exact_even_with_an_export(tmp_path):
+    db, _ = store(tmp_path)
+    retriever = select_retriever(db, "auto", max_exact=5, persist_directory=str(tmp_path), index_version="v1")
+    assert isinstance(retriever, HnswRetriever)
+
+
+def test_auto_uses_an_int8_export_above_max_exact(tmp_path):
+    db, _ = store(tmp_path, vector_dtype="int8")
+    retriever = select_retriever(db, "auto", max_exact=5, persist_directory=str(tmp_path), index_version="v1")
+    assert isinstance(retriever, MmapRetriever)
+    assert retriever.index.scan_dtype == "int8"
+
+
+def test_explicit_mmap_ignores_max_exact(tmp_path):
+    db, _ = store(tmp_path)
+    retriever = select_retriever(db, "mmap", max_exact=5, persist_directory=str(tmp_path), index_version="v1")
+    assert isinstance(retriever, MmapRetriever)
+
+
+def test_stale_export_falls_back_to_exact(tmp_path):
+    db, _ = store(tmp_path)
+    retriever = select_retriever(db, "auto", max_exact=10, persist_directory=str(tmp_path), index_version="v2")
+    assert type(retriever) is ExactRetriever
+
+
+def test_mmap_and_exact_rank_the_same(tmp_path):
+    db, vectors = store(tmp_path)
+    exact = ExactRetriever.from_collection(db._collection)
+    mapped = select_retriever(db, "mmap", persist_directory=str(tmp_path), index_version="v1")
+    query = vectors[2] + 0.01
+    assert [d.page_content for d, _ in exact.search(query, 3)] == [d.page_content for d, _ in mapped.search(query, 3)]
+    assert exact.search(query, 1)[0][0].page_content == "text 2"
+
+
+def test_int8_scan_rescores_to_exact_distances(tmp_path):
+    db, vectors = store(tmp_path, count=50)
+    ids, _, documents, metadatas = db._collection.rows
+    write_mmap_index(str(tmp_path / MMAP_FILE), ids, vectors, documents, metadatas, "v1", "int8")
+    quantized = select_retriever(db, "mmap", persist_directory=str(tmp_path), index_version="v1")
+    exact = ExactRetriever.from_collection(db._collection)
+    assert quantized.name == "mmap-int8"
+    query = vectors[7] + 0.05
+    expected = [(d.page_content, round(s, 4)) for d, s in exact.search(query, 5)]
+    assert [(d.page_content, round(s, 4)) for d, s in quantized.search(query, 5)] == expected
+
+
+def test_empty_collection_searches_to_nothing():
+    db = SimpleNamespace(_collection=Collection([], [], [], []))
+    retriever = select_retriever(db, "auto")
+    assert type(retriever) is ExactRetriever
+    assert retriever.search(np.ones(4, dtype=np.float32), 3) == []
+
+
+def test_exact_filter_ors_categories_and_ands_places():
+    metadatas = [{"category_flight": True, "city_paris": True}, {"category_hotel": True, "city_paris": True},
+                 {"category_car": True, "city_paris": True}, {"category_hotel": True, "city_tokyo": True}]
+    retriever = ExactRetriever([f"id-{i}" for i in range(4)], np.eye(4, dtype=np.float32), ["a", "b", "c", "d"], metadatas)
+    where = {"$and": [{"$or": [{"category_flight": True}, {"category_hotel": True}]}, {"city_paris": True}]}
+    assert retriever.rows_matching(where).tolist() == [0, 1]
@@ -0,0 +1,31 @@
+"""check_startup.py's import and ready budgets, run as part of the suite."""
+import os
+import socket
+import statistics
+
+import pytest
+
+import check_startup
+
+pytestmark = pytest.mark.slow
+
+
+@pytest.fixture
+def env():
+    return dict(os.environ, EMBEDDING_BACKEND="local")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_import_stays_under_budget(env):
+    seconds = statistics.median(check_startup.measure_import(env) for _ in range(3))
+    assert seconds <= check_startup.IMPORT_BUDGET_SECONDS, check_startup.slowest_imports(env)
+
+
+def test_worker_is_ready_under_budget(env, tmp_path):
+    budget = check_startup.READY_BUDGET_SECONDS
+    assert check_startup.measure_ready(env, free_port(), str(tmp_path), budget * 3) <= budget
@@ -0,0 +1,53 @@
+from langchain.schema.document import Document
+
+from entities import load_mock_data
+from populate_database import split_documents, tables_in_files
+from table_splitter import TableRowSplitter, parse_row_chunk
+
+TABLES = load_mock_data().tables
+CAR_ROW = ["UAE", "Dubai", "SUV", "2025-12-23", "2025-12-26", 252, 30]
+
+
+def pdf_page(title, rows):
+    """A page as pypdf extracts a reportlab table: the title, then one cell per line."""
+    lines = [title] + TABLES[title] + [str(cell) for row in rows for cell in row]
+    return Document(page_content="\n".join(lines), metadata={"source": "data/mock.pdf", "page": 0})
+
+
+def pdf_chunk_text():
+    return TableRowSplitter(TABLES, fallback=None).split_document(pdf_page("Car Rental Data", [CAR_ROW]))[0].page_content
+
+
+def test_pdf_rows_become_one_chunk_each():
+    chunks = TableRowSplitter(TABLES, fallback=None).split_document(pdf_page("Car Rental Data", [CAR_ROW, CAR_ROW]))
+    assert len(chunks) == 2
+    title, rows = parse_row_chunk(chunks[0].page_content)
+    assert title == "Car Rental Data" and rows[0]["Car Type"] == "SUV"
+
+
+def test_pdf_rows_of_a_table_supplied_by_a_file_are_skipped():
+    splitter = TableRowSplitter(TABLES, fallback=None, skip_tables=["Car Rental Data"])
+    assert splitter.split_document(pdf_page("Car Rental Data", [CAR_ROW])) == []
+
+
+def test_records_keep_typed_metadata():
+    records = [dict(zip(TABLES["Car Rental Data"], CAR_ROW))]
+    [chunk] = TableRowSplitter(TABLES, fallback=None).split_records("data/car_rental_data.csv", records)
+    assert chunk.page_content == pdf_chunk_text()
+    assert chunk.metadata["adult_price"] == 252 and chunk.metadata["rental_start"] == "2025-12-23"
+    assert chunk.metadata["table"] == "Car Rental Data"
+
+
+def test_unknown_table_files_are_skipped(tmp_path, capsys):
+    notes = tmp_path / "notes.csv"
+    notes.write_text("a,b\n1,2\n")
+    cars = tmp_path / "car_rental_data.csv"
+    cars.write_text(",".join(TABLES["Car Rental Data"]) + "\n" + ",".join(map(str, CAR_ROW)) + "\n")
+    chunks = list(split_documents([], table_sources=[str(notes), str(cars)]))
+    assert [c.metadata["table"] for c in chunks] == ["Car Rental Data"]
+    assert "Skipping" in capsys.readouterr().out
+
+
+def test_tables_in_files():
+    sources = ["data/mock.pdf", "data/flight_data.csv", "data/hotel_data.jsonl", "data/notes.csv"]
+    assert tables_in_files(sources) == ["Flight Data", "Hotel Data"]
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import tracing
+from tracing import SPAN_KIND_SERVER, Span, SpanExporter, parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+SPAN_ID = "00f067aa0ba902b7"
+
+
+def test_valid_header():
+    assert parse_traceparent(f"00-{TRACE_ID}-{SPAN_ID}-01") == (TRACE_ID, SPAN_ID, True)
+    assert parse_traceparent(f"00-{TRACE_ID}-{SPAN_ID}-00") == (TRACE_ID, SPAN_ID, False)
+
+
+def test_future_version_may_carry_more_fields():
+    assert parse_traceparent(f"cc-{TRACE_ID}-{SPAN_ID}-01-extra") == (TRACE_ID, SPAN_ID, True)
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    f"ff-{TRACE_ID}-{SPAN_ID}-01",              # forbidden version
+    f"0-{TRACE_ID}-{SPAN_ID}-01",               # short version
+    f"00-{TRACE_ID}-{SPAN_ID}-01-extra",        # version 00 has exactly four fields
+    f"00-{'0' * 32}-{SPAN_ID}-01",              # all-zero trace id
+    f"00-{TRACE_ID}-{'0' * 16}-01",             # all-zero span id
+    f"00-{TRACE_ID[:-1]}-{SPAN_ID}-01",         # short trace id
+    f"00-{TRACE_ID}-{SPAN_ID}0-01",             # long span id
+    f"00-{TRACE_ID}-{SPAN_ID}-1",               # short flags
+    f"00-{TRACE_ID.upper()}-{SPAN_ID}-01",      # uppercase hex
+    f"00-{TRACE_ID[:-1]}g-{SPAN_ID}-01",        # not hex
+    f"00-{TRACE_ID}-{SPAN_ID}",                 # missing flags
+])
+def test_invalid_headers(header):
+    assert parse_traceparent(header) is None
+
+
+def test_otlp_json_export(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = SpanExporter(str(path), flush_interval=0.01)
+    span = Span("POST /generate", TRACE_ID, SPAN_ID, SPAN_KIND_SERVER,
+                {"http.status_code": 200, "cache.hit": False, "score": 0.5, "model": "gemini"})
+    span.end_ns = span.start_ns + 1000
+    failed = Span("llm", TRACE_ID, span.span_id)
+    failed.fail(RuntimeError("quota"))
+    failed.end_ns = failed.start_ns
+    exporter.submit(span)
+    exporter.submit(failed)
+    exporter.close()
+
+    payload = json.loads(path.read_text().splitlines()[0])
+    resource, = payload["resourceSpans"]
+    assert resource["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": tracing.SERVICE_NAME}}]
+    exported = {s["name"]: s for scope in resource["scopeSpans"] for s in scope["spans"]}
+    server = exported["POST /generate"]
+    assert (server["traceId"], server["parentSpanId"], server["kind"]) == (TRACE_ID, SPAN_ID, SPAN_KIND_SERVER)
+    assert int(server["endTimeUnixNano"]) - int(server["startTimeUnixNano"]) == 1000
+    assert server["attributes"] == [
+        {"key": "http.status_code", "value": {"intValue": "200"}},
+        {"key": "cache.hit", "value": {"boolValue": False}},
+        {"key": "score", "value": {"doubleValue": 0.5}},
+        {"key": "model", "value": {"stringValue": "gemini"}},
+    ]
+    assert server["status"] == {"code": 1}
+    assert exported["llm"]["parentSpanId"] == span.span_id
+    assert exported["llm"]["status"] == {"code": 2, "message": "quota"}
+
+
+def test_middleware_continues_the_callers_trace(tmp_path):
+    app = FastAPI()
+    app.middleware("http")(tracing.tracing_middleware)
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    path = tmp_path / "traces.jsonl"
+    tracing.configure(str(path))
+    try:
+        with TestClient(app) as client:
+            continued = client.get("/ping", headers={"traceparent": f"00-{TRACE_ID}-{SPAN_ID}-01"})
+            started = client.get("/ping")
+    finally:
+        tracing.shutdown()
+
+    assert parse_traceparent(continued.headers["traceparent"])[0] == TRACE_ID
+    assert parse_traceparent(started.headers["traceparent"])[0] != TRACE_ID
+    spans = [s for line in path.read_text().splitlines()
+             for scope in json.loads(line)["resourceSpans"][0]["scopeSpans"] for s in scope["spans"]]
+    assert [s.get("parentSpanId") for s in spans] == [SPAN_ID, None]
@@ -0,0 +1,29 @@
+import sqlite3
+
+import pytest
+
+from local_embeddings import HashingEmbeddings
+from travel_store import TRAVEL_FILE, open_travel_store
+from vector_store import VectorStore, write_index_version
+
+
+def test_garbage_file_is_ignored(tmp_path, capsys):
+    (tmp_path / TRAVEL_FILE).write_bytes(b"SQLite format 3\x00" + b"\xff" * 100)
+    assert open_travel_store(str(tmp_path), "v1") is None
+    assert "Ignoring" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("schema", ["CREATE TABLE other (x)", "CREATE TABLE meta (key, value)"])
+def test_another_database_is_ignored(tmp_path, schema):
+    conn = sqlite3.connect(tmp_path / TRAVEL_FILE)
+    conn.execute(schema)
+    conn.commit()
+    conn.close()
+    assert open_travel_store(str(tmp_path), "v1") is None
+
+
+def test_reload_survives_a_corrupt_travel_store(tmp_path):
+    write_index_version(str(tmp_path), "v1")
+    (tmp_path / TRAVEL_FILE).write_bytes(b"not a database")
+    store = VectorStore(str(tmp_path), HashingEmbeddings(size=16), retriever="hnsw")
+    assert store.travel is None and store.version == "v1"
@@ -0,0 +1,39 @@
+import asyncio
+from types import SimpleNamespace
+
+import app as chatbot
+from local_embeddings import HashingEmbeddings
+
+
+class FakeStore:
+    def __init__(self, path, embedding_function):
+        self.embedding_function = embedding_function
+
+    def similarity_search_by_vector_with_score(self, embedding, k, where=None):
+        return []
+
+
+def no_vocabulary():
+    raise OSError("mock data missing")
+
+
+def test_warm_up_retries_opening_the_vector_store(monkeypatch):
+    attempts = []
+
+    def open_store(path, embedding_function):
+        attempts.append(path)
+        if len(attempts) == 1:
+            raise RuntimeError("index locked")
+        return FakeStore(path, embedding_function)
+
+    monkeypatch.setattr(chatbot, "VectorStore", open_store)
+    monkeypatch.setattr(chatbot, "get_embedding_function", lambda: HashingEmbeddings(size=16))
+    monkeypatch.setattr(chatbot, "WARM_UP_RETRY_SECONDS", 0)
+    monkeypatch.setattr(chatbot.EntityMatcher, "load", no_vocabulary)
+    app = SimpleNamespace(state=SimpleNamespace(ready=False, startup_error=None, entity_matcher=None, fast_path=None))
+
+    asyncio.run(chatbot.warm_up(app))
+
+    assert len(attempts) == 2
+    assert app.state.ready and app.state.startup_error is None
+    assert isinstance(app.state.vector_store, FakeStore)
@@ -0,0 +1,270 @@
+"""Minimal W3C-trace-context tracing with OTLP/JSON export.
+
+Tracing is off unless TRACE_FILE (one OTLP/JSON export request per line) or
+OTEL_EXPORTER_OTLP_ENDPOINT (an OTLP/HTTP collector, e.g. http://localhost:4318)
+is set. The incoming `traceparent` header is continued, so spans line up
+with whatever started the trace upstream. Finished spans go on a queue and a
+background thread exports them in batches.
+"""
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import httpx
+
+
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "chatbot-api")
+TRACE_FILE = os.getenv("TRACE_FILE")
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1"))
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+_HEX = re.compile(r"[0-9a-f]+")
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_exporter: Optional["SpanExporter"] = None
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+                 "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 kind: int = SPAN_KIND_INTERNAL, attributes: dict = None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def fail(self, error):
+        self.error = str(error) or type(error).__name__
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if _exporter is not None:
+                _exporter.submit(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def parse_traceparent(header: Optional[str]):
+    """Return (trace id, parent span id, sampled) or None for a missing/invalid header.
+
+    Fields are lowercase hex of fixed width. Version 00 has exactly four
+    fields; later versions may append more, which are ignored.
+    """
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4:
+        return None
+    version, trace_id, span_id, flags = parts[:4]
+    if [len(version), len(trace_id), len(span_id), len(flags)] != [2, 32, 16, 2]:
+        return None
+    if not all(_HEX.fullmatch(part) for part in (version, trace_id, span_id, flags)):
+        return None
+    if version == "ff" or (version == "00" and len(parts) != 4):
+        return None
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_span(name: str, kind: int = SPAN_KIND_INTERNAL, parent: Optional[Span] = None,
+               **attributes) -> Optional[Span]:
+    """Start a child span without making it current (for async generators).
+
+    The caller ends it with end_span(). Returns None outside a traced request.
+    """
+    parent = parent or _current.get()
+    if parent is None:
+        return None
+    return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+
+def annotate(s: Optional[Span], **attributes):
+    if s is not None:
+        s.attributes.update(attributes)
+
+
+def fail_span(s: Optional[Span], error):
+    if s is not None:
+        s.fail(error)
+
+
+def end_span(s: Optional[Span]):
+    if s is not None:
+        s.end()
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+    """Time a block as a child of the current span; a no-op outside a traced request."""
+    child = start_span(name, kind, **attributes)
+    if child is None:
+        yield None
+        return
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.fail(e)
+        raise
+    finally:
+        _current.reset(token)
+        child.end()
+
+
+class SpanExporter:
+    """Batches finished spans into OTLP/JSON export requests on a writer thread."""
+
+    def __init__(self, path: str = None, endpoint: str = None, batch_size: int = 512,
+                 flush_interval: float = 2.0, queue_size: int = 20000):
+        self.path = path
+        self.endpoint = endpoint.rstrip("/") + "/v1/traces" if endpoint else None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        client = httpx.Client(timeout=5) if self.endpoint else None
+        done = False
+        while not done:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                done = True
+                batch = [s for s in batch if s is not None]
+            if batch:
+                self._export(batch, client)
+        if client is not None:
+            client.close()
+
+    def _export(self, batch, client):
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "chatbot"}, "spans": [s.to_otlp() for s in batch]}],
+        }]}
+        if self.path:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(payload) + "\n")
+        if client is not None:
+            try:
+                client.post(self.endpoint, json=payload)
+            except httpx.HTTPError:
+                self.dropped += len(batch)
+
+
+def configure(path: str = TRACE_FILE, endpoint: str = OTLP_ENDPOINT):
+    global _exporter
+    if path or endpoint:
+        _exporter = SpanExporter(path, endpoint)
+
+
+def shutdown():
+    global _exporter
+    if _exporter is not None:
+        exporter, _exporter = _exporter, None
+        exporter.close()
+
+
+async def tracing_middleware(request, call_next):
+    """Continue (or start) a trace for the request and make its server span current."""
+    if _exporter is None:
+        return await call_next(request)
+
+    parent = parse_traceparent(request.headers.get("traceparent"))
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+        sampled = random.random() < TRACE_SAMPLE_RATE
+    if not sampled:
+        return await call_next(request)
+
+    root = Span(f"{request.method} {request.url.path}", trace_id, parent_id, SPAN_KIND_SERVER,
+                {"http.method": request.method, "http.target": request.url.path})
+    token = _current.set(root)
+    try:
+        response = await call_next(request)
+    except BaseException as e:
+        root.fail(e)
+        raise
+    else:
+        root.set("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            root.fail(f"HTTP {response.status_code}")
+        response.headers["traceparent"] = root.traceparent
+        return response
+    finally:
+        _current.reset(token)
+        root.end()
@@ -0,0 +1,107 @@
+"""The flights / cars / hotels tables as an indexed SQLite database.
+
+populate_database rebuilds chroma/travel.sqlite3 from the table row chunks
+on every publish, stamped with the index version. API workers copy it into
+an in-memory database on (re)load, so a lookup by city or flight number is
+an index probe that takes well under a millisecond.
+
+Columns are the generate_mock_data headers in snake_case ("Adult Price Per
+Night" -> adult_price_per_night). Each row keeps the ID of the chunk it came
+from, so structured answers cite the same sources RAG answers do.
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, List
+
+from entities import slug
+from index_files import open_versioned
+from table_splitter import parse_row_chunk
+
+
+TRAVEL_FILE = "travel.sqlite3"
+TABLE_NAMES = {"Flight Data": "flights", "Car Rental Data": "cars", "Hotel Data": "hotels"}
+INDEXES = {
+    "flights": [("origin_city", "destination_city"), ("destination_city",), ("flight_number",)],
+    "cars": [("city", "car_type")],
+    "hotels": [("city", "hotel_name")],
+}
+
+
+def _column_type(column: str) -> str:
+    # NUMERIC keeps 686 an integer and 99.5 a real; dates stay ISO text so they sort and strftime() works
+    return "NUMERIC" if "price" in column else "TEXT"
+
+
+def build_travel_store(path: str, ids: List[str], documents: List[str], metadatas: List[dict],
+                       tables: Dict[str, List[str]], index_version: str) -> int:
+    """Write every table row chunk into a new SQLite file, then atomically replace `path`."""
+    rows_by_table = {title: [] for title in tables}
+    for chunk_id, text, metadata in zip(ids, documents, metadatas):
+        title = (metadata or {}).get("table")
+        if title not in rows_by_table:
+            continue
+        for row in parse_row_chunk(text)[1]:
+            rows_by_table[title].append((chunk_id, row))
+
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    total = 0
+    try:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("INSERT INTO meta VALUES ('index_version', ?)", (index_version,))
+        for title, headers in tables.items():
+            table = TABLE_NAMES.get(title, slug(title))
+            columns = [slug(h) for h in headers]
+            definition = ", ".join(f"{c} {_column_type(c)}" for c in columns)
+            conn.execute(f"CREATE TABLE {table} (chunk_id TEXT, {definition})")
+            conn.executemany(
+                f"INSERT INTO {table} VALUES ({', '.join('?' * (len(columns) + 1))})",
+                ([chunk_id] + [row.get(h) for h in headers] for chunk_id, row in rows_by_table[title]),
+            )
+            for indexed in INDEXES.get(table, []):
+                conn.execute(f"CREATE INDEX {table}_{'_'.join(indexed)} ON {table} ({', '.join(indexed)})")
+            total += len(rows_by_table[title])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return total
+
+
+class TravelStore:
+    """In-memory copy of travel.sqlite3; one connection shared by all threads behind a lock.
+
+    A file that is not a travel store (truncated, corrupt, or another
+    database) raises ValueError, which open_versioned treats as no tables.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        try:
+            source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                source.backup(self._conn)
+            finally:
+                source.close()
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'index_version'").fetchone()
+        except sqlite3.DatabaseError as e:
+            self._conn.close()
+            raise ValueError(f"not a travel store: {e}") from e
+        if row is None:
+            self._conn.close()
+            raise ValueError("not a travel store: no index_version")
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self.index_version = row[0]
+
+    def query(self, sql: str, params=()) -> List[dict]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+
+def open_travel_store(persist_directory: str, index_version: str):
+    """The travel tables, if present and built for this index version."""
+    return open_versioned(persist_directory, TRAVEL_FILE, index_version, TravelStore)
@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+
+from entities import metadata_matches
+from lexical_index import FILTER_OVERSAMPLE, open_lexical_index
+from retrievers import RETRIEVER, select_retriever
+from travel_store import open_travel_store
+
+
+INDEX_VERSION_FILE = "index_version"
+RELOAD_CHECK_INTERVAL = float(os.getenv("INDEX_RELOAD_CHECK_INTERVAL", "5"))
+
+
+def read_index_version(persist_directory: str) -> str:
+    """Return the version token written by populate_database, or "0" if none exists."""
+    try:
+        with open(os.path.join(persist_directory, INDEX_VERSION_FILE)) as f:
+            return f.read().strip() or "0"
+    except FileNotFoundError:
+        return "0"
+
+
+def new_index_version() -> str:
+    return str(time.time_ns())
+
+
+def write_index_version(persist_directory: str, version: str = None) -> str:
+    """Publish a new index version so running API workers reopen the store."""
+    os.makedirs(persist_directory, exist_ok=True)
+    version = version or new_index_version()
+    path = os.path.join(persist_directory, INDEX_VERSION_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+    return version
+
+
+class _ReadWriteLock:
+    """Many concurrent searches, or one reload, never both."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writing = True
+
+    def release_write(self):
+        with self._cond:
+            self._writing = False
+            self._cond.notify_all()
+
+
+class VectorStore:
+    """Process-wide Chroma handle, opened once and shared by every request.
+
+    The embedder is built a single time. The Chroma client is reopened only
+    when populate_database publishes a new index version. Vector searches go
+    through a retriever picked on each (re)load: see retrievers.select_retriever.
+    Keyword searches use the BM25 index published with the same version, if any,
+    and structured lookups the travel tables published with it.
+    """
+
+    def __init__(self, persist_directory: str, embedding_function, retriever: str = RETRIEVER):
+        self.persist_directory = persist_directory
+        self.embedding_function = embedding_function
+        self.retriever_mode = retriever
+        self.retriever = None
+        self.lexical = None
+        self.travel = None
+        self.version = None
+        self._db = None
+        self._lock = _ReadWriteLock()
+        self._reload_guard = threading.Lock()
+        self._next_check = 0.0
+        self.reload()
+
+    def reload(self):
+        version = read_index_version(self.persist_directory)
+        self._lock.acquire_write()
+        try:
+            if self._db is not None:
+                # Drop Chroma's cached client so segments are re-read from disk.
+                from chromadb.api.client import SharedSystemClient
+                SharedSystemClient.clear_system_cache()
+            # Imported here: langchain_community is a large share of API import time.
+            from langchain_community.vectorstores import Chroma
+            self._db = Chroma(
+                persist_directory=self.persist_directory,
+                embedding_function=self.embedding_function,
+            )
+            self.retriever = select_retriever(self._db, self.retriever_mode,
+                                              persist_directory=self.persist_directory,
+                                              index_version=version)
+            self.lexical = open_lexical_index(self.persist_directory, version)
+            self.travel = open_travel_store(self.persist_directory, version)
+            self.version = version
+        finally:
+            self._lock.release_write()
+        print(f"Vector store loaded (index version {version}, {self.retriever.name} search"
+              f"{', bm25' if self.lexical is not None else ''}{', travel tables' if self.travel is not None else ''})")
+
+    def maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check or not self._reload_guard.acquire(blocking=False):
+            return
+        try:
+            self._next_check = now + RELOAD_CHECK_INTERVAL
+            if read_index_version(self.persist_directory) != self.version:
+                self.reload()
+        finally:
+            self._reload_guard.release()
+
+    def similarity_search_by_vector_with_score(self, embedding, k: int = 5, where: dict = None):
+        self.maybe_reload()
+        self._lock.acquire_read()
+        try:
+            return self.retriever.search(embedding, k, where)
+        finally:
+            self._lock.release_read()
+
+    def lexical_search(self, query: str, k: int = 5, where: dict = None):
+        """BM25 top-k as (Document, score, precise); empty without a current BM25 index.
+
+        A `where` filter drops hits whose metadata does not match it; BM25
+        ranks FILTER_OVERSAMPLE times as many chunks first, so filtering does
+        not leave the keyword leg empty.
+        """
+        self.maybe_reload()
+        self._lock.acquire_read()
+        try:
+            if self.lexical is None:
+                return []
+            hits = self.lexical.search(query, k * FILTER_OVERSAMPLE if where else k)
+            if not hits:
+                return []
+            found = self._db.get(ids=[doc_id for doc_id, _, _ in hits], include=["documents", "metadatas"])
+        finally:
+            self._lock.release_read()
+        from langchain.schema.document import Document
+        by_id = {
+            doc_id: Document(page_content=text, metadata=metadata or {})
+            for doc_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        return [
+            (by_id[doc_id], score, precise)
+            for doc_id, score, precise in hits
+            if doc_id in by_id and metadata_matches(by_id[doc_id].metadata, where)
+        ][:k]
+
+    def query_travel(self, sql: str, params=()):
+        """Rows from the travel tables as dicts; None without current travel tables."""
+        self.maybe_reload()
+        travel = self.travel
+        return None if travel is None else travel.query(sql, params)
@@ -39,15 +39,44 @@ export default function Chatbot() {
 
     const res = await fetch("/api/chatbot", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
       body: JSON.stringify({ messages: [systemMessage, ...messages, userMessage] }),
     });
 
-    const data = await res.json();
-    const botContent = data.error ?? data.message;
-    const botMessage = { role: "assistant", content: botContent };
+    if (!res.ok || !res.body) {
+      const data = await res.json();
+      const botContent = data.error ?? data.message;
+      setMessages((prev) => [...prev, { role: "assistant", content: botContent }]);
+      speak(botContent);
+      return;
+    }
+
+    // show tokens as they stream in, then speak the full answer
+    setMessages((prev) => [...prev, { role: "assistant", content: "" }]);
+    let botContent = "";
+    const appendToReply = (text: string) => {
+      botContent += text;
+      setMessages((prev) => [...prev.slice(0, -1), { role: "assistant", content: botContent }]);
+    };
 
-    setMessages((prev) => [...prev, botMessage]);
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split("\n\n");
+      buffer = events.pop() ?? "";
+      for (const raw of events) {
+        const event = raw.match(/^event: (.*)$/m)?.[1];
+        const data = raw.match(/^data: (.*)$/m)?.[1];
+        if (!data) continue;
+        const payload = JSON.parse(data);
+        if (event === "token") appendToReply(payload.text);
+        if (event === "error") appendToReply(payload.error);
+      }
+    }
 
    speak(botContent);
   };
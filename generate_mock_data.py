@@ -1,10 +1,8 @@
+import argparse
+import os
 import pandas as pd
 import random
 from datetime import datetime, timedelta
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, PageBreak
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
 
 cities = {
     "New York": "USA", "London": "UK", "Paris": "France",
@@ -18,6 +16,15 @@ peak_months = {7, 8, 12}
 airlines = ["Airways Intl", "Global Flights", "Sky High", "Continental Express", "TransWorld Airlines"]
 car_base_rates = {"Economy": 30, "Compact": 40, "SUV": 70, "Luxury": 120, "Van": 90}
 
+flight_columns = [
+    "Origin Country","Origin City","Destination Country","Destination City",
+    "Departure Date","Return Date","Airline","Flight Number","Adult Price","Child Price"
+]
+car_columns = ["Country","City","Car Type","Rental Start","Rental End","Adult Price","Child Price"]
+hotel_columns = ["Country","City","Hotel Name","Check-in","Check-out","Adult Price Per Night","Child Price Per Night"]
+# PDF table title -> header row
+tables = {"Flight Data": flight_columns, "Car Rental Data": car_columns, "Hotel Data": hotel_columns}
+
 def make_flights():
     rows = []
     for o_city, o_country in cities.items():
@@ -32,10 +39,7 @@ def make_flights():
             adult = round(base * mult)
             child = round(adult * 0.75)
             rows.append([o_country, o_city, d_country, d_city, dep.date(), ret.date(), airline, num, adult, child])
-    return pd.DataFrame(rows, columns=[
-        "Origin Country","Origin City","Destination Country","Destination City",
-        "Departure Date","Return Date","Airline","Flight Number","Adult Price","Child Price"
-    ])
+    return pd.DataFrame(rows, columns=flight_columns)
 
 def make_cars():
     rows = []
@@ -49,9 +53,7 @@ def make_cars():
                 adult = round(rate * mult * dur)
                 child = dur * 10
                 rows.append([country, city, ctype, start.date(), end.date(), adult, child])
-    return pd.DataFrame(rows, columns=[
-        "Country","City","Car Type","Rental Start","Rental End","Adult Price","Child Price"
-    ])
+    return pd.DataFrame(rows, columns=car_columns)
 
 def make_hotels():
     rows = []
@@ -67,27 +69,72 @@ def make_hotels():
                 a_rate = round(base * mult)
                 c_rate = round(a_rate * 0.5)
                 rows.append([country, city, name, ci.date(), co.date(), a_rate, c_rate])
-    return pd.DataFrame(rows, columns=[
-        "Country","City","Hotel Name","Check-in","Check-out","Adult Price Per Night","Child Price Per Night"
+    return pd.DataFrame(rows, columns=hotel_columns)
+
+def make_tables():
+    """Table title -> DataFrame, one fresh random draw of every table."""
+    return {"Flight Data": make_flights(), "Car Rental Data": make_cars(), "Hotel Data": make_hotels()}
+
+def table_filename(title, fmt):
+    # populate_database maps the file name back to the table: "Flight Data" -> flight_data.csv
+    return f"{title.lower().replace(' ', '_')}.{fmt}"
+
+def write_tables(frames, directory=".", formats=("csv",)):
+    """Write each table as CSV, JSONL and/or Parquet for direct ingestion, no PDF parsing needed."""
+    os.makedirs(directory, exist_ok=True)
+    for title, df in frames.items():
+        for fmt in formats:
+            path = os.path.join(directory, table_filename(title, fmt))
+            if fmt == "csv":
+                df.to_csv(path, index=False)
+            elif fmt == "jsonl":
+                # dates as ISO strings, prices stay JSON numbers
+                df.astype({c: str for c in df.columns if df[c].dtype == object}).to_json(path, orient="records", lines=True)
+            elif fmt == "parquet":
+                # needs pyarrow (or fastparquet); dates are stored as date32
+                df.to_parquet(path, index=False)
+            else:
+                raise ValueError(f"Unknown table format: {fmt}")
+            print(f"{title} written to {path}")
+
+def write_pdf(path="mock_travel_data.pdf", frames=None):
+    # reportlab is only needed to render the PDF; importing the vocab above stays cheap
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, PageBreak
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    doc = SimpleDocTemplate(path, pagesize=letter)
+    styles = getSampleStyleSheet()
+    elements = []
+    style = TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#d5d5d5')),
+        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
     ])
 
-doc = SimpleDocTemplate("mock_travel_data.pdf", pagesize=letter)
-styles = getSampleStyleSheet()
-elements = []
-style = TableStyle([
-    ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#d5d5d5')),
-    ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-])
+    for title, df in (frames or make_tables()).items():
+        elements.append(Paragraph(title, styles['Heading2']))
+        data = [df.columns.tolist()] + df.values.tolist()
+        tbl = Table(data, repeatRows=1)
+        tbl.setStyle(style)
+        elements.append(tbl)
+        elements.append(PageBreak())
 
-for title, df in [("Flight Data", make_flights()), ("Car Rental Data", make_cars()), ("Hotel Data", make_hotels())]:
-    elements.append(Paragraph(title, styles['Heading2']))
-    data = [df.columns.tolist()] + df.values.tolist()
-    tbl = Table(data, repeatRows=1)
-    tbl.setStyle(style)
-    elements.append(tbl)
-    elements.append(PageBreak())
+    doc.build(elements)
+    print(f"PDF written to {path}")
 
-doc.build(elements)
-print("PDF written to mock_travel_data.pdf")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--formats", nargs="+", choices=["pdf", "csv", "jsonl", "parquet"], default=["pdf"],
+                        help="What to write. populate_database indexes a table from its CSV / JSONL / Parquet "
+                             "file when there is one and skips that table's rows in the PDF, so "
+                             "'--formats pdf csv --out-dir data' is safe; keep one table file per table.")
+    parser.add_argument("--out-dir", default=".", help="Where to write the files.")
+    args = parser.parse_args()
+    frames = make_tables()
+    if "pdf" in args.formats:
+        os.makedirs(args.out_dir, exist_ok=True)
+        write_pdf(os.path.join(args.out_dir, "mock_travel_data.pdf"), frames)
+    write_tables(frames, args.out_dir, [f for f in args.formats if f != "pdf"])